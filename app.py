@@ -1,20 +1,24 @@
 from __future__ import annotations
-import io
 import os
 from pathlib import Path
 import sys
-import tempfile
+import time
 import unicodedata
 import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 import streamlit as st
 BASE_DIR = Path(__file__).parent.resolve()
 if str(BASE_DIR) not in sys.path:
     sys.path.insert(0, str(BASE_DIR))
 
 from src.state import PipelineState
-from src.graph.workflow import build_graph
-from src.llm_provider import normalize_provider
-from src.agents.report_agent import validate_markdown
+from src.graph.workflow import build_graph, NODE_ORDER
+from src.llm_provider import get_llm, normalize_provider
+from src.store import ResultStore
+from src.profiling import profiler_from_env
+from src.metrics import start_exporters_from_env
 from dotenv import load_dotenv
 
 
@@ -34,8 +38,109 @@ def render_footer() -> None:
     )
 
 
+# Wait this long after the role stops changing before starting the speculative market lookup
+PREFETCH_DEBOUNCE_S = 1.0
+
+
+def start_market_prefetch(role: str, provider: str) -> None:
+    """Kick off market intelligence for the typed role while the user is still uploading."""
+    if not role.strip() or os.getenv("CV_ANALYZER_PREFETCH", "1") == "0":
+        return
+    from src.tools.market_search import prefetch_market_requirements
+    channel = st.session_state.setdefault("prefetch_channel", uuid.uuid4().hex)
+    prefetch_market_requirements(
+        role,
+        lambda: get_llm(provider=provider, temperature=0.2),
+        debounce=PREFETCH_DEBOUNCE_S,
+        channel=channel,
+    )
+
+
+# Max CVs analysed at once; each run is mostly network wait on the LLM/Tavily calls
+MAX_PARALLEL = 4
+
+
+def run_analyses(inputs: List[Tuple[str, bytes]], role: str, language: str, provider: str,
+                 time_budget: float = 0, report_mode: str = "full") -> List[Tuple[str, PipelineState | None, str | None]]:
+    """Run the pipeline for each in-memory CV concurrently, with one progress bar per file."""
+    done_nodes: Dict[int, str] = {}
+    # Runs are persisted only when a store is configured for the deployment
+    store = ResultStore(os.environ["CV_ANALYZER_STORE"]) if os.getenv("CV_ANALYZER_STORE") else None
+    bars = [st.progress(0.0, text=f"{name}: queued") for name, _ in inputs]
+    # CV_ANALYZER_PROFILE=<dir> profiles every node; the profile accumulates across runs
+    profiler = profiler_from_env()
+
+    def work(i: int, name: str, data: bytes) -> PipelineState:
+        deadline = time.time() + time_budget if time_budget else None
+        state = PipelineState(cv_bytes=data, cv_name=name, target_role=role, language=language, provider=provider,
+                              deadline=deadline, report_mode=report_mode)
+        final = build_graph(profiler=profiler)(state, on_node=lambda node: done_nodes.__setitem__(i, node))
+        if isinstance(final, dict):
+            final = PipelineState.model_validate(final)
+        if store is not None and final.report_markdown:
+            store.save(final)
+        return final
+
+    # Worker threads can't call Streamlit, so the script thread polls and updates the bars
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL, len(inputs))) as pool:
+        futures = [pool.submit(work, i, name, data) for i, (name, data) in enumerate(inputs)]
+        while True:
+            finished = all(f.done() for f in futures)
+            for i, (name, _) in enumerate(inputs):
+                node = done_nodes.get(i)
+                step = NODE_ORDER.index(node) + 1 if node in NODE_ORDER else 0
+                label = "done" if futures[i].done() else (f"{node} finished" if node else "running")
+                bars[i].progress(1.0 if futures[i].done() else step / len(NODE_ORDER), text=f"{name}: {label}")
+            if finished:
+                break
+            time.sleep(0.2)
+
+    if profiler is not None:
+        profiler.dump()
+    results: List[Tuple[str, PipelineState | None, str | None]] = []
+    for (name, _), f in zip(inputs, futures):
+        try:
+            results.append((name, f.result(), None))
+        except Exception as e:
+            results.append((name, None, f"Pipeline error: {e}"))
+    return results
+
+
+def render_result(final: PipelineState, role: str, language: str, file_stem: str | None = None) -> None:
+    if final.errors:
+        st.warning("\n".join(final.errors))
+
+    if final.report_markdown:
+        # Display the report
+        st.markdown(final.report_markdown)
+
+        # Validate markdown and show issues if any
+        try:
+            from src.agents.report_agent import validate_markdown
+            issues = validate_markdown(final.report_markdown, language)
+            if issues:
+                st.info("📋 **Report validation notes:**\n" + "\n".join([f"• {issue}" for issue in issues]))
+        except Exception:
+            pass  # Skip validation if function not available
+
+        # Download button with exact same content
+        parts = ["report"] + ([slugify(file_stem)] if file_stem else []) + [slugify(role), slugify(language)]
+        fname = "-".join(parts) + ".md"
+        st.download_button(
+            label="Download as .md",
+            data=final.report_markdown.encode("utf-8"),
+            file_name=fname,
+            mime="text/markdown",
+            key=f"download-{fname}-{id(final)}",
+        )
+    else:
+        st.error("No report produced.")
+
+
 def main():
     load_dotenv()
+    # Metrics exporters (CV_ANALYZER_METRICS_PORT / _FILE) start once and outlive Streamlit reruns
+    start_exporters_from_env()
     st.set_page_config(page_title="AI CV Analyzer", page_icon="📄", layout="centered")
     st.title("AI CV Analyzer")
     st.caption("Analyze a candidate CV against a target role and generate a concise Markdown report.")
@@ -44,10 +149,15 @@ def main():
         role = st.text_input("Target role", placeholder="e.g., Senior AI Engineer")
         language = st.selectbox("Language", options=["english", "indonesia"], index=1)
         provider_label = st.selectbox("LLM Provider", options=["Auto", "Gemini", "Mistral"], index=0)
-        uploaded = st.file_uploader("Upload CV (.pdf or .txt)", type=["pdf", "txt"], accept_multiple_files=False)
+        uploaded = st.file_uploader("Upload CV(s) (.pdf or .txt)", type=["pdf", "txt"], accept_multiple_files=True)
         demo = st.checkbox("Demo mode (use sample CV if no file uploaded)")
+        time_budget = st.number_input("Time budget per CV (seconds, 0 = none)", min_value=0, max_value=600, value=0, step=10)
+        fast_report = st.checkbox("Fast report (LLM writes prose only)", help="Strengths, gaps and plan are computed directly; the LLM only writes the overview and notes")
         run = st.button("Run analysis")
 
+    # The role is known long before "Run analysis": start the market leg now, the pipeline joins it later
+    start_market_prefetch(role or "", normalize_provider(provider_label))
+
     if run:
         # Validate API keys early for crisp UX
         secrets = {}
@@ -59,16 +169,20 @@ def main():
         tavily_key = secrets.get("TAVILY_API_KEY") or os.getenv("TAVILY_API_KEY")
         # In provider selection, only require keys for chosen provider
         prov_code = normalize_provider(provider_label)
-        if not tavily_key:
+        # Replaying a cassette (CV_ANALYZER_CASSETTE) needs no keys at all
+        from src.cassette import active_cassette
+        cassette = active_cassette()
+        replaying = cassette is not None and cassette.replaying
+        if not tavily_key and not replaying:
             st.error("Missing TAVILY_API_KEY. Add it to .env or Streamlit secrets.")
             return
         # Optional checks for other providers to improve UX
-        if prov_code == "gemini":
+        if prov_code == "gemini" and not replaying:
             gkey = secrets.get("GEMINI_API_KEY") or os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
             if not gkey:
                 st.error("Missing GEMINI_API_KEY (or GOOGLE_API_KEY). Add it to .env or Streamlit secrets.")
                 return
-        if prov_code == "mistral":
+        if prov_code == "mistral" and not replaying:
             mkey = secrets.get("MISTRAL_API_KEY") or os.getenv("MISTRAL_API_KEY")
             if not mkey:
                 st.error("Missing MISTRAL_API_KEY. Add it to .env or Streamlit secrets.")
@@ -81,66 +195,28 @@ def main():
             st.warning("Please upload a CV file (.pdf or .txt), or enable 'Demo mode'.")
             return
 
-        # Persist to a temp file with the correct suffix
-        tmp_path = None
+        # Keep uploads in memory; load_cv sniffs the format from the bytes, no temp files needed
         if uploaded:
-            suffix = "." + uploaded.name.split(".")[-1].lower()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                tmp.write(uploaded.getvalue())
-                tmp_path = tmp.name
+            inputs = [(f.name, f.getvalue()) for f in uploaded]
         else:
             # Use sample
             sample_path = Path(__file__).parent / "samples" / "sample_cv.txt"
             if not sample_path.exists():
                 st.error("Sample CV not found at samples/sample_cv.txt.")
                 return
-            tmp_path = str(sample_path)
-
-        try:
-            state = PipelineState(cv_path=tmp_path, target_role=role, language=language, provider=prov_code)
-            run_graph = build_graph()
-            with st.spinner("Running analysis..."):
-                try:
-                    final = run_graph(state)
-                except Exception as e:
-                    st.error(f"Pipeline error: {e}")
-                    return
-                if isinstance(final, dict):
-                    final = PipelineState.model_validate(final)
-        finally:
-            # Clean up temp file
-            try:
-                # Don't delete when using sample
-                if uploaded and tmp_path and os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-            except Exception:
-                pass
-
-        if final.errors:
-            st.warning("\n".join(final.errors))
-
-        if final.report_markdown:
-            # Display the report
-            st.markdown(final.report_markdown)
-            
-            # Validate markdown and show issues if any
-            try:
-                issues = validate_markdown(final.report_markdown, language)
-                if issues:
-                    st.info("📋 **Report validation notes:**\n" + "\n".join([f"• {issue}" for issue in issues]))
-            except Exception:
-                pass  # Skip validation if function not available
-            
-            # Download button with exact same content
-            fname = f"report-{slugify(role)}-{slugify(language)}.md"
-            st.download_button(
-                label="Download as .md",
-                data=final.report_markdown.encode("utf-8"),
-                file_name=fname,
-                mime="text/markdown"
-            )
-        else:
-            st.error("No report produced.")
+            inputs = [(sample_path.name, sample_path.read_bytes())]
+
+        with st.spinner("Running analysis..."):
+            results = run_analyses(inputs, role, language, prov_code, float(time_budget), "hybrid" if fast_report else "full")
+
+        multi = len(results) > 1
+        for name, final, error in results:
+            if multi:
+                st.subheader(name)
+            if error:
+                st.error(error)
+                continue
+            render_result(final, role, language, Path(name).stem if multi else None)
 
     # Footer - always shows at the bottom
     render_footer()
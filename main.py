@@ -1,5 +1,8 @@
 from __future__ import annotations
 import argparse
+import atexit
+import subprocess
+import time
 from pathlib import Path
 from dotenv import load_dotenv
 import sys
@@ -9,30 +12,149 @@ sys.path.insert(0, str(BASE_DIR))
 from src.state import PipelineState
 from src.graph.workflow import build_graph
 from src.llm_provider import normalize_provider
+from src.store import ResultStore, cv_hash, default_store_path
+from src.utils import load_cv
+from src.export import EXPORT_FORMATS
+from src.batch import manifest_root, merge_shards, parse_shard, read_manifest, run_batch, select_shard, shard_dir
 
 def main():
     load_dotenv()  # load .env if exists
 
     parser = argparse.ArgumentParser(description="AI Multi-Agent CV Analyzer (Gemini/Mistral)")
-    parser.add_argument("--cv", required=True, help="Path to CV file (.txt or .pdf)")
+    src_group = parser.add_mutually_exclusive_group(required=True)
+    src_group.add_argument("--cv", help="Path to CV file (.txt or .pdf)")
+    src_group.add_argument("--batch", help="Directory of CVs or a manifest file with one CV path per line")
     parser.add_argument("--role", required=True, help="Target role, e.g. 'Senior AI Engineer'")
     parser.add_argument("--out", default="report.md", help="Output markdown path")
     parser.add_argument("--provider", default="auto", choices=["auto","gemini","mistral"], help="LLM provider selection")
     parser.add_argument("--language", default="indonesia", choices=["english","indonesia"], help="Report language")
+    parser.add_argument("--report-mode", default="full", choices=["full", "hybrid"], help="hybrid: tables and plan are computed deterministically, the LLM writes only the overview, per-skill notes and final notes")
+    parser.add_argument("--out-dir", default="reports", help="Batch mode: directory for per-CV reports")
+    parser.add_argument("--workers", type=int, default=4, help="Batch mode: CVs processed concurrently")
+    parser.add_argument("--shard", metavar="I/N", help="Batch mode: process only shard I of N (0-based), chosen by a stable hash of each CV path; output goes to OUT_DIR/shard-I-of-N")
+    parser.add_argument("--llm-batch", type=int, default=0, metavar="N", help="Batch mode: pack the skill-extraction LLM calls of up to N concurrent CVs into one request (use N <= --workers)")
+    parser.add_argument("--processes", type=int, default=1, help="Batch mode: run N shards as local processes, then merge their outputs")
+    parser.add_argument("--export", nargs="+", choices=EXPORT_FORMATS, default=[],
+                        help="Batch mode: stream machine-readable results into --out-dir as CVs finish: jsonl (results.jsonl) and/or coverage (coverage.csv, coverage_matrix.csv)")
+    parser.add_argument("--no-llm", action="store_true", help="Fast screening without any LLM: heuristic parsing, lexicon skills, offline market list, template report")
+    parser.add_argument("--timeout", type=float, default=None, help="Time budget in seconds for the whole run; slow steps fall back to heuristics")
+    parser.add_argument("--slim", action="store_true", help="Slim state: keep large intermediates out of the graph state and release the CV bytes and text once no later step reads them (lower memory with many concurrent runs)")
+    parser.add_argument("--profile", metavar="DIR", nargs="?", const="profile", default=None,
+                        help="Profile CPU and memory per pipeline node; writes pstats, allocation sites and collapsed stacks to DIR (default: profile/)")
+    parser.add_argument("--record", metavar="CASSETTE", help="Record every LLM and Tavily request/response to this cassette file (JSONL)")
+    parser.add_argument("--replay", metavar="CASSETTE", help="Serve LLM and Tavily responses from a recorded cassette; no network or API keys needed")
+    parser.add_argument("--replay-latency", action="store_true", help="With --replay, wait as long as the recorded calls took")
+    parser.add_argument("--store", default=None, help="Results store (SQLite) where finished runs are saved (default: data/results.db; with --shard, a store inside the shard directory)")
+    parser.add_argument("--no-store", action="store_true", help="Do not save this run to the results store")
+    parser.add_argument("--reuse", action="store_true", help="Serve a stored report for the same CV, role, language and mode (--no-llm / --report-mode) without any LLM calls; degraded runs are not reused")
+    parser.add_argument("--taxonomy", default=None, help="Compiled skill taxonomy (scripts/compile_taxonomy.py) for multi-hop implicit skills; default: the built-in mapping")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics at http://ADDR:PORT/metrics while running")
+    parser.add_argument("--metrics-addr", default="127.0.0.1", metavar="ADDR", help="Bind address for --metrics-port (default: localhost only; 0.0.0.0 for every interface)")
+    parser.add_argument("--metrics-file", default=None, help="Write Prometheus metrics to this file every --metrics-interval seconds and on exit (e.g. for node_exporter's textfile collector)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0, help="Flush period in seconds for --metrics-file")
     args = parser.parse_args()
 
-    state = PipelineState(
-        cv_path=args.cv, 
-        target_role=args.role, 
-        language=args.language,
-        provider=normalize_provider(args.provider)
-    )
-    run = build_graph()
+    shard = None
+    if args.shard or args.processes > 1:
+        if not args.batch:
+            parser.error("--shard and --processes require --batch")
+        if args.shard and args.processes > 1:
+            parser.error("--shard and --processes are mutually exclusive")
+        try:
+            shard = parse_shard(args.shard) if args.shard else None
+        except ValueError as e:
+            parser.error(str(e))
+    if args.export and not args.batch:
+        parser.error("--export requires --batch")
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+    if args.processes > 1 and (args.metrics_port or args.metrics_file):
+        parser.error("--metrics-port/--metrics-file need one process each; run the shards with --shard instead of --processes")
+    if args.processes > 1:
+        sys.exit(run_local_shards(args.processes, args.out_dir, per_shard_stores=not (args.store or args.no_store)))
+
+    if args.metrics_port:
+        from src.metrics import start_http_exporter
+        start_http_exporter(args.metrics_port, args.metrics_addr)
+    if args.metrics_file:
+        from src.metrics import start_file_exporter, write_metrics_file
+        start_file_exporter(args.metrics_file, args.metrics_interval)
+        atexit.register(write_metrics_file, args.metrics_file)
+
+    if args.taxonomy:
+        from src.taxonomy import load_taxonomy, set_taxonomy
+        try:
+            set_taxonomy(load_taxonomy(args.taxonomy))
+        except (OSError, ValueError) as e:
+            parser.error(f"--taxonomy: {e}")
+
+    if args.record or args.replay:
+        from src.cassette import Cassette, set_cassette
+        set_cassette(Cassette(args.record or args.replay, mode="record" if args.record else "replay",
+                              emulate_latency=args.replay_latency))
+
+    out_dir = str(shard_dir(args.out_dir, *shard)) if shard else args.out_dir
+    # Each shard writes its own SQLite file; one file shared by several hosts is not safe
+    store_path = args.store or (str(Path(out_dir) / "results.db") if shard else default_store_path())
+    store = None if args.no_store else ResultStore(store_path)
+    profiler = None
+    if args.profile:
+        from src.profiling import NodeProfiler
+        profiler = NodeProfiler(str(Path(args.profile) / Path(out_dir).name) if shard else args.profile)
+
+    def make_state(cv_path: str) -> PipelineState:
+        return PipelineState(
+            cv_path=cv_path,
+            target_role=args.role,
+            language=args.language,
+            provider=normalize_provider(args.provider),
+            no_llm=args.no_llm,
+            report_mode=args.report_mode,
+            deadline=(time.time() + args.timeout) if args.timeout else None,
+        )
+
+    if args.batch:
+        cv_paths = read_manifest(args.batch)
+        if shard:
+            cv_paths = select_shard(cv_paths, manifest_root(args.batch), *shard)
+        summary = run_batch(
+            cv_paths, make_state, build_graph(store=store, profiler=profiler, slim=args.slim, llm_batch=args.llm_batch),
+            out_dir, workers=args.workers,
+            on_result=(lambda _path, final: store.save(final)) if store is not None else None,
+            export=args.export,
+        )
+        print(f"[OK] {summary.ok}/{summary.total} reports written to {Path(out_dir).resolve()} "
+              f"in {summary.elapsed_s:.2f}s ({summary.per_second:.1f} CVs/s)")
+        if summary.failed:
+            print(f"[WARN] {summary.failed} CV(s) failed; see {Path(out_dir) / 'errors.log'}")
+        if args.export:
+            print(f"[OK] Exported {', '.join(args.export)} results to {Path(out_dir).resolve()}")
+        if profiler is not None:
+            print(f"[OK] Profile written to: {profiler.dump().resolve()}")
+        print_structured_output_stats()
+        return
+
+    if args.reuse and store is not None:
+        hit = store.latest(cv_hash(load_cv(args.cv)), args.role, args.language,
+                           no_llm=args.no_llm, report_mode=args.report_mode)
+        if hit and hit.report_markdown:
+            out_path = Path(args.out)
+            out_path.write_text(hit.report_markdown, encoding="utf-8")
+            print(f"[OK] Served stored report (run {hit.id}) to: {out_path.resolve()}")
+            return
+
+    state = make_state(args.cv)
+    run = build_graph(store=store, profiler=profiler, slim=args.slim)
     final = run(state)
+    if profiler is not None:
+        print(f"[OK] Profile written to: {profiler.dump().resolve()}")
     # LangGraph app.invoke may return a plain dict; coerce into PipelineState for uniform handling
     if isinstance(final, dict):
         final = PipelineState.model_validate(final)
 
+    print_structured_output_stats()
+    if final.degraded:
+        print("[WARN] Time budget ran out; heuristic fallbacks used for: " + ", ".join(final.degraded))
     if final.errors:
         print("[WARN] Pipeline completed with errors:")
         for e in final.errors:
@@ -42,8 +164,40 @@ def main():
         out_path = Path(args.out)
         out_path.write_text(final.report_markdown, encoding="utf-8")
         print(f"[OK] Report written to: {out_path.resolve()}")
+        if store is not None:
+            run_id = store.save(final)
+            print(f"[OK] Run saved to store {store_path} (id {run_id})")
     else:
         print("[ERR] No report produced.")
 
+def print_structured_output_stats() -> None:
+    from src.json_stream import format_structured_output_stats
+    stats = format_structured_output_stats()
+    if stats:
+        print("[INFO] Structured LLM output per provider:\n" + "\n".join(" - " + line for line in stats.splitlines()))
+
+
+def run_local_shards(processes: int, out_dir: str, per_shard_stores: bool) -> int:
+    """Re-run this command as ``processes`` shard processes on this machine, then merge their outputs."""
+    argv, skip = [], False
+    for arg in sys.argv[1:]:
+        if skip:
+            skip = False
+        elif arg == "--processes":
+            skip = True
+        elif not arg.startswith("--processes="):
+            argv.append(arg)
+    procs = [
+        subprocess.Popen([sys.executable, str(BASE_DIR / "main.py"), *argv, "--shard", f"{i}/{processes}"])
+        for i in range(processes)
+    ]
+    codes = [p.wait() for p in procs]
+    merged = merge_shards(out_dir)
+    print(f"[OK] Merged {merged.shards} shard(s): {merged.reports} reports, {merged.errors} error(s) in {Path(out_dir).resolve()}")
+    if per_shard_stores:
+        print("[INFO] Shard stores were kept per shard; combine them with scripts/merge_shards.py --store")
+    return max(codes)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the LLM-free screening mode (``--no-llm``).
+
+Generates synthetic CVs, runs the full graph over them on a single core and
+reports CVs/second. No API keys or network access are needed.
+
+Usage:
+    python scripts/bench_fast_mode.py
+    python scripts/bench_fast_mode.py --cvs 2000 --workers 1 --min-rate 50
+
+Exit codes:
+    0: Success
+    1: Throughput below --min-rate
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(project_root))
+
+from src.batch import run_batch  # noqa: E402
+from src.graph.workflow import build_graph  # noqa: E402
+from src.state import PipelineState  # noqa: E402
+
+SKILL_POOL = [
+    "Python", "Java", "Go", "SQL", "Docker", "Kubernetes", "AWS", "GCP", "PyTorch", "TensorFlow",
+    "scikit-learn", "Pandas", "FastAPI", "Django", "React", "TypeScript", "Git", "Linux", "Airflow",
+    "Spark", "LangChain", "RAG", "FAISS", "MLflow", "Terraform", "C++", "Node.js", "PostgreSQL",
+]
+
+
+def synthetic_cv(i: int, rng: random.Random) -> str:
+    skills = rng.sample(SKILL_POOL, rng.randint(5, 12))
+    bullets = "\n".join(f"- Built services with {a} and {b}" for a, b in zip(skills, reversed(skills)))
+    return (
+        f"Candidate {i}\nEngineer with {rng.randint(1, 12)} years of experience.\n\n"
+        f"Skills\n{', '.join(skills)}\n\n"
+        f"Experience\nSoftware Engineer — Company {i % 50} (2019-2024)\n{bullets}\n\n"
+        f"Education\nB.Sc. Computer Science, University {i % 20}\n"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure --no-llm screening throughput")
+    parser.add_argument("--cvs", type=int, default=500, help="Number of synthetic CVs")
+    parser.add_argument("--role", default="Senior AI Engineer")
+    parser.add_argument("--language", default="english", choices=["english", "indonesia"])
+    parser.add_argument("--workers", type=int, default=1, help="Worker threads (default: 1)")
+    parser.add_argument("--all-cores", action="store_true", help="Do not pin the process to a single core")
+    parser.add_argument("--min-rate", type=float, default=None, help="Fail if CVs/second is below this")
+    args = parser.parse_args()
+
+    if not args.all_cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        cv_dir = Path(tmp) / "cvs"
+        cv_dir.mkdir()
+        paths = []
+        for i in range(args.cvs):
+            p = cv_dir / f"cv_{i:05d}.txt"
+            p.write_text(synthetic_cv(i, rng), encoding="utf-8")
+            paths.append(str(p))
+
+        def make_state(cv_path: str) -> PipelineState:
+            return PipelineState(cv_path=cv_path, target_role=args.role, language=args.language, no_llm=True)
+
+        run = build_graph()
+        run(make_state(paths[0]))  # warm-up: imports, regex compilation, skill interning
+        t0 = time.perf_counter()
+        summary = run_batch(paths, make_state, run, str(Path(tmp) / "reports"), workers=args.workers)
+        elapsed = time.perf_counter() - t0
+
+    rate = summary.total / elapsed if elapsed else 0.0
+    cores = "all cores" if args.all_cores or not hasattr(os, "sched_setaffinity") else "1 core"
+    print(f"CVs: {summary.total}  ok: {summary.ok}  failed: {summary.failed}  ({cores}, {args.workers} worker(s))")
+    print(f"Elapsed: {elapsed:.2f}s  Throughput: {rate:.1f} CVs/s  ({1000 * elapsed / max(summary.total, 1):.2f} ms/CV)")
+    if summary.failures:
+        print("First failure:", summary.failures[0])
+    if args.min_rate is not None and rate < args.min_rate:
+        print(f"❌ Below minimum rate of {args.min_rate:.1f} CVs/s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
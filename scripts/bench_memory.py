@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Peak-memory benchmark: N concurrent pipeline runs with the full state vs slim mode.
+
+Each mode runs in a fresh interpreter. All runs are held at a barrier after the
+analyze step, so every run's state is alive at the same time, then peak RSS is
+read from getrusage. Runs use the LLM-free pipeline, so no API keys are needed.
+How the runs' transient parsing memory overlaps varies between processes, so
+each mode is measured --repeat times and the median is reported.
+
+Usage:
+    python scripts/bench_memory.py
+    python scripts/bench_memory.py --runs 200 --cv-kb 64 --repeat 5
+
+Exit codes:
+    0: Success
+    1: A run failed
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(project_root))
+
+WORDS = ["python", "docker", "kubernetes", "pipeline", "latency", "dashboard", "migration", "service",
+         "sql", "airflow", "pytorch", "customer", "team", "platform", "api", "monitoring", "aws"]
+
+
+def synthetic_cv(i: int, kb: int) -> bytes:
+    rng = random.Random(i)
+    lines = [f"Candidate {i}", "Summary", "Engineer building data and ML platforms.", "Skills",
+             ", ".join(rng.sample(WORDS, 8)), "Experience"]
+    size = sum(len(line) for line in lines)
+    while size < kb * 1024:
+        line = "- " + " ".join(rng.choice(WORDS) for _ in range(14))
+        lines.append(line)
+        size += len(line) + 1
+    lines += ["Education", "B.Sc. Computer Science"]
+    return "\n".join(lines).encode("utf-8")
+
+
+def max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def child(mode: str, runs: int, cv_kb: int) -> dict:
+    from src.graph.workflow import build_graph
+    from src.state import PipelineState
+
+    run = build_graph(slim=(mode == "slim"))
+    run(PipelineState(cv_bytes=synthetic_cv(0, cv_kb), target_role="Data Engineer", language="english", no_llm=True))  # warm-up
+    baseline = max_rss_mb()
+    barrier = threading.Barrier(runs)
+
+    def hold(node: str) -> None:
+        if node == "analyze":
+            try:
+                barrier.wait(timeout=120)
+            except threading.BrokenBarrierError:
+                pass
+
+    def work(i: int) -> bool:
+        # The state is the only holder of the CV bytes, as for an upload handed to the pipeline
+        state = PipelineState(cv_bytes=synthetic_cv(i, cv_kb), target_role="Data Engineer", language="english", no_llm=True)
+        final = run(state, on_node=hold)
+        if isinstance(final, dict):
+            final = PipelineState.model_validate(final)
+        return bool(final.report_markdown)
+
+    with ThreadPoolExecutor(max_workers=runs) as pool:
+        ok = sum(pool.map(work, range(runs)))
+    return {"mode": mode, "runs": runs, "ok": ok, "baseline_mb": baseline, "peak_mb": max_rss_mb()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare peak RSS of full vs slim pipeline state")
+    parser.add_argument("--runs", type=int, default=200, help="Concurrent runs (default: 200)")
+    parser.add_argument("--cv-kb", type=int, default=32, help="Size of each synthetic CV in KiB")
+    parser.add_argument("--repeat", type=int, default=3, help="Processes per mode; the median is reported (default: 3)")
+    parser.add_argument("--child", choices=["full", "slim"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.runs, args.cv_kb)))
+        return 0
+
+    samples = {"full": [], "slim": []}
+    for _ in range(max(args.repeat, 1)):
+        # Alternate the modes so drift on the machine affects both alike
+        for mode in samples:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--runs", str(args.runs), "--cv-kb", str(args.cv_kb)],
+                cwd=project_root, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(proc.stderr.strip()[-800:])
+                return 1
+            samples[mode].append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    results = {}
+    for mode, rs in samples.items():
+        growth = statistics.median(r["peak_mb"] - r["baseline_mb"] for r in rs)
+        results[mode] = {"ok": min(r["ok"] for r in rs), "baseline_mb": statistics.median(r["baseline_mb"] for r in rs)}
+        results[mode]["peak_mb"] = results[mode]["baseline_mb"] + growth
+
+    print(f"{args.runs} concurrent runs, {args.cv_kb} KiB CVs, median of {max(args.repeat, 1)} process(es) per mode")
+    print(f"{'mode':<6} {'ok':>5} {'baseline MB':>12} {'peak MB':>9} {'per run KB':>11}")
+    for mode, r in results.items():
+        per_run = (r["peak_mb"] - r["baseline_mb"]) * 1024 / max(args.runs, 1)
+        print(f"{mode:<6} {r['ok']:>5} {r['baseline_mb']:>12.1f} {r['peak_mb']:>9.1f} {per_run:>11.1f}")
+    full, slim = results["full"], results["slim"]
+    saved = (full["peak_mb"] - full["baseline_mb"]) - (slim["peak_mb"] - slim["baseline_mb"])
+    print(f"Slim mode saves {saved:.1f} MB at peak")
+    return 0 if all(r["ok"] == args.runs for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark: import time per module, each measured in a fresh interpreter.
+
+Also checks that importing the pipeline entry points does not pull in the heavy
+provider SDKs (they must load lazily on first use).
+
+Usage:
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --repeat 5 --budget-ms 400
+
+Exit codes:
+    0: Success
+    1: A module exceeded the budget or an entry point imported a heavy SDK eagerly
+"""
+
+from __future__ import annotations
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.resolve()
+
+# Modules on the cold-start path of main.py / app.py / batch workers
+MODULES = [
+    "src.state",
+    "src.utils",
+    "src.llm_provider",
+    "src.json_stream",
+    "src.tools.market_search",
+    "src.store",
+    "src.graph.workflow",
+]
+
+# Must not be imported until a provider / PDF / search / UI is actually used
+HEAVY = [
+    "langchain_google_genai",
+    "langchain_mistralai",
+    "langgraph",
+    "pypdf",
+    "tavily",
+    "streamlit",
+]
+
+
+def _toplevel_import_us(code: str) -> int:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=project_root, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{code} failed:\n{proc.stderr.strip()[-800:]}")
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"; nested imports are indented
+        parts = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(parts) == 3 and parts[1].strip().isdigit() and parts[2][:2].strip() and parts[2][0] == " ":
+            total_us += int(parts[1])
+    return total_us
+
+
+def import_time_ms(module: str) -> float:
+    """Import time of ``module`` in a fresh interpreter, net of interpreter startup imports."""
+    return max(0, _toplevel_import_us(f"import {module}") - _toplevel_import_us("pass")) / 1000.0
+
+
+def eager_heavy_imports() -> list[str]:
+    code = (
+        "import sys\n"
+        + "".join(f"import {m}\n" for m in MODULES)
+        + f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=project_root, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip()[-800:])
+    out = proc.stdout.strip().splitlines()
+    return [m for m in (out[-1].split(",") if out else []) if m]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure per-module import time")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module (median reported)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if any module's median exceeds this")
+    parser.add_argument("--heavy", action="store_true", help="Also time the heavy SDKs for reference")
+    args = parser.parse_args()
+
+    modules = MODULES + (HEAVY if args.heavy else [])
+    print(f"{'module':<32} {'median ms':>10} {'min ms':>10}")
+    failed = False
+    for m in modules:
+        try:
+            samples = [import_time_ms(m) for _ in range(max(1, args.repeat))]
+        except RuntimeError as e:
+            print(f"{m:<32} {'n/a':>10} {'n/a':>10}  ({str(e).splitlines()[-1]})")
+            continue
+        med = statistics.median(samples)
+        flag = ""
+        if args.budget_ms is not None and m in MODULES and med > args.budget_ms:
+            flag = "  OVER BUDGET"
+            failed = True
+        print(f"{m:<32} {med:>10.1f} {min(samples):>10.1f}{flag}")
+
+    eager = eager_heavy_imports()
+    if eager:
+        print(f"\n❌ Heavy modules imported eagerly: {', '.join(eager)}")
+        failed = True
+    else:
+        print("\n✅ No heavy SDKs imported at startup")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
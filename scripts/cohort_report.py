@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Aggregate skill-gap statistics across all stored runs (no LLM calls).
+
+Reads the results store, encodes every run as skill-ID arrays and computes gap
+frequency histograms, gap co-occurrence and per-role market coverage distributions.
+
+Usage:
+    python scripts/cohort_report.py --role "Data Engineer"
+    python scripts/cohort_report.py --out cohort.md --json cohort.json
+    python scripts/cohort_report.py --source report   # use ReportData gap tables instead of the full diff
+
+Exit codes:
+    0: Success
+    1: No runs matched
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(project_root))
+
+from src.analytics import cohort_summary, encode_cohort, render_cohort_markdown
+from src.store import ResultStore, default_store_path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Cohort skill-gap analytics over stored runs")
+    parser.add_argument("--store", default=default_store_path(), help="Results store path")
+    parser.add_argument("--role", help="Only runs for this target role")
+    parser.add_argument("--language", choices=["english", "indonesia"], help="Only runs in this report language")
+    parser.add_argument("--all-runs", action="store_true", help="Include every run, not just the latest per CV and role")
+    parser.add_argument("--source", default="diff", choices=["diff", "report"],
+                        help="diff: full strengths/gaps from the skill diff; report: the ReportData tables")
+    parser.add_argument("--top", type=int, default=20, help="Gaps in the frequency table")
+    parser.add_argument("--cooc-top", type=int, default=10, help="Gaps in the co-occurrence matrix")
+    parser.add_argument("--out", help="Write the Markdown report here instead of stdout")
+    parser.add_argument("--json", help="Also write the aggregate as JSON")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    store = ResultStore(args.store)
+    cohort = encode_cohort(store.iter_skill_rows(role=args.role, language=args.language, latest_per_cv=not args.all_runs))
+    if cohort.size == 0:
+        print("❌ No stored runs matched.", file=sys.stderr)
+        return 1
+    summary = cohort_summary(cohort, source=args.source, top=args.top, cooc_top=args.cooc_top)
+    title = f"Cohort Skill-Gap Report — {args.role}" if args.role else "Cohort Skill-Gap Report"
+    md = render_cohort_markdown(summary, title=title)
+    elapsed = time.perf_counter() - t0
+
+    if args.out:
+        Path(args.out).write_text(md, encoding="utf-8")
+        print(f"[OK] Cohort report written to: {Path(args.out).resolve()}")
+    else:
+        sys.stdout.write(md)
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"[OK] {cohort.size} runs × {len(cohort.skills)} skills aggregated in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
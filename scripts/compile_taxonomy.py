@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Compile a skill taxonomy (TSV edges) into the memory-mapped format used for
+implicit skill inference.
+
+Each input line is ``skill<TAB>implied skill[<TAB>weight]``; the compiled file
+holds the graph in CSR form plus its transitive closure (best path confidence
+and hop count per reachable skill). Point the pipeline at it with
+``main.py --taxonomy FILE`` or ``CV_ANALYZER_TAXONOMY=FILE``.
+
+Usage:
+    python scripts/compile_taxonomy.py taxonomy.tsv data/skill_taxonomy.bin
+    python scripts/compile_taxonomy.py taxonomy.tsv data/skill_taxonomy.bin --max-hops 4 --min-confidence 0.2
+    python scripts/compile_taxonomy.py taxonomy.tsv out.bin --with-builtin   # also include IMPLICIT_MAP
+
+Exit codes:
+    0: Success
+    1: Input missing or malformed
+"""
+
+from __future__ import annotations
+import argparse
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(project_root))
+
+from src.taxonomy import MAX_HOPS, MIN_CONFIDENCE, Taxonomy, edges_from_map, load_taxonomy, read_edges, write_taxonomy  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compile a skill taxonomy for implicit skill inference")
+    parser.add_argument("source", help="TSV file: skill<TAB>implied skill[<TAB>weight]")
+    parser.add_argument("out", help="Compiled taxonomy file to write")
+    parser.add_argument("--max-hops", type=int, default=MAX_HOPS, help=f"Longest implication chain kept in the closure (default {MAX_HOPS})")
+    parser.add_argument("--min-confidence", type=float, default=MIN_CONFIDENCE, help=f"Drop closure entries weaker than this (default {MIN_CONFIDENCE})")
+    parser.add_argument("--with-builtin", action="store_true", help="Also include the built-in IMPLICIT_MAP edges")
+    args = parser.parse_args()
+
+    if not Path(args.source).is_file():
+        print(f"❌ Not a file: {args.source}")
+        return 1
+    try:
+        edges = read_edges(args.source)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if args.with_builtin:
+        from src.agents.skill_analyst import IMPLICIT_MAP
+        edges += edges_from_map(IMPLICIT_MAP)
+
+    t0 = time.perf_counter()
+    out = write_taxonomy(args.out, edges, args.max_hops, args.min_confidence)
+    compile_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    tax: Taxonomy = load_taxonomy(str(out))
+    load_ms = (time.perf_counter() - t0) * 1000
+    closure = tax.header["arrays"]["closure_dst"][2]
+    print(f"Compiled {tax.header['skills']} skills, {tax.header['edges']} edges, {closure} closure entries "
+          f"(max {args.max_hops} hops) into {out} ({out.stat().st_size / 1024:.1f} KiB) in {compile_s:.2f}s; "
+          f"loads in {load_ms:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Merge the outputs of sharded batch runs (main.py --batch ... --shard i/n).
+
+Copies every shard's reports into one directory, concatenates the per-shard
+traces (trace.jsonl), error logs and --export files, and optionally imports the per-shard
+result stores into one store. Safe to re-run while late shards finish.
+
+Usage:
+    python scripts/merge_shards.py reports/
+    python scripts/merge_shards.py reports/ --dest merged/ --store data/results.db
+
+Exit codes:
+    0: Success
+    1: No shard directories found, or shards missing (their outputs are still merged)
+"""
+
+from __future__ import annotations
+import argparse
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(project_root))
+
+from src.batch import merge_shards  # noqa: E402
+from src.store import ResultStore  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Merge per-shard batch outputs")
+    parser.add_argument("out_dir", help="The --out-dir the shards were run with")
+    parser.add_argument("--dest", help="Directory for the merged output (default: OUT_DIR)")
+    parser.add_argument("--store", help="Import the shards' results.db files into this results store")
+    args = parser.parse_args()
+
+    if not Path(args.out_dir).is_dir():
+        print(f"❌ Not a directory: {args.out_dir}")
+        return 1
+    summary = merge_shards(args.out_dir, args.dest)
+    if not summary.shards:
+        print(f"❌ No shard-i-of-n directories in {args.out_dir}")
+        return 1
+    dest = Path(args.dest or args.out_dir).resolve()
+    print(f"Merged {summary.shards}/{summary.expected} shard(s) into {dest}: "
+          f"{summary.reports} reports, {summary.traces} trace records, {summary.errors} error(s)")
+    if summary.exports:
+        print(f"Merged exports: {', '.join(summary.exports)}")
+
+    if args.store:
+        store = ResultStore(args.store)
+        dbs = sorted(Path(args.out_dir).glob("shard-*-of-*/results.db"))
+        imported = sum(store.merge_from(str(db)) for db in dbs)
+        print(f"Imported {imported} run(s) from {len(dbs)} shard store(s) into {args.store}")
+
+    if summary.missing:
+        print(f"⚠️  Missing or unfinished shards: {', '.join(summary.missing)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
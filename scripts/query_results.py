@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Query the results store of past runs without any LLM calls.
+
+Usage:
+    python scripts/query_results.py --role "Data Engineer"
+    python scripts/query_results.py --candidate "Naufal Firdaus"
+    python scripts/query_results.py --skill kubernetes --kind gap --role "Data Engineer"
+    python scripts/query_results.py --show 42 > report.md
+
+Exit codes:
+    0: Success (including no matches)
+    1: Run not found or invalid query
+"""
+
+from __future__ import annotations
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(project_root))
+
+from src.store import ResultStore, SKILL_KINDS, default_store_path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Query stored CV analysis runs")
+    parser.add_argument("--store", default=default_store_path(), help="Results store path")
+    parser.add_argument("--candidate", help="Candidate name as parsed from the CV")
+    parser.add_argument("--cv-hash", help="CV content hash")
+    parser.add_argument("--role", help="Target role")
+    parser.add_argument("--skill", help="Skill to look up")
+    parser.add_argument("--kind", choices=SKILL_KINDS, help="Restrict --skill to one kind")
+    parser.add_argument("--show", type=int, metavar="RUN_ID", help="Print the stored Markdown report of a run")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    store = ResultStore(args.store)
+
+    if args.show is not None:
+        run = store.get(args.show)
+        if run is None or not run.report_markdown:
+            print(f"❌ Run {args.show} not found", file=sys.stderr)
+            return 1
+        sys.stdout.write(run.report_markdown)
+        return 0
+
+    if args.skill:
+        runs = store.by_skill(args.skill, kind=args.kind, role=args.role, limit=args.limit)
+    elif args.candidate:
+        runs = store.by_candidate(args.candidate, limit=args.limit)
+    elif args.cv_hash:
+        runs = store.by_cv_hash(args.cv_hash, limit=args.limit)
+    elif args.role:
+        runs = store.by_role(args.role, limit=args.limit)
+    else:
+        parser.error("one of --candidate, --cv-hash, --role, --skill or --show is required")
+        return 1
+
+    for run in runs:
+        when = datetime.fromtimestamp(run.created_at).strftime("%Y-%m-%d %H:%M")
+        gaps = ", ".join(run.skills.get("gap", [])[:5]) or "-"
+        mode = run.mode + (" degraded" if run.degraded else "")
+        print(f"{run.id:>6}  {when}  {run.cv_hash[:10]}  {(run.candidate or '-')[:24]:<24}  {run.role} [{run.language}]  "
+              f"{mode}  gaps: {gaps}")
+    print(f"\n{len(runs)} run(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Refresh stored reports for a role after its market skill list changed.
+
+Compares each stored candidate (latest run per CV) against the new market
+skills, regenerates only the reports whose strengths/gaps tables change, from
+the stored parsed CV and analyzed skills, and saves them as new runs. Nothing
+is re-parsed or re-analyzed. By default each report is rebuilt in the mode it
+was made with, so only LLM-written reports need the LLM.
+
+Usage:
+    python scripts/refresh_reports.py --role "Data Engineer" --market-file market.json
+    python scripts/refresh_reports.py --role "Data Engineer" --dry-run      # latest stored live market list
+    python scripts/refresh_reports.py --role "Data Engineer" --live --report-mode template   # no LLM for any report
+
+Exit codes:
+    0: Success (including nothing to refresh)
+    1: No market list available, or some reports could not be rebuilt
+"""
+
+from __future__ import annotations
+import argparse
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(project_root))
+
+from src.refresh import REFRESH_MODES, read_market_file, refresh_reports  # noqa: E402
+from src.store import ResultStore, default_store_path  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Incrementally refresh stored reports for a role")
+    parser.add_argument("--store", default=default_store_path(), help="Results store path")
+    parser.add_argument("--role", required=True, help="Target role whose market list changed")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--market-file", help="New market skills: JSON ({\"skills\": [...]} or a list) or one skill per line")
+    source.add_argument("--live", action="store_true", help="Fetch the market list now (Tavily + LLM)")
+    parser.add_argument("--language", choices=["english", "indonesia"], help="Only reports in this language")
+    parser.add_argument("--report-mode", default="keep", choices=REFRESH_MODES,
+                        help="keep: rebuild each report in the mode it was made with (default); template: no LLM, "
+                             "also for LLM-written reports; hybrid/full: rebuild every report with the LLM")
+    parser.add_argument("--provider", default="auto", choices=["auto", "gemini", "mistral"], help="LLM provider for --live, hybrid and full")
+    parser.add_argument("--limit", type=int, default=10, help="Rows per strengths/gaps table (template reports)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    store = ResultStore(args.store)
+    llm = None
+    if args.live or (not args.dry_run and args.report_mode != "template"):
+        from src.llm_provider import get_llm
+        try:
+            llm = get_llm(provider=args.provider, temperature=0.2)
+        except Exception as e:
+            if args.live or args.report_mode != "keep":
+                raise
+            # keep mode only needs the LLM for LLM-written reports; those are reported as failures
+            print(f"⚠️  No LLM available ({e}); only no-LLM reports can be rebuilt")
+
+    if args.market_file:
+        market = read_market_file(args.market_file, args.role)
+    elif args.live:
+        from src.tools.market_search import get_market_requirements
+        market = get_market_requirements(args.role, llm)
+    else:
+        market = store.latest_market(args.role)
+    if not market or not market.get("skills"):
+        print(f"❌ No market skill list for '{args.role}' (use --market-file or --live)")
+        return 1
+
+    t0 = time.perf_counter()
+    summary = refresh_reports(store, args.role, market, language=args.language, mode=args.report_mode, llm=llm,
+                              limit=args.limit, dry_run=args.dry_run)
+    elapsed = time.perf_counter() - t0
+    print(f"Market for '{args.role}': +{len(summary.added)} / -{len(summary.removed)} skills")
+    if summary.added:
+        print("  added:   " + ", ".join(summary.added))
+    if summary.removed:
+        print("  removed: " + ", ".join(summary.removed))
+    print(f"Reports: {summary.considered} stored, {summary.stale} with an older market list, "
+          f"{summary.changed} with changed strengths/gaps")
+    if args.dry_run:
+        print("Dry run: nothing regenerated")
+    else:
+        print(f"Regenerated {len(summary.refreshed)} report(s) in {elapsed:.2f}s; "
+              f"{summary.stale - summary.changed} stale report(s) kept (tables unchanged)")
+    for skipped in summary.skipped:
+        print(f"ℹ️  {skipped}")
+    for failure in summary.failures:
+        print(f"⚠️  {failure}")
+    return 1 if summary.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,13 @@
 from __future__ import annotations
-from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 import re
-import json
 import logging
 from pydantic import BaseModel, Field
 from langchain.schema import SystemMessage, HumanMessage
+from ..json_stream import parse_llm_json
+from ..metrics import FALLBACKS
+from ..skills import SkillSet
 
 
 class CVExperience(BaseModel):
@@ -29,15 +32,23 @@ class CVSchema(BaseModel):
     education: str | None = None
 
 
+# CVs longer than this are parsed map-reduce style: section-aware chunks extracted in parallel
+LONG_CV_CHARS = 8000
+CHUNK_CHARS = 6000
+MAX_CHUNK_WORKERS = 6
+
+SECTION_PATTERNS = {
+    "experience": r"(experience|work experience|pengalaman kerja)\s*[:\n]",
+    "projects": r"(projects|project|proyek)\s*[:\n]",
+    "education": r"(education|pendidikan)\s*[:\n]",
+    "skills": r"(skills|kemampuan|keahlian)\s*[:\n]",
+}
+
+
 def naive_section_split(text: str) -> Dict[str, str]:
     sections = {"summary": "", "experience": "", "projects": "", "education": "", "skills": ""}
     t = text.replace("\r", "")
-    patterns = {
-        "experience": r"(experience|work experience|pengalaman kerja)\s*[:\n]",
-        "projects": r"(projects|project|proyek)\s*[:\n]",
-        "education": r"(education|pendidikan)\s*[:\n]",
-        "skills": r"(skills|kemampuan|keahlian)\s*[:\n]",
-    }
+    patterns = SECTION_PATTERNS
     idxs = []
     for name, pat in patterns.items():
         m = re.search(pat, t, flags=re.I)
@@ -57,71 +68,213 @@ def naive_section_split(text: str) -> Dict[str, str]:
 
 def parse_skills_from_text(skills_blob: str) -> list[str]:
     raw = re.split(r"[,;\n]", skills_blob)
-    norm = sorted(set([s.strip().lower() for s in raw if s.strip()]))
-    return norm
+    return SkillSet.from_iterable(raw).to_list()
 
 
-def _extract_json_block(text: str) -> str:
-    """Extract JSON from LLM response, handling code fences and finding first {...} block."""
-    t = text.strip()
-    # Strip code fences if any
-    t = re.sub(r"^```[a-zA-Z]*\n|```$", "", t, flags=re.MULTILINE)
-    # Find first {...}
-    m = re.search(r"\{[\s\S]*\}", t)
-    if m:
-        return t[m.start():m.end()]
-    return t
+def section_items(section: str, name: str) -> list[str]:
+    """Lines of a ``naive_section_split`` section without its header and bullet markers."""
+    body = re.sub(SECTION_PATTERNS[name], "", section, count=1, flags=re.I)
+    items = (re.sub(r"^\s*(?:[-*•·▪]|\d+[.)])\s*", "", line).strip() for line in body.splitlines())
+    return [item for item in items if item]
 
 
-def parse_cv_llm(text: str, llm: Any) -> Dict[str, Any]:
-    """Parse resume text into CVSchema using LLM with strict JSON-only output.
-    Falls back to naive parsing if LLM fails.
+def parse_cv_fallback(text: str) -> Dict[str, Any]:
+    """Rule-based parsing from section headers; no LLM involved.
+
+    Experience lines become the bullets of a single entry and project lines one project each,
+    so the report can still quote evidence from them.
     """
+    sections = naive_section_split(text)
+    skills = parse_skills_from_text(sections.get("skills", "")) if sections.get("skills") else []
+    bullets = section_items(sections["experience"], "experience")
+    projects = section_items(sections["projects"], "projects")
+    return {
+        "name": None,
+        "summary": sections.get("summary", ""),
+        "skills_explicit": skills,
+        "experiences": [CVExperience(bullets=bullets).model_dump()] if bullets else [],
+        "projects": [CVProject(description=p).model_dump() for p in projects],
+        "education": sections.get("education", ""),
+    }
+
+
+_SCHEMA_JSON = (
+    '{"name": str|null, "summary": str|null, "skills_explicit": string[] (lowercase, concrete technologies only), '
+    '"experiences": [{"company": str|null, "title": str|null, "period": str|null, "bullets": string[]}], '
+    '"projects": [{"name": str|null, "description": str|null, "tech": string[]}], "education": str|null}'
+)
+
+
+def _extract(text: str, llm: Any, part: Optional[Tuple[int, int]] = None) -> CVSchema:
+    """One LLM extraction call; ``part`` = (k, n) marks ``text`` as chunk k of n of a longer resume."""
     system = SystemMessage(content=(
         "You extract structured data from resumes into a strict JSON schema. Output ONLY JSON. No commentary, no markdown."
     ))
-    schema_json = (
-        '{"name": str|null, "summary": str|null, "skills_explicit": string[] (lowercase, concrete technologies only), '
-        '"experiences": [{"company": str|null, "title": str|null, "period": str|null, "bullets": string[]}], '
-        '"projects": [{"name": str|null, "description": str|null, "tech": string[]}], "education": str|null}'
-    )
+    intro = "Resume text:\n"
+    if part is not None:
+        intro = (f"Resume text (part {part[0]} of {part[1]}; extract only what appears in this part, "
+                 "use null or [] for everything else):\n")
     human = HumanMessage(content=(
-        "Resume text:\n" + text + "\n\nSchema (JSON) you must return exactly:\n" + schema_json
+        intro + text + "\n\nSchema (JSON) you must return exactly:\n" + _SCHEMA_JSON
     ))
-    
+    # Stream the reply and stop as soon as a complete (or repairable) object arrives
+    model, invalid = parse_llm_json(llm, [system, human], CVSchema)
+    if invalid:
+        logging.info(f"LLM CV output had invalid fields reset to defaults: {invalid}")
+    return model
+
+
+def parse_cv_llm(text: str, llm: Any) -> Dict[str, Any]:
+    """Parse resume text into CVSchema using LLM with strict JSON-only output.
+    Falls back to naive parsing if LLM fails.
+    """
     try:
-        resp = llm.invoke([system, human])
-        content = getattr(resp, "content", "").strip()
-        
-        # Try to extract and parse JSON robustly
-        raw_json = _extract_json_block(content)
-        try:
-            data = json.loads(raw_json)
-        except json.JSONDecodeError:
-            # Try once more with different extraction
-            raw_json = _extract_json_block(content)
-            data = json.loads(raw_json)
-        
-        model = CVSchema.model_validate(data)
+        model = _extract(text, llm)
         # Normalize skills
-        model.skills_explicit = sorted(set([s.strip().lower() for s in model.skills_explicit if s and s.strip()]))
+        model.skills_explicit = SkillSet.from_iterable(model.skills_explicit).to_list()
         return model.model_dump()
         
     except Exception as e:
         logging.warning(f"LLM parsing failed: {e}, falling back to naive parsing")
-        # Fallback to naive parsing
-        sections = naive_section_split(text)
-        skills = parse_skills_from_text(sections.get("skills", "")) if sections.get("skills") else []
-        return {
-            "name": None,
-            "summary": sections.get("summary", ""),
-            "skills_explicit": skills,
-            "experiences": [],
-            "projects": [],
-            "education": sections.get("education", ""),
-        }
+        FALLBACKS.inc(component="parse_cv")
+        return parse_cv_fallback(text)
+
+
+def _split_long(segment: str, max_chars: int) -> List[str]:
+    """Split an oversized section at paragraph, then line, boundaries; continuations repeat its header line."""
+    header = segment.split("\n", 1)[0].strip()
+    pieces: List[str] = []
+    current = ""
+    for block in re.split(r"(\n\s*\n)", segment):
+        units = [block] if len(block) <= max_chars else block.splitlines(keepends=True)
+        for unit in units:
+            while len(unit) > max_chars:  # a single huge line: hard cut
+                pieces.append(current + unit[:max_chars - len(current)])
+                unit, current = unit[max_chars - len(current):], ""
+            if current and len(current) + len(unit) > max_chars:
+                pieces.append(current)
+                current = ""
+            current += unit
+    if current.strip():
+        pieces.append(current)
+    return [p if i == 0 else f"{header} (continued)\n{p}" for i, p in enumerate(pieces)]
+
+
+def chunk_cv(text: str, max_chars: int = CHUNK_CHARS) -> List[str]:
+    """Split a CV into chunks of at most ~``max_chars``, cutting at section headers where possible.
+
+    Every match of SECTION_PATTERNS (at a line start) is a split hint; consecutive sections are
+    packed together while they fit, and oversized sections are split at paragraph boundaries.
+    """
+    t = text.replace("\r", "")
+    starts = sorted({0} | {
+        m.start() for pat in SECTION_PATTERNS.values()
+        for m in re.finditer(r"(?im)^[ \t#*]*" + pat, t)
+    })
+    segments = [t[a:b] for a, b in zip(starts, starts[1:] + [len(t)]) if t[a:b].strip()]
+    chunks: List[str] = []
+    current = ""
+    for seg in segments:
+        if len(seg) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split_long(seg, max_chars))
+        elif current and len(current) + len(seg) > max_chars:
+            chunks.append(current)
+            current = seg
+        else:
+            current += seg
+    if current.strip():
+        chunks.append(current)
+    return [c.strip() for c in chunks if c.strip()]
+
+
+def _norm(value: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", (value or "").strip().lower())
+
+
+def _union_in_order(*lists: List[str]) -> List[str]:
+    seen: Dict[str, str] = {}
+    for items in lists:
+        for item in items:
+            if item and _norm(item) not in seen:
+                seen[_norm(item)] = item
+    return list(seen.values())
+
+
+def merge_partial_cvs(parts: List[CVSchema]) -> CVSchema:
+    """Deterministically merge chunk extractions, given in document order.
+
+    Scalars take the first non-empty value, skills are a deduplicated union, and experiences
+    (by company/title/period) and projects (by name) that span chunks are merged into their
+    first occurrence, keeping document order.
+    """
+    merged = CVSchema()
+    experiences: Dict[Tuple[str, str, str], CVExperience] = {}
+    projects: Dict[str, CVProject] = {}
+    education: List[str] = []
+    for part in parts:
+        merged.name = merged.name or part.name
+        merged.summary = merged.summary or part.summary
+        for exp in part.experiences:
+            key = (_norm(exp.company), _norm(exp.title), _norm(exp.period))
+            if key == ("", "", "") and exp.bullets and experiences:
+                # An untitled continuation of the previous chunk's last role
+                key = next(reversed(experiences))
+            if key in experiences:
+                experiences[key].bullets = _union_in_order(experiences[key].bullets, exp.bullets)
+            else:
+                experiences[key] = exp.model_copy(update={"bullets": _union_in_order(exp.bullets)})
+        for proj in part.projects:
+            key = _norm(proj.name) or _norm(proj.description)
+            if key in projects:
+                seen = projects[key]
+                seen.description = seen.description or proj.description
+                seen.tech = _union_in_order(seen.tech, proj.tech)
+            else:
+                projects[key] = proj.model_copy(update={"tech": _union_in_order(proj.tech)})
+        if part.education:
+            education.append(part.education.strip())
+    merged.skills_explicit = SkillSet.from_iterable(s for part in parts for s in part.skills_explicit).to_list()
+    merged.experiences = list(experiences.values())
+    merged.projects = list(projects.values())
+    merged.education = "\n".join(_union_in_order(education)) or None
+    return merged
+
+
+def parse_cv_map_reduce(text: str, llm: Any, max_chars: int = CHUNK_CHARS) -> Dict[str, Any]:
+    """Parse a long CV by extracting section-aware chunks in parallel and merging the partial results.
+
+    A chunk whose extraction fails contributes its rule-based parse instead; if every chunk
+    fails, the whole CV falls back to naive parsing.
+    """
+    chunks = chunk_cv(text, max_chars)
+    if len(chunks) <= 1:
+        return parse_cv_llm(text, llm)
+
+    def extract(i: int) -> Optional[CVSchema]:
+        try:
+            return _extract(chunks[i], llm, part=(i + 1, len(chunks)))
+        except Exception as e:
+            logging.warning(f"LLM parsing of chunk {i + 1}/{len(chunks)} failed: {e}")
+            FALLBACKS.inc(component="parse_cv_chunk")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(MAX_CHUNK_WORKERS, len(chunks))) as pool:
+        results = list(pool.map(extract, range(len(chunks))))
+    if not any(results):
+        return parse_cv_fallback(text)
+    parts = [r if r is not None else CVSchema.model_validate(parse_cv_fallback(chunk))
+             for r, chunk in zip(results, chunks)]
+    return merge_partial_cvs(parts).model_dump()
 
 
 def parse_cv_to_structured(text: str, llm: Any) -> Dict[str, Any]:
-    """Main entry point for CV parsing. Tries LLM-based parsing first, falls back to naive on failure."""
+    """Main entry point for CV parsing. Tries LLM-based parsing first, falls back to naive on failure.
+
+    Long CVs (over LONG_CV_CHARS) are chunked and parsed in parallel.
+    """
+    if len(text) > LONG_CV_CHARS:
+        return parse_cv_map_reduce(text, llm)
     return parse_cv_llm(text, llm)
@@ -1,9 +1,13 @@
 from __future__ import annotations
 import json
 import re
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 from pydantic import BaseModel, Field
 from langchain.schema import SystemMessage, HumanMessage
+from ..evidence import evidence_spans, quote, score_evidence
+from ..json_stream import parse_llm_json
+from ..metrics import FALLBACKS
+from ..skills import SkillSet
 
 
 # -------- Data models --------
@@ -17,22 +21,51 @@ class WeekPlan(BaseModel):
     tasks: List[str] = Field(default_factory=list)
 
 
+class ReportProse(BaseModel):
+    """The only part of a hybrid report written by the LLM; the tables and plan are deterministic."""
+    overview: str = ""
+    notes: Dict[str, str] = Field(default_factory=dict)
+    final_notes: str = ""
+
+
 class ReportData(BaseModel):
     overview: str = ""
     strengths: List[TableItem] = Field(default_factory=list)
     gaps: List[TableItem] = Field(default_factory=list)
     plan_weeks: List[WeekPlan] = Field(default_factory=list)
     final_notes: str = ""
+    # Pipeline stages that fell back to heuristics (e.g. time budget ran out); set by the pipeline
+    degraded: List[str] = Field(default_factory=list)
+
+
+DEGRADED_LABELS = {
+    "english": {"parse": "CV parsing", "analyze": "skill analysis", "market": "market intelligence", "report": "report narrative"},
+    "indonesia": {"parse": "parsing CV", "analyze": "analisis skill", "market": "intelijen pasar", "report": "narasi laporan"},
+}
+
+
+def _degraded_note(report: ReportData, language: str) -> List[str]:
+    if not report.degraded:
+        return []
+    labels = DEGRADED_LABELS[language]
+    names = ", ".join(labels.get(d, d) for d in report.degraded)
+    if language == "indonesia":
+        return ["", f"_Catatan: bagian berikut dibuat dengan fallback heuristik (tanpa LLM) karena batas waktu: {names}._"]
+    return ["", f"_Note: the following parts were produced by heuristic fallbacks (no LLM) because the time budget ran out: {names}._"]
+
+
+# Evidence spans matching less than this share of a skill's terms are not reported
+EVIDENCE_MIN_COVERAGE = 0.5
 
 
 # -------- Helpers --------
-def _diff_lists(candidate: List[str], market: List[str]) -> Dict[str, List[str]]:
-    set_c = set([x.lower() for x in candidate])
-    set_m = set([x.lower() for x in market])
+def _diff_lists(candidate: Iterable[str] | SkillSet, market: Iterable[str] | SkillSet) -> Dict[str, List[str]]:
+    set_c = SkillSet.from_iterable(candidate)
+    set_m = SkillSet.from_iterable(market)
     return {
-        "strengths": sorted(set_c.intersection(set_m)),
-        "gaps": sorted(set_m - set_c),
-        "extras": sorted(set_c - set_m),
+        "strengths": (set_c & set_m).to_list(),
+        "gaps": (set_m - set_c).to_list(),
+        "extras": (set_c - set_m).to_list(),
     }
 
 
@@ -54,7 +87,8 @@ def build_report_prompt(language: str, context: Dict[str, Any]) -> List[Any]:
         "SCHEMA (JSON shape example):",
         schema_example,
         "CONTEXT:",
-        json.dumps(context, ensure_ascii=False),
+        # Evidence quotes are attached to the notes afterwards (attach_evidence); in the prompt they only add tokens
+        json.dumps({k: v for k, v in context.items() if k != "evidence"}, ensure_ascii=False),
         "REQUIREMENTS:",
         "- strengths/gaps are concrete technical skills with short justification in notes.",
         "- plan_weeks length 2–4, each with 3–5 actionable tasks.",
@@ -64,15 +98,28 @@ def build_report_prompt(language: str, context: Dict[str, Any]) -> List[Any]:
     return [sys, user]
 
 
-def _extract_json_block(text: str) -> str:
-    t = text.strip()
-    # Strip code fences if any
-    t = re.sub(r"^```[a-zA-Z]*\n|```$", "", t, flags=re.MULTILINE)
-    # Find first {...}
-    m = re.search(r"\{[\s\S]*\}", t)
-    if m:
-        return t[m.start():m.end()]
-    return t
+def build_prose_prompt(language: str, context: Dict[str, Any], strengths: List[str], gaps: List[str]) -> List[Any]:
+    """Small prompt for hybrid reports: only the overview, one note per listed skill and final notes."""
+    is_id = (language or "").lower().startswith("indo")
+    sys = SystemMessage(content=(
+        "You write short report prose for a CV analysis. Return ONLY JSON, no markdown, no code fences."
+    ))
+    facts = {
+        "role": context.get("role", ""),
+        "summary": (context.get("summary") or "")[:400],
+        "strengths": strengths,
+        "gaps": gaps,
+    }
+    parts = [
+        "LANGUAGE: indonesian" if is_id else "LANGUAGE: english",
+        "FACTS:",
+        json.dumps(facts, ensure_ascii=False),
+        "Return exactly this JSON:",
+        '{"overview": "2-3 sentences", "notes": {"<skill from strengths or gaps>": "one short sentence"}, "final_notes": "1-2 sentences"}',
+        "- Write one note for every skill in strengths and gaps, using the skill names as given.",
+        "- Do not add or remove skills.",
+    ]
+    return [sys, HumanMessage(content="\n".join(parts))]
 
 
 def _default_weeks_from_gaps(gaps: List[TableItem], language: str) -> List[WeekPlan]:
@@ -102,51 +149,100 @@ def validate_report_data(rd: ReportData, language: str, context: Dict[str, Any])
         rd.plan_weeks = _default_weeks_from_gaps(rd.gaps, language)
 
 
-def generate_report_data(llm: Any, language: str, context: Dict[str, Any]) -> ReportData:
+def fallback_report_data(language: str, context: Dict[str, Any]) -> ReportData:
+    """Minimal ReportData built from the set diff alone, used when the LLM cannot help."""
+    is_id = (language or "").lower().startswith("indo")
+    strengths = [TableItem(skill=s, notes="terkait kebutuhan pasar") for s in context.get("diff", {}).get("strengths", [])][:5]
+    gaps = [TableItem(skill=s, notes="prioritas belajar") for s in context.get("diff", {}).get("gaps", [])][:5]
+    if not strengths and not gaps:
+        gaps = [TableItem(skill="-", notes=("Belum teridentifikasi" if is_id else "Not identified yet"))]
+    return ReportData(
+        overview=context.get("summary", "")[:600],
+        strengths=strengths,
+        gaps=gaps,
+        plan_weeks=_default_weeks_from_gaps(gaps, language),
+        final_notes=("Gunakan rencana belajar untuk menutup kesenjangan utama." if is_id else "Follow the upskilling plan to close key gaps."),
+    )
+
+
+def template_report_data(language: str, context: Dict[str, Any], limit: int = 10) -> ReportData:
+    """Deterministic ReportData from the ``_diff_lists`` output, for LLM-free screening."""
+    is_id = (language or "").lower().startswith("indo")
+    diff = context.get("diff", {})
+    strengths_all, gaps_all = diff.get("strengths", []), diff.get("gaps", [])
+    wanted = len(strengths_all) + len(gaps_all)
+    coverage = len(strengths_all) / wanted if wanted else 0.0
+    role = context.get("role", "") or ("role target" if is_id else "the target role")
+    strengths = [TableItem(skill=s, notes=("sesuai kebutuhan pasar" if is_id else "matches market demand")) for s in strengths_all[:limit]]
+    gaps = [TableItem(skill=s, notes=("diminta pasar, belum terlihat di CV" if is_id else "in demand, not evidenced in CV")) for s in gaps_all[:limit]]
+    if not strengths and not gaps:
+        gaps = [TableItem(skill="-", notes=("Belum teridentifikasi" if is_id else "Not identified yet"))]
+    if is_id:
+        overview = f"Kandidat memenuhi {len(strengths_all)} dari {wanted} skill pasar untuk {role} ({coverage:.0%})."
+        top = ", ".join(gaps_all[:3])
+        final = f"Prioritaskan: {top}." if top else "Tidak ada kesenjangan utama terhadap daftar skill pasar."
+    else:
+        overview = f"Candidate covers {len(strengths_all)} of {wanted} market skills for {role} ({coverage:.0%})."
+        top = ", ".join(gaps_all[:3])
+        final = f"Prioritize: {top}." if top else "No key gaps against the market skill list."
+    summary = (context.get("summary") or "").strip()
+    if summary:
+        overview += " " + summary[:300]
+    return ReportData(
+        overview=overview,
+        strengths=strengths,
+        gaps=gaps,
+        plan_weeks=_default_weeks_from_gaps(gaps, language),
+        final_notes=final,
+    )
+
+
+def generate_report_data(llm: Any, language: str, context: Dict[str, Any], strict: bool = False) -> ReportData:
+    """LLM-written report; falls back to ``fallback_report_data`` on failure unless ``strict``, which raises instead."""
     messages = build_report_prompt(language, context)
     try:
-        resp = llm.invoke(messages)
-        content = getattr(resp, "content", "").strip()
-    except Exception as e:
-        # LLM failed, fallback
-        strengths = [TableItem(skill=s, notes="terkait kebutuhan pasar") for s in context.get("diff", {}).get("strengths", [])][:5]
-        gaps = [TableItem(skill=s, notes="prioritas belajar") for s in context.get("diff", {}).get("gaps", [])][:5]
-        if not strengths and not gaps:
-            if (language or "").lower().startswith("indo"):
-                gaps = [TableItem(skill="-", notes="Belum teridentifikasi")]
-            else:
-                gaps = [TableItem(skill="-", notes="Not identified yet")]
-        return ReportData(
-            overview=context.get("summary", "")[:600],
-            strengths=strengths,
-            gaps=gaps,
-            plan_weeks=_default_weeks_from_gaps(gaps, language),
-            final_notes=("Gunakan rencana belajar untuk menutup kesenjangan utama." if (language or "").lower().startswith("indo") else "Follow the upskilling plan to close key gaps."),
-        )
-
-    raw = _extract_json_block(content)
-    try:
-        data = json.loads(raw)
-        rd = ReportData.model_validate(data)
+        # Stream the reply; a truncated or slightly malformed object is repaired, bad fields dropped
+        rd, _invalid = parse_llm_json(llm, messages, ReportData)
     except Exception:
-        # Attempt salvage once more
-        try:
-            data = json.loads(_extract_json_block(raw))
-            rd = ReportData.model_validate(data)
-        except Exception:
-            # fallback minimal
-            return ReportData(
-                overview=context.get("summary", "")[:600],
-                strengths=[TableItem(skill=s, notes="sesuai pasar") for s in context.get("diff", {}).get("strengths", [])][:5],
-                gaps=[TableItem(skill=s, notes="prioritas belajar") for s in context.get("diff", {}).get("gaps", [])][:5] or [TableItem(skill="-", notes=("Belum teridentifikasi" if (language or "").lower().startswith("indo") else "Not identified yet"))],
-                plan_weeks=_default_weeks_from_gaps([TableItem(skill=s, notes="") for s in context.get("diff", {}).get("gaps", [])], language),
-                final_notes=("Gunakan rencana belajar untuk menutup kesenjangan utama." if (language or "").lower().startswith("indo") else "Follow the upskilling plan to close key gaps."),
-            )
+        if strict:
+            raise
+        # LLM failed or returned no usable JSON, fallback
+        FALLBACKS.inc(component="report")
+        return fallback_report_data(language, context)
 
     validate_report_data(rd, language, context)
     return rd
 
 
+def hybrid_report_data(llm: Any, language: str, context: Dict[str, Any], limit: int = 10,
+                       strict: bool = False) -> ReportData:
+    """Deterministic tables and plan (as in ``template_report_data``) with LLM-written prose.
+
+    Only the overview, the per-skill notes and the final notes come from the model, so the
+    prompt and the reply are a fraction of ``generate_report_data``'s. Any prose the model
+    does not return keeps its template text. If the call fails the template report is
+    returned as is, or with ``strict`` the error is raised.
+    """
+    rd = template_report_data(language, context, limit)
+    messages = build_prose_prompt(
+        language, context,
+        [i.skill for i in rd.strengths], [i.skill for i in rd.gaps if i.skill != "-"],
+    )
+    try:
+        prose, _invalid = parse_llm_json(llm, messages, ReportProse)
+    except Exception:
+        if strict:
+            raise
+        FALLBACKS.inc(component="report_prose")
+        return rd
+    notes = {k.strip().lower(): v.strip() for k, v in prose.notes.items() if v and v.strip()}
+    for item in rd.strengths + rd.gaps:
+        item.notes = notes.get(item.skill.lower(), item.notes)
+    rd.overview = prose.overview.strip() or rd.overview
+    rd.final_notes = prose.final_notes.strip() or rd.final_notes
+    return rd
+
+
 def postprocess_markdown(md: str, language: str) -> str:
     s = md.replace("\r\n", "\n").replace("\r", "\n")
     # Collapse 3+ blank lines to 2
@@ -188,6 +284,7 @@ def render_markdown_id(report: ReportData) -> str:
         for t in wk.tasks or ["-"]:
             lines.append(f"- {t}")
     lines += ["", "## Catatan Akhir", report.final_notes.strip() or "-"]
+    lines += _degraded_note(report, "indonesia")
     md = "\n".join(lines)
     return postprocess_markdown(md, "indonesia")
 
@@ -214,6 +311,7 @@ def render_markdown_en(report: ReportData) -> str:
         for t in wk.tasks or ["-"]:
             lines.append(f"- {t}")
     lines += ["", "## Final Notes", report.final_notes.strip() or "-"]
+    lines += _degraded_note(report, "english")
     md = "\n".join(lines)
     return postprocess_markdown(md, "english")
 
@@ -243,26 +341,84 @@ def validate_markdown(md: str, language: str) -> List[str]:
     return issues
 
 
-def make_report(cv_structured: Dict[str, Any],
-                analyzed_skills: Dict[str, Any],
-                market: Dict[str, Any],
-                llm: Any,
-                language: str,
-                style: Dict[str, Any] | None = None) -> str:
+def build_report_context(cv_structured: Dict[str, Any],
+                         analyzed_skills: Dict[str, Any],
+                         market: Dict[str, Any]) -> Dict[str, Any]:
     explicit = analyzed_skills.get("explicit_skills", [])
     implicit = analyzed_skills.get("implicit_skills", [])
     market_sk = market.get("skills", [])
-    diff = _diff_lists(explicit + implicit, market_sk)
-    context = {
-        "summary": cv_structured.get("summary", "")[:800],
+    diff = _diff_lists(SkillSet.from_iterable(explicit) | SkillSet.from_iterable(implicit), market_sk)
+    # Where the CV's bullets and project descriptions evidence each matched or missing market skill
+    evidence = score_evidence(evidence_spans(cv_structured), diff["strengths"] + diff["gaps"])
+    return {
+        "summary": (cv_structured.get("summary") or "")[:800],
         "explicit": explicit,
         "implicit": implicit,
         "market": market_sk,
         "diff": diff,
+        "evidence": {
+            skill: {"quote": quote(ev["span"]), "coverage": ev["coverage"], "mentions": ev["mentions"]}
+            for skill, ev in evidence.items() if ev["coverage"] >= EVIDENCE_MIN_COVERAGE
+        },
         "role": market.get("role", ""),
         "source": market.get("source", "")
     }
-    rd = generate_report_data(llm, language, context)
+
+
+def attach_evidence(rd: ReportData, context: Dict[str, Any], language: str) -> ReportData:
+    """Append the best CV evidence span (from ``build_report_context``) to the strengths and gaps notes.
+
+    A gap whose name does appear in the CV is flagged as mentioned but not listed as a skill.
+    """
+    is_id = (language or "").lower().startswith("indo")
+    evidence = context.get("evidence") or {}
+
+    def add(item: TableItem, label: str, ev: Dict[str, Any]) -> None:
+        more = ev["mentions"] - 1
+        suffix = (f" (+{more} lainnya)" if is_id else f" (+{more} more)") if more > 0 else ""
+        note = f"{label}: {ev['quote']}{suffix}"
+        item.notes = f"{item.notes.strip().rstrip('.;')}; {note}" if item.notes.strip() else note
+
+    for item in rd.strengths:
+        ev = evidence.get(item.skill.lower())
+        if ev:
+            add(item, "bukti" if is_id else "evidence", ev)
+    for item in rd.gaps:
+        ev = evidence.get(item.skill.lower())
+        if ev:
+            if ev["coverage"] >= 1.0:
+                add(item, "disebut di CV" if is_id else "mentioned in CV", ev)
+            else:
+                add(item, "terdekat" if is_id else "closest", ev)
+    return rd
+
+
+def render_markdown(report: ReportData, language: str) -> str:
     if (language or "").lower().startswith("indo"):
-        return render_markdown_id(rd)
-    return render_markdown_en(rd)
+        return render_markdown_id(report)
+    return render_markdown_en(report)
+
+
+def make_report_data(cv_structured: Dict[str, Any],
+                     analyzed_skills: Dict[str, Any],
+                     market: Dict[str, Any],
+                     llm: Any,
+                     language: str,
+                     mode: str = "full",
+                     strict: bool = False) -> ReportData:
+    context = build_report_context(cv_structured, analyzed_skills, market)
+    if mode == "hybrid":
+        rd = hybrid_report_data(llm, language, context, strict=strict)
+    else:
+        rd = generate_report_data(llm, language, context, strict=strict)
+    return attach_evidence(rd, context, language)
+
+
+def make_report(cv_structured: Dict[str, Any],
+                analyzed_skills: Dict[str, Any],
+                market: Dict[str, Any],
+                llm: Any,
+                language: str,
+                style: Dict[str, Any] | None = None) -> str:
+    rd = make_report_data(cv_structured, analyzed_skills, market, llm, language)
+    return render_markdown(rd, language)
@@ -1,6 +1,14 @@
 from __future__ import annotations
-from typing import Any, Dict, List
+import json
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field
 from langchain.schema import HumanMessage, SystemMessage
+from ..json_stream import parse_llm_json
+from ..metrics import FALLBACKS
+from ..skills import SKILL_ALIASES, SkillSet
 
 # Beberapa keyword heuristik biar tetap bisa jalan tanpa LLM
 IMPLICIT_MAP = {
@@ -22,6 +30,42 @@ IMPLICIT_MAP = {
     "huggingface": ["transformers", "tokenizers", "datasets"]
 }
 
+TECH_KEYWORDS = {
+    'api', 'sql', 'nosql', 'rest', 'graphql', 'json', 'xml', 'html', 'css', 'javascript',
+    'python', 'java', 'golang', 'rust', 'scala', 'kotlin', 'swift', 'typescript',
+    'react', 'vue', 'angular', 'node', 'express', 'django', 'flask', 'spring',
+    'aws', 'azure', 'gcp', 'docker', 'kubernetes', 'terraform', 'ansible',
+    'git', 'github', 'gitlab', 'jenkins', 'cicd', 'devops', 'microservices',
+    'mongodb', 'postgresql', 'mysql', 'redis', 'elasticsearch', 'kafka',
+    'tensorflow', 'pytorch', 'sklearn', 'pandas', 'numpy', 'jupyter'
+}
+
+# Extra terms for the LLM-free lexicon extractor, on top of TECH_KEYWORDS and IMPLICIT_MAP keys
+LEXICON_EXTRA = {
+    'c++', 'c#', 'go', 'r', 'bash', 'linux', 'sqlite', 'postgres', 'oracle', 'snowflake', 'bigquery',
+    'redshift', 'databricks', 'spark', 'pyspark', 'hadoop', 'hive', 'flink', 'dbt', 'kafka streams',
+    'fastapi', 'streamlit', 'next.js', 'node.js', 'tailwind', 'grpc', 'rabbitmq', 'celery', 'nginx',
+    'prometheus', 'grafana', 'helm', 'argo', 'github actions', 'ci/cd', 'mlops', 'llm', 'nlp',
+    'computer vision', 'opencv', 'xgboost', 'lightgbm', 'keras', 'jax', 'transformers', 'embeddings',
+    'vector db', 'pinecone', 'chroma', 'milvus', 'qdrant', 'llamaindex', 'openai', 'prompt engineering',
+    'power bi', 'tableau', 'excel', 'matplotlib', 'scipy', 'stm32', 'esp32', 'arduino', 'mqtt', 'iot',
+    'embedded c', 'rtos', 'ros', 'unity', 'figma',
+}
+
+# Spelling variants folded onto one canonical skill (shared with every skill comparison)
+LEXICON_ALIASES = SKILL_ALIASES
+
+# Technology names that are also everyday English words ("the rest of", "go live", "excel at").
+# Free text counts them only in the unambiguous forms of LEXICON_CONTEXT; the Skills section,
+# parsed separately, still lists them as written.
+LEXICON_AMBIGUOUS = {'go', 'r', 'rest', 'express', 'spring', 'excel', 'node', 'swift', 'ts'}
+LEXICON_CONTEXT = {
+    'rest api': 'rest', 'rest apis': 'rest', 'restful': 'rest', 'spring boot': 'spring', 'spring framework': 'spring',
+    'express.js': 'express', 'expressjs': 'express', 'microsoft excel': 'excel', 'ms excel': 'excel',
+    'r programming': 'r', 'rstudio': 'r', 'go lang': 'go',
+}
+
+
 def _is_tech_skill(token: str) -> bool:
     """Filter out obviously non-technical tokens."""
     token = token.strip().lower()
@@ -53,75 +97,236 @@ def _is_tech_skill(token: str) -> bool:
         return True
     
     # Keep if it's a known tech term (basic heuristic)
-    tech_keywords = {
-        'api', 'sql', 'nosql', 'rest', 'graphql', 'json', 'xml', 'html', 'css', 'javascript',
-        'python', 'java', 'golang', 'rust', 'scala', 'kotlin', 'swift', 'typescript',
-        'react', 'vue', 'angular', 'node', 'express', 'django', 'flask', 'spring',
-        'aws', 'azure', 'gcp', 'docker', 'kubernetes', 'terraform', 'ansible',
-        'git', 'github', 'gitlab', 'jenkins', 'cicd', 'devops', 'microservices',
-        'mongodb', 'postgresql', 'mysql', 'redis', 'elasticsearch', 'kafka',
-        'tensorflow', 'pytorch', 'sklearn', 'pandas', 'numpy', 'jupyter'
-    }
-    
-    return token in tech_keywords or len(token) >= 3
+    return token in TECH_KEYWORDS or len(token) >= 3
 
 
-def infer_implicit_skills(explicit: List[str]) -> List[str]:
-    result = set()
-    for token in explicit:
-        if token in IMPLICIT_MAP:
-            for v in IMPLICIT_MAP[token]:
-                result.add(v)
-    return sorted(result)
+_LEXICON_RE: Optional[re.Pattern] = None
 
-def analyze_skills(cv_structured: Dict[str, Any], llm: Any) -> Dict[str, Any]:
-    # Base explicit skills from LLM CV parser output (preferred key 'skills_explicit'; keep 'skills_list' for backward compat)
-    base_skills = cv_structured.get("skills_explicit") or cv_structured.get("skills_list") or []
-    explicit = sorted(set([s.lower().strip() for s in base_skills if s and s.strip()]))
 
-    # LLM pass to infer additional explicit skills from narrative text
-    narrative = "\n\n".join([
+def _lexicon_re() -> re.Pattern:
+    global _LEXICON_RE
+    if _LEXICON_RE is None:
+        terms = (TECH_KEYWORDS | LEXICON_EXTRA | set(IMPLICIT_MAP) | set(LEXICON_ALIASES)) - LEXICON_AMBIGUOUS
+        terms |= set(LEXICON_CONTEXT)
+        # Longest first so "kafka streams" wins over "kafka"; boundaries allow names like c++ / node.js
+        alternation = "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+        _LEXICON_RE = re.compile(rf"(?<![\w+#.])(?:{alternation})(?![\w+#-]|\.\w)", re.I)
+    return _LEXICON_RE
+
+
+def extract_skills_lexicon(text: str) -> SkillSet:
+    """LLM-free skill extraction: match known technology names in free text."""
+    found = set()
+    for m in _lexicon_re().finditer(text or ""):
+        term = m.group(0).lower()
+        found.add(LEXICON_CONTEXT.get(term, term))
+    return SkillSet.from_iterable(found)
+
+
+def infer_implicit_skills(explicit: List[str] | SkillSet, min_confidence: float = 0.0) -> Dict[str, float]:
+    """Implied skills with confidence scores, from the skill taxonomy (multi-hop, see src.taxonomy).
+
+    Without a compiled taxonomy (``CV_ANALYZER_TAXONOMY``) this is IMPLICIT_MAP, one hop deep.
+    """
+    from ..taxonomy import active_taxonomy
+    implied = active_taxonomy().implied(SkillSet.from_iterable(explicit), min_confidence)
+    return {skill: conf for skill, (conf, _hops) in sorted(implied.items())}
+
+
+def _narrative(cv_structured: Dict[str, Any]) -> str:
+    return "\n\n".join([
         str(cv_structured.get("summary", "")),
         str(cv_structured.get("experience", "")),
         str(cv_structured.get("projects", "")),
-        "\n".join([p.get("description", "") for p in cv_structured.get("projects", []) if isinstance(p, dict)])
+        "\n".join([p.get("description") or "" for p in cv_structured.get("projects", []) if isinstance(p, dict)])
     ]).strip()
-    
+
+
+def _llm_extra_skills(cv_structured: Dict[str, Any], explicit: SkillSet, llm: Any) -> SkillSet:
+    """LLM pass to infer additional explicit skills from narrative text."""
+    narrative = _narrative(cv_structured)
+
     messages = [
         SystemMessage(content=(
             "Extract concrete technical skills, tools, programming languages, frameworks, and libraries from text. "
             "Return ONLY a comma-separated list (lowercase). No prose, no explanations, no commentary."
         )),
         HumanMessage(content=(
-            f"TEXT:\n{narrative}\n\nCURRENT SKILLS:\n{', '.join(explicit)}\n\n"
+            f"TEXT:\n{narrative}\n\nCURRENT SKILLS:\n{', '.join(explicit.to_list())}\n\n"
             "Extract additional technical skills not already listed:"
         )),
     ]
-    
-    extra: List[str] = []
+
     try:
         resp = llm.invoke(messages)
         content = getattr(resp, "content", "").strip()
-        
+
         # Parse comma-separated response
-        candidates = [x.strip().lower() for x in content.split(",") if x.strip()]
-        
-        # Filter and deduplicate
-        extra = [
-            skill for skill in candidates 
-            if skill not in explicit and _is_tech_skill(skill)
-        ]
+        return _filter_extra([x.strip().lower() for x in content.split(",") if x.strip()], explicit)
     except Exception:
-        extra = []
+        FALLBACKS.inc(component="analyze_skills")
+        return SkillSet()
+
+
+def _filter_extra(candidates: List[str], explicit: SkillSet) -> SkillSet:
+    """Filter and deduplicate LLM-proposed skills."""
+    return SkillSet.from_iterable(
+        skill for skill in candidates
+        if skill not in explicit and _is_tech_skill(skill)
+    )
+
+
+# Narratives longer than this are not packed with others; they get a request of their own
+PACKED_MAX_DOC_CHARS = 4000
+
+
+class PackedSkills(BaseModel):
+    """Reply to a packed request: extra skills per document ID. Values are checked per ID."""
+    results: Dict[str, Any] = Field(default_factory=dict)
+
+
+def _packed_messages(docs: List[Tuple[str, str, SkillSet]]) -> List[Any]:
+    payload = [{"id": doc_id, "text": narrative, "current_skills": explicit.to_list()} for doc_id, narrative, explicit in docs]
+    return [
+        SystemMessage(content=(
+            "Extract concrete technical skills, tools, programming languages, frameworks, and libraries from each "
+            "document. Return ONLY JSON, no prose, no code fences."
+        )),
+        HumanMessage(content=(
+            f"DOCUMENTS:\n{json.dumps(payload, ensure_ascii=False)}\n\n"
+            'Return exactly: {"results": {"<id>": ["skill", ...]}} with one entry per document id, listing '
+            "lowercase skills found in its text that are not in its current_skills (an empty list if none)."
+        )),
+    ]
+
+
+def _packed_value(value: Any) -> Optional[List[str]]:
+    """One document's skills from a packed reply, or None when the entry is unusable."""
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        return None
+    return [v.strip().lower() for v in value if v.strip()]
+
+
+def extract_extra_skills_packed(llm: Any, items: List[Tuple[Dict[str, Any], SkillSet]]) -> List[Optional[SkillSet]]:
+    """One LLM request for several CVs' extra skills; None for each CV the reply did not cover validly."""
+    docs = [(f"cv{i + 1}", _narrative(cv), explicit) for i, (cv, explicit) in enumerate(items)]
+    try:
+        packed, _invalid = parse_llm_json(llm, _packed_messages(docs), PackedSkills)
+    except Exception:
+        return [None] * len(items)
+    out: List[Optional[SkillSet]] = []
+    for doc_id, _narr, explicit in docs:
+        skills = _packed_value(packed.results.get(doc_id))
+        out.append(None if skills is None else _filter_extra(skills, explicit))
+    return out
+
+
+class SkillBatcher:
+    """Coalesces concurrent ``analyze_skills`` LLM passes into packed multi-CV requests.
+
+    Callers (e.g. batch worker threads) block until their batch is sent: a batch goes out once it
+    holds ``max_batch`` CVs or ``max_wait_s`` after its first one arrived. CVs a packed reply does
+    not cover with a valid entry, and narratives over PACKED_MAX_DOC_CHARS, get individual calls,
+    made by each caller in its own thread so a failed packed request costs one extra round trip.
+    """
+
+    def __init__(self, llm: Any, max_batch: int = 8, max_wait_s: float = 0.05):
+        self.llm = llm
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_s
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[Dict[str, Any], SkillSet, Future]] = []
+        self._timer: Optional[threading.Timer] = None
+
+    def extra_skills(self, cv_structured: Dict[str, Any], explicit: SkillSet) -> SkillSet:
+        if self.max_batch <= 1 or len(_narrative(cv_structured)) > PACKED_MAX_DOC_CHARS:
+            return _llm_extra_skills(cv_structured, explicit, self.llm)
+        fut: Future = Future()
+        batch = None
+        with self._lock:
+            self._pending.append((cv_structured, explicit, fut))
+            if len(self._pending) >= self.max_batch:
+                batch = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.max_wait_s, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._send(batch)
+        extra = fut.result()
+        if extra is None:
+            # Not covered by the packed reply (or the batch was just this CV): ask on our own
+            extra = _llm_extra_skills(cv_structured, explicit, self.llm)
+        return extra
+
+    def _take(self) -> List[Tuple[Dict[str, Any], SkillSet, Future]]:
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self) -> None:
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch: List[Tuple[Dict[str, Any], SkillSet, Future]]) -> None:
+        """Resolve each future with its packed result, or None for the caller to make its own call."""
+        try:
+            if len(batch) == 1:
+                results: List[Optional[SkillSet]] = [None]
+            else:
+                results = extract_extra_skills_packed(self.llm, [(cv, explicit) for cv, explicit, _ in batch])
+            for (_cv, _explicit, fut), extra in zip(batch, results):
+                if extra is None and len(batch) > 1:
+                    FALLBACKS.inc(component="analyze_skills_packed")
+                fut.set_result(extra)
+        except Exception as e:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+
+
+def analyze_skills(cv_structured: Dict[str, Any], llm: Any, batcher: Optional[SkillBatcher] = None) -> Dict[str, Any]:
+    """Explicit + implicit skills. Pass ``llm=None`` to skip the LLM pass (explicit skills from the parser only).
+
+    With a ``batcher`` the LLM pass is packed with other CVs analyzed at the same time.
+    """
+    # Base explicit skills from LLM CV parser output (preferred key 'skills_explicit'; keep 'skills_list' for backward compat)
+    base_skills = cv_structured.get("skills_explicit") or cv_structured.get("skills_list") or []
+    explicit = SkillSet.from_iterable(base_skills)
+
+    if batcher is not None:
+        extra = batcher.extra_skills(cv_structured, explicit)
+    else:
+        extra = _llm_extra_skills(cv_structured, explicit, llm) if llm is not None else SkillSet()
 
     # Combine and deduplicate all explicit skills
-    combined = sorted(set(explicit + extra))
-    
+    combined = explicit | extra
+
     # Infer implicit skills from the combined explicit skills
     implicit = infer_implicit_skills(combined)
 
     return {
-        "explicit_skills": combined,
-        "implicit_skills": implicit,
-        "notes": "Implicit inferred via mapping; extra explicit via LLM."
+        "explicit_skills": combined.to_list(),
+        "implicit_skills": list(implicit),
+        "implicit_confidence": implicit,
+        "notes": "Implicit inferred via mapping; extra explicit via LLM." if llm is not None else "Implicit inferred via mapping; no LLM pass."
+    }
+
+
+def analyze_skills_lexicon(cv_structured: Dict[str, Any], raw_text: str) -> Dict[str, Any]:
+    """LLM-free skill analysis: parser skills plus lexicon matches over the whole CV text."""
+    base_skills = cv_structured.get("skills_explicit") or cv_structured.get("skills_list") or []
+    combined = SkillSet.from_iterable(base_skills) | extract_skills_lexicon(raw_text)
+    implicit = infer_implicit_skills(combined)
+    return {
+        "explicit_skills": combined.to_list(),
+        "implicit_skills": list(implicit),
+        "implicit_confidence": implicit,
+        "notes": "Explicit via section parsing + lexicon; implicit via mapping; no LLM."
     }
@@ -0,0 +1,151 @@
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Tuple
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+from .skills import SkillVocab
+
+# Kind codes used in the encoded cohort; "candidate" is explicit ∪ implicit as in make_report
+_KIND_CODES = {"explicit": 0, "implicit": 0, "market": 1, "strength": 2, "gap": 3}
+
+
+class Cohort(BaseModel):
+    """Runs encoded as boolean run × skill matrices over a shared skill-ID vocabulary."""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    skills: List[str]          # skill ID -> name
+    run_ids: np.ndarray        # (n_runs,)
+    roles: List[str]           # (n_runs,) role key per run
+    candidate: np.ndarray      # (n_runs, n_skills) explicit ∪ implicit
+    market: np.ndarray         # (n_runs, n_skills)
+    reported_strengths: np.ndarray  # (n_runs, n_skills) from ReportData
+    reported_gaps: np.ndarray       # (n_runs, n_skills) from ReportData
+
+    @property
+    def size(self) -> int:
+        return len(self.run_ids)
+
+    def diff(self, source: str = "diff") -> Dict[str, np.ndarray]:
+        """Vectorized ``_diff_lists`` over every run, or the ReportData tables with ``source='report'``."""
+        if source == "report":
+            return {
+                "strengths": self.reported_strengths,
+                "gaps": self.reported_gaps,
+                "extras": self.candidate & ~self.market,
+            }
+        return {
+            "strengths": self.candidate & self.market,
+            "gaps": self.market & ~self.candidate,
+            "extras": self.candidate & ~self.market,
+        }
+
+
+def encode_cohort(rows: Iterable[Tuple[int, str, str, str]]) -> Cohort:
+    """Encode (run_id, role_key, skill, kind) rows, as produced by ResultStore.iter_skill_rows."""
+    vocab = SkillVocab()  # cohort-local, so skill IDs are dense matrix columns
+    run_index: Dict[int, int] = {}
+    roles: List[str] = []
+    r_idx: List[int] = []
+    s_idx: List[int] = []
+    k_idx: List[int] = []
+    for run_id, role_key, skill, kind in rows:
+        code = _KIND_CODES.get(kind)
+        if code is None:
+            continue
+        i = run_index.get(run_id)
+        if i is None:
+            i = run_index[run_id] = len(roles)
+            roles.append(role_key)
+        r_idx.append(i)
+        s_idx.append(vocab.intern(skill))
+        k_idx.append(code)
+
+    shape = (len(roles), len(vocab))
+    mats = np.zeros((4,) + shape, dtype=bool)
+    if r_idx:
+        mats[np.asarray(k_idx), np.asarray(r_idx), np.asarray(s_idx)] = True
+    return Cohort(
+        skills=list(vocab.names),
+        run_ids=np.fromiter(run_index, dtype=np.int64, count=len(run_index)),
+        roles=roles,
+        candidate=mats[0],
+        market=mats[1],
+        reported_strengths=mats[2],
+        reported_gaps=mats[3],
+    )
+
+
+def gap_histogram(cohort: Cohort, source: str = "diff", top: int = 20) -> List[Tuple[str, int, float]]:
+    """Most common gaps: (skill, runs with the gap, share of runs)."""
+    gaps = cohort.diff(source)["gaps"]
+    counts = gaps.sum(axis=0)
+    order = np.argsort(-counts, kind="stable")[:top]
+    n = max(cohort.size, 1)
+    return [(cohort.skills[j], int(counts[j]), float(counts[j]) / n) for j in order if counts[j] > 0]
+
+
+def gap_cooccurrence(cohort: Cohort, source: str = "diff", top: int = 10) -> Tuple[List[str], np.ndarray]:
+    """Co-occurrence counts among the ``top`` most common gaps (diagonal = gap frequency)."""
+    gaps = cohort.diff(source)["gaps"]
+    counts = gaps.sum(axis=0)
+    order = [j for j in np.argsort(-counts, kind="stable")[:top] if counts[j] > 0]
+    sub = gaps[:, order].astype(np.int32)
+    return [cohort.skills[j] for j in order], sub.T @ sub
+
+
+def coverage_by_role(cohort: Cohort, source: str = "diff", bins: int = 10) -> Dict[str, Dict[str, Any]]:
+    """Per-role distribution of market coverage (matched market skills / market skills)."""
+    d = cohort.diff(source)
+    matched = d["strengths"].sum(axis=1)
+    wanted = matched + d["gaps"].sum(axis=1)
+    coverage = np.divide(matched, wanted, out=np.zeros(cohort.size, dtype=float), where=wanted > 0)
+    roles = np.asarray(cohort.roles, dtype=object)
+    out: Dict[str, Dict[str, Any]] = {}
+    for role in sorted(set(cohort.roles)):
+        cov = coverage[roles == role]
+        hist, _ = np.histogram(cov, bins=bins, range=(0.0, 1.0))
+        p25, p50, p75 = np.percentile(cov, [25, 50, 75])
+        out[role] = {
+            "runs": int(cov.size),
+            "mean": float(cov.mean()),
+            "p25": float(p25),
+            "median": float(p50),
+            "p75": float(p75),
+            "histogram": hist.tolist(),
+        }
+    return out
+
+
+def cohort_summary(cohort: Cohort, source: str = "diff", top: int = 20, cooc_top: int = 10) -> Dict[str, Any]:
+    labels, cooc = gap_cooccurrence(cohort, source, cooc_top)
+    return {
+        "runs": cohort.size,
+        "skills": len(cohort.skills),
+        "source": source,
+        "gap_histogram": [{"skill": s, "runs": c, "share": round(p, 4)} for s, c, p in gap_histogram(cohort, source, top)],
+        "cooccurrence": {"skills": labels, "matrix": cooc.tolist()},
+        "coverage_by_role": coverage_by_role(cohort, source),
+    }
+
+
+def render_cohort_markdown(summary: Dict[str, Any], title: str = "Cohort Skill-Gap Report") -> str:
+    lines: List[str] = [f"# {title}", "", f"Runs: {summary['runs']} • Distinct skills: {summary['skills']} • Source: {summary['source']}"]
+    lines += ["", "## Most Common Gaps", "| Skill | Runs | Share |", "|---|---|---|"]
+    for row in summary["gap_histogram"] or [{"skill": "-", "runs": 0, "share": 0.0}]:
+        lines.append(f"| {row['skill']} | {row['runs']} | {row['share']:.1%} |")
+
+    labels = summary["cooccurrence"]["skills"]
+    lines += ["", "## Gap Co-occurrence"]
+    if labels:
+        lines.append("| | " + " | ".join(labels) + " |")
+        lines.append("|---" * (len(labels) + 1) + "|")
+        for name, row in zip(labels, summary["cooccurrence"]["matrix"]):
+            lines.append(f"| **{name}** | " + " | ".join(str(v) for v in row) + " |")
+    else:
+        lines.append("-")
+
+    lines += ["", "## Market Coverage by Role", "| Role | Runs | Mean | P25 | Median | P75 | Distribution (0–100%) |", "|---|---|---|---|---|---|---|"]
+    for role, st in summary["coverage_by_role"].items():
+        peak = max(st["histogram"]) or 1
+        spark = "".join(" ▁▂▃▄▅▆▇█"[round(8 * h / peak)] for h in st["histogram"])
+        lines.append(f"| {role} | {st['runs']} | {st['mean']:.0%} | {st['p25']:.0%} | {st['median']:.0%} | {st['p75']:.0%} | `{spark}` |")
+    return "\n".join(lines).rstrip() + "\n"
@@ -0,0 +1,219 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from pydantic import BaseModel, Field
+
+from .export import COVERAGE_FILE, COVERAGE_MATRIX_FILE, RESULTS_FILE, open_writers, pivot_coverage
+from .state import PipelineState
+
+CV_SUFFIXES = (".txt", ".md", ".pdf")
+
+# Per-run records written next to the reports, one JSON object per CV
+TRACE_FILE = "trace.jsonl"
+ERRORS_FILE = "errors.log"
+_SHARD_DIR_RE = re.compile(r"^shard-(\d+)-of-(\d+)$")
+
+
+class BatchSummary(BaseModel):
+    total: int = 0
+    ok: int = 0
+    failed: int = 0
+    elapsed_s: float = 0.0
+    failures: List[str] = Field(default_factory=list)
+
+    @property
+    def per_second(self) -> float:
+        return self.total / self.elapsed_s if self.elapsed_s else 0.0
+
+
+def read_manifest(path: str) -> List[str]:
+    """CV paths from a directory (all .txt/.md/.pdf files) or a manifest file (one path per line, # comments).
+
+    Relative paths in a manifest file are resolved against the manifest's directory.
+    """
+    p = Path(path)
+    if p.is_dir():
+        return sorted(str(f) for f in p.rglob("*") if f.is_file() and f.suffix.lower() in CV_SUFFIXES)
+    paths: List[str] = []
+    for line in p.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        cv = Path(line)
+        paths.append(str(cv if cv.is_absolute() else p.parent / cv))
+    return paths
+
+
+def manifest_root(path: str) -> str:
+    """Directory that manifest entries are relative to (the directory itself, or the manifest's folder)."""
+    p = Path(path)
+    return str(p if p.is_dir() else p.parent)
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse ``i/n`` (0 <= i < n) as given to ``--shard``."""
+    m = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec)
+    if not m:
+        raise ValueError(f"Invalid shard '{spec}'. Use i/n, e.g. 0/4")
+    i, n = int(m.group(1)), int(m.group(2))
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"Invalid shard '{spec}': need 0 <= i < n")
+    return i, n
+
+
+def shard_of(cv_path: str, root: str, n: int) -> int:
+    """Shard index of a CV: a stable hash of its path relative to the manifest root.
+
+    Relative paths keep the assignment identical on every host, whatever the mount point.
+    """
+    key = Path(os.path.relpath(cv_path, root)).as_posix()
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big") % n
+
+
+def select_shard(cv_paths: Iterable[str], root: str, index: int, count: int) -> List[str]:
+    return [p for p in cv_paths if shard_of(p, root, count) == index]
+
+
+def shard_dir(out_dir: str, index: int, count: int) -> Path:
+    return Path(out_dir) / f"shard-{index:03d}-of-{count:03d}"
+
+
+def report_filename(cv_path: str) -> str:
+    """Per-CV report name: file stem plus a short path hash so equal stems don't collide."""
+    digest = hashlib.sha1(cv_path.encode("utf-8")).hexdigest()[:8]
+    return f"{Path(cv_path).stem}-{digest}.md"
+
+
+def run_batch(cv_paths: Iterable[str],
+              make_state: Callable[[str], PipelineState],
+              run_graph: Callable[[PipelineState], Any],
+              out_dir: str,
+              workers: int = 4,
+              on_result: Optional[Callable[[str, PipelineState], None]] = None,
+              export: Sequence[str] = ()) -> BatchSummary:
+    """Run the pipeline over many CVs with a thread pool, writing one Markdown report per CV.
+
+    Also writes ``trace.jsonl`` (one record per CV) and, when any CV failed, ``errors.log``.
+    ``on_result`` is called from the worker thread with each finished state (e.g. to save it).
+    ``export`` names streaming result files to write as CVs finish (see ``src.export``):
+    ``jsonl`` for ``results.jsonl``, ``coverage`` for ``coverage.csv`` plus ``coverage_matrix.csv``.
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    paths = list(cv_paths)
+    summary = BatchSummary(total=len(paths))
+    writers = open_writers(out_dir, export)
+
+    def work(cv_path: str) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        record: Dict[str, Any] = {"cv": cv_path, "report": None, "error": None, "errors": [], "degraded": []}
+        try:
+            final = run_graph(make_state(cv_path))
+            if isinstance(final, dict):
+                final = PipelineState.model_validate(final)
+            record.update(errors=list(final.errors), degraded=list(final.degraded))
+            if final.report_markdown:
+                record["report"] = report_filename(cv_path)
+                (out / record["report"]).write_text(final.report_markdown, encoding="utf-8")
+                if on_result is not None:
+                    on_result(cv_path, final)
+                for writer in writers:
+                    writer.write(cv_path, final)
+            else:
+                record["error"] = "; ".join(final.errors) or "no report produced"
+        except Exception as e:
+            record["error"] = f"pipeline error: {e}"
+        record["elapsed_s"] = round(time.perf_counter() - t0, 4)
+        return record
+
+    t0 = time.perf_counter()
+    try:
+        if workers <= 1:
+            records = [work(p) for p in paths]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                records = list(pool.map(work, paths))
+    finally:
+        for writer in writers:
+            writer.close()
+    if "coverage" in export:
+        pivot_coverage(out / COVERAGE_FILE, out / COVERAGE_MATRIX_FILE)
+    summary.elapsed_s = time.perf_counter() - t0
+
+    summary.failures = [f"{r['cv']}: {r['error']}" for r in records if r["error"]]
+    summary.failed = len(summary.failures)
+    summary.ok = summary.total - summary.failed
+    (out / TRACE_FILE).write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+    if summary.failures:
+        (out / ERRORS_FILE).write_text("\n".join(summary.failures) + "\n", encoding="utf-8")
+    return summary
+
+
+class MergeSummary(BaseModel):
+    shards: int = 0
+    expected: int = 0
+    missing: List[str] = Field(default_factory=list)
+    reports: int = 0
+    traces: int = 0
+    errors: int = 0
+    exports: List[str] = Field(default_factory=list)
+
+
+def merge_shards(out_dir: str, dest: Optional[str] = None) -> MergeSummary:
+    """Combine ``shard-i-of-n`` directories under ``out_dir`` into ``dest`` (default: ``out_dir``).
+
+    Reports are copied, traces, error logs and export files (``results.jsonl``, ``coverage.csv``,
+    from which ``coverage_matrix.csv`` is rebuilt) concatenated in shard order. Shards that have not
+    written their trace yet are listed in ``missing``. Safe to re-run once more shards finish.
+    """
+    root = Path(out_dir)
+    target = Path(dest) if dest else root
+    target.mkdir(parents=True, exist_ok=True)
+    shards = sorted(
+        (int(m.group(1)), int(m.group(2)), d)
+        for d in root.iterdir() if d.is_dir() and (m := _SHARD_DIR_RE.match(d.name))
+    )
+    summary = MergeSummary(shards=len(shards), expected=max((n for _, n, _ in shards), default=0))
+    present = {i for i, _, d in shards if (d / TRACE_FILE).exists()}
+    summary.missing = [shard_dir(out_dir, i, summary.expected).name for i in range(summary.expected) if i not in present]
+
+    traces: List[str] = []
+    errors: List[str] = []
+    for _, _, d in shards:
+        for report in d.glob("*.md"):
+            shutil.copy2(report, target / report.name)
+            summary.reports += 1
+        if (d / TRACE_FILE).exists():
+            traces += [line for line in (d / TRACE_FILE).read_text(encoding="utf-8").splitlines() if line.strip()]
+        if (d / ERRORS_FILE).exists():
+            errors += [line for line in (d / ERRORS_FILE).read_text(encoding="utf-8").splitlines() if line.strip()]
+    summary.traces, summary.errors = len(traces), len(errors)
+    (target / TRACE_FILE).write_text("".join(line + "\n" for line in traces), encoding="utf-8")
+    errors_path = target / ERRORS_FILE
+    if errors:
+        errors_path.write_text("\n".join(errors) + "\n", encoding="utf-8")
+    elif errors_path.exists():
+        errors_path.unlink()
+    # Export files can be large: stream them shard by shard, keeping one CSV header
+    for name in (RESULTS_FILE, COVERAGE_FILE):
+        parts = [d / name for _, _, d in shards if (d / name).exists()]
+        if not parts:
+            continue
+        with open(target / name, "w", encoding="utf-8", newline="") as dst:
+            for k, part in enumerate(parts):
+                with open(part, encoding="utf-8", newline="") as src:
+                    if name == COVERAGE_FILE and k:
+                        src.readline()
+                    shutil.copyfileobj(src, dst)
+        summary.exports.append(name)
+    if COVERAGE_FILE in summary.exports:
+        pivot_coverage(target / COVERAGE_FILE, target / COVERAGE_MATRIX_FILE)
+        summary.exports.append(COVERAGE_MATRIX_FILE)
+    return summary
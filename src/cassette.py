@@ -0,0 +1,199 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .json_stream import _content_text
+
+MODES = ("record", "replay")
+
+
+class CassetteMiss(RuntimeError):
+    """Replay found no recorded response for a request."""
+
+
+def _message_payload(messages: List[Any]) -> List[Dict[str, str]]:
+    return [
+        {"type": getattr(m, "type", type(m).__name__), "content": _content_text(getattr(m, "content", m))}
+        for m in messages
+    ]
+
+
+def request_key(kind: str, request: Any) -> str:
+    blob = json.dumps({"kind": kind, "request": request}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded LLM and Tavily traffic in a JSONL file, one request/response entry per line.
+
+    In ``record`` mode calls go through and are appended (one write per entry, so several
+    processes can share a file). In ``replay`` mode responses are served from the file with no
+    network access: identical requests get their recorded responses in order, then the last
+    one again. ``emulate_latency`` sleeps for the recorded time (per chunk when streaming).
+    """
+
+    def __init__(self, path: str, mode: str = "replay", emulate_latency: bool = False):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}. Use one of {', '.join(MODES)}")
+        self.path = Path(path)
+        self.mode = mode
+        self.emulate_latency = emulate_latency
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._served: Dict[str, int] = {}
+        if mode == "replay":
+            if not self.path.exists():
+                raise FileNotFoundError(f"Cassette not found: {self.path}")
+            for line in self.path.read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["key"], []).append(entry)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._entries.values())
+
+    def lookup(self, kind: str, request: Any) -> Dict[str, Any]:
+        key = request_key(kind, request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded {kind} response for this request ({key[:12]})")
+            i = self._served.get(key, 0)
+            self._served[key] = i + 1
+            return entries[min(i, len(entries) - 1)]
+
+    def append(self, kind: str, request: Any, **fields: Any) -> None:
+        entry = {"kind": kind, "key": request_key(kind, request), "request": request, **fields}
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    def call(self, kind: str, request: Any, fn: Callable[[], Any]) -> Any:
+        """Replay the response to ``request``, or run ``fn`` and record its JSON-serializable result."""
+        if self.replaying:
+            entry = self.lookup(kind, request)
+            if self.emulate_latency:
+                time.sleep(entry.get("latency_s", 0.0))
+            return entry["response"]
+        t0 = time.perf_counter()
+        response = fn()
+        self.append(kind, request, response=response, latency_s=round(time.perf_counter() - t0, 4))
+        return response
+
+
+class CassetteLLM:
+    """LLM wrapper that records or replays ``invoke``/``stream`` traffic through a Cassette.
+
+    Streams and plain calls share entries: a recorded stream can be replayed by ``invoke`` and
+    vice versa. In replay mode no underlying model is needed (``llm`` may be None).
+    """
+
+    def __init__(self, llm: Any, cassette: Cassette):
+        self.llm = llm
+        self.cassette = cassette
+
+    def json_mode(self) -> "CassetteLLM":
+        from .llm_provider import json_mode
+        return CassetteLLM(json_mode(self.llm) if self.llm is not None else None, self.cassette)
+
+    def with_request_timeout(self, seconds: float) -> "CassetteLLM":
+        from .llm_provider import with_request_timeout
+        return CassetteLLM(with_request_timeout(self.llm, seconds) if self.llm is not None else None, self.cassette)
+
+    def invoke(self, messages: List[Any]) -> Any:
+        from langchain_core.messages import AIMessage
+        request = _message_payload(messages)
+        if self.cassette.replaying:
+            entry = self.cassette.lookup("llm", request)
+            if self.cassette.emulate_latency:
+                time.sleep(entry.get("latency_s", 0.0))
+            return AIMessage(content=entry["response"])
+        t0 = time.perf_counter()
+        resp = self.llm.invoke(messages)
+        self.cassette.append("llm", request, response=_content_text(getattr(resp, "content", "")),
+                             latency_s=round(time.perf_counter() - t0, 4))
+        return resp
+
+    def stream(self, messages: List[Any]) -> Iterator[Any]:
+        from langchain_core.messages import AIMessageChunk
+        request = _message_payload(messages)
+        if self.cassette.replaying:
+            entry = self.cassette.lookup("llm", request)
+            chunks = entry.get("chunks") or [[entry.get("latency_s", 0.0), entry["response"]]]
+            elapsed = 0.0
+            for at, text in chunks:
+                if self.cassette.emulate_latency and at > elapsed:
+                    time.sleep(at - elapsed)
+                    elapsed = at
+                yield AIMessageChunk(content=text)
+            return
+        if not hasattr(self.llm, "stream"):
+            yield self.invoke(messages)
+            return
+        t0 = time.perf_counter()
+        chunks: List[List[Any]] = []
+        failed = False
+        try:
+            for chunk in self.llm.stream(messages):
+                chunks.append([round(time.perf_counter() - t0, 4), _content_text(getattr(chunk, "content", chunk))])
+                yield chunk
+        except GeneratorExit:
+            # The consumer stopped early (e.g. the JSON object was complete); record what it saw
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if not failed:
+                self.cassette.append("llm", request, response="".join(text for _, text in chunks), chunks=chunks,
+                                     latency_s=round(time.perf_counter() - t0, 4))
+
+
+_active: Optional[Cassette] = None
+_active_lock = threading.Lock()
+_env_checked = False
+
+
+def set_cassette(cassette: Optional[Cassette]) -> None:
+    """Install (or with None, remove) the process-wide cassette used by get_llm and the Tavily search."""
+    global _active, _env_checked
+    with _active_lock:
+        _active = cassette
+        _env_checked = True
+
+
+def active_cassette() -> Optional[Cassette]:
+    """The installed cassette; on first use one is built from ``CV_ANALYZER_CASSETTE`` if set.
+
+    ``CV_ANALYZER_CASSETTE_MODE`` is ``record`` or ``replay`` (default) and
+    ``CV_ANALYZER_CASSETTE_LATENCY=1`` emulates recorded latency.
+    """
+    global _active, _env_checked
+    if _env_checked:
+        return _active
+    with _active_lock:
+        if not _env_checked:
+            path = os.getenv("CV_ANALYZER_CASSETTE")
+            if path:
+                _active = Cassette(
+                    path,
+                    mode=os.getenv("CV_ANALYZER_CASSETTE_MODE", "replay"),
+                    emulate_latency=os.getenv("CV_ANALYZER_CASSETTE_LATENCY", "0") == "1",
+                )
+            _env_checked = True
+    return _active
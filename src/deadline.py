@@ -0,0 +1,138 @@
+from __future__ import annotations
+import copy
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Relative share of the remaining run budget each LLM-backed node may spend.
+# Unused time flows to later nodes because shares are recomputed from what is left.
+NODE_WEIGHTS: Dict[str, float] = {"parse": 3.0, "analyze": 1.0, "market": 2.0, "report": 3.0}
+
+# Below this, don't even start an LLM call; go straight to the heuristic fallback
+MIN_CALL_S = 1.0
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until ``deadline`` (epoch seconds), or None when there is no deadline."""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
+
+
+def node_budget(deadline: Optional[float], node: str) -> Optional[float]:
+    """Seconds ``node`` may spend: its weighted share of the time left for it and later nodes."""
+    left = remaining(deadline)
+    if left is None:
+        return None
+    names = list(NODE_WEIGHTS)
+    later = names[names.index(node):] if node in NODE_WEIGHTS else [node]
+    total = sum(NODE_WEIGHTS.get(n, 1.0) for n in later)
+    return left * NODE_WEIGHTS.get(node, 1.0) / total
+
+
+def call_with_timeout(fn: Callable[..., T], timeout: Optional[float], *args: Any, **kwargs: Any) -> T:
+    """Run ``fn`` and give up after ``timeout`` seconds.
+
+    The call runs in a daemon thread; a call that overruns is abandoned, not killed, so ``fn``
+    should bound its own network calls too (see DeadlineLLM, ``get_market_requirements``).
+    """
+    if timeout is None:
+        return fn(*args, **kwargs)
+    if timeout <= 0:
+        raise DeadlineExceeded("time budget exhausted")
+    box: Dict[str, Any] = {}
+    done = threading.Event()
+
+    def target() -> None:
+        try:
+            box["value"] = fn(*args, **kwargs)
+        except BaseException as e:
+            box["error"] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=target, daemon=True).start()
+    if not done.wait(timeout):
+        raise DeadlineExceeded(f"call exceeded {timeout:.1f}s budget")
+    if "error" in box:
+        raise box["error"]
+    return box["value"]
+
+
+class DeadlineLLM:
+    """Wrap an LLM so every invoke/stream call is bounded by a per-node time budget.
+
+    The provider clients get the budget as their own request timeout (``with_request_timeout``),
+    so a call that overruns stops instead of running on in the abandoned thread.
+    ``timed_out`` records whether any call hit the budget, so the node can mark itself degraded.
+    """
+
+    def __init__(self, llm: Any, budget: float):
+        from .llm_provider import with_request_timeout
+        self.llm = with_request_timeout(llm, budget)
+        self.deadline = time.time() + budget
+        self._flag = {"timed_out": False}  # shared with json_mode() views
+
+    @property
+    def timed_out(self) -> bool:
+        return self._flag["timed_out"]
+
+    @timed_out.setter
+    def timed_out(self, value: bool) -> None:
+        self._flag["timed_out"] = value
+
+    def json_mode(self) -> "DeadlineLLM":
+        """Same budget and timeout flag, over the JSON-mode variant of the wrapped LLM."""
+        from .llm_provider import json_mode
+        view = copy.copy(self)
+        view.llm = json_mode(self.llm)
+        return view
+
+    def invoke(self, messages: list[Any]) -> Any:
+        try:
+            return call_with_timeout(self.llm.invoke, remaining(self.deadline), messages)
+        except DeadlineExceeded:
+            self.timed_out = True
+            raise
+
+    def stream(self, messages: list[Any]) -> Iterator[Any]:
+        if not hasattr(self.llm, "stream"):
+            yield self.invoke(messages)
+            return
+        # Pump chunks from a daemon thread so a stalled stream can't outlive the budget
+        chunks: "queue.Queue[tuple[str, Any]]" = queue.Queue()
+        stop = threading.Event()
+
+        def pump() -> None:
+            try:
+                for chunk in self.llm.stream(messages):
+                    if stop.is_set():
+                        return
+                    chunks.put(("chunk", chunk))
+                chunks.put(("end", None))
+            except BaseException as e:
+                chunks.put(("error", e))
+
+        threading.Thread(target=pump, daemon=True).start()
+        try:
+            while True:
+                left = remaining(self.deadline)
+                try:
+                    kind, item = chunks.get(timeout=left if left and left > 0 else 0.001)
+                except queue.Empty:
+                    self.timed_out = True
+                    raise DeadlineExceeded("stream exceeded time budget")
+                if kind == "end":
+                    return
+                if kind == "error":
+                    raise item
+                yield item
+        finally:
+            stop.set()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+import math
+import re
+from typing import Any, Dict, Iterable, List
+import numpy as np
+
+# BM25 parameters (the usual defaults)
+K1 = 1.2
+B = 0.75
+
+# Evidence quotes are cut to this length in report notes
+MAX_SPAN_CHARS = 140
+
+# Tech-friendly tokens: keeps c++, c#, node.js, ci/cd-style pieces and version numbers together
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+
+def _aliases() -> Dict[str, str]:
+    from .agents.skill_analyst import LEXICON_ALIASES
+    return {k: v for k, v in LEXICON_ALIASES.items() if " " not in k and " " not in v}
+
+
+def tokenize(text: str, aliases: Dict[str, str]) -> List[str]:
+    return [aliases.get(t, t) for t in _TOKEN_RE.findall((text or "").lower())]
+
+
+def _get(item: Any, field: str) -> Any:
+    return item.get(field) if isinstance(item, dict) else getattr(item, field, None)
+
+
+def evidence_spans(cv_structured: Dict[str, Any]) -> List[str]:
+    """Experience bullets and project descriptions (prefixed with the project name), in CV order."""
+    spans: List[str] = []
+    for exp in cv_structured.get("experiences") or []:
+        spans += [b.strip() for b in _get(exp, "bullets") or [] if b and b.strip()]
+    for proj in cv_structured.get("projects") or []:
+        desc = (_get(proj, "description") or "").strip()
+        if desc:
+            name = (_get(proj, "name") or "").strip()
+            spans.append(f"{name}: {desc}" if name and name.lower() not in desc.lower() else desc)
+    return spans
+
+
+def score_evidence(spans: List[str], skills: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Best evidence span per skill from a BM25 index over ``spans``, scored for all skills at once.
+
+    Returns ``{skill: {"span", "score", "coverage", "mentions"}}`` for skills with any matching
+    term: ``score`` is the span's BM25 score, ``coverage`` the IDF-weighted share of the skill's
+    terms found in that span (1.0 = the skill is named there) and ``mentions`` the number of
+    spans that name it in full.
+    """
+    skills = [s for s in dict.fromkeys(skills) if s]
+    if not spans or not skills:
+        return {}
+    aliases = _aliases()
+    docs = [tokenize(s, aliases) for s in spans]
+    vocab: Dict[str, int] = {}
+    rows: List[int] = []
+    cols: List[int] = []
+    for i, doc in enumerate(docs):
+        for t in doc:
+            rows.append(i)
+            cols.append(vocab.setdefault(t, len(vocab)))
+    if not vocab:
+        return {}
+
+    n = len(spans)
+    tf = np.zeros((n, len(vocab)), dtype=np.float32)
+    np.add.at(tf, (np.asarray(rows), np.asarray(cols)), 1.0)
+    present = (tf > 0).astype(np.float32)
+    doc_len = tf.sum(axis=1)
+    norm = K1 * (1.0 - B + B * doc_len / max(float(doc_len.mean()), 1.0))
+    idf = np.log1p((n - present.sum(axis=0) + 0.5) / (present.sum(axis=0) + 0.5)).astype(np.float32)
+    weights = idf * tf * (K1 + 1.0) / (tf + norm[:, None])
+
+    # Query terms missing from the CV count as maximally rare when computing coverage
+    idf_unseen = math.log1p((n + 0.5) / 0.5)
+    query = np.zeros((len(skills), len(vocab)), dtype=np.float32)
+    total = np.zeros(len(skills), dtype=np.float32)
+    for r, skill in enumerate(skills):
+        for t in set(tokenize(skill, aliases)):
+            c = vocab.get(t)
+            if c is None:
+                total[r] += idf_unseen
+            else:
+                query[r, c] = 1.0
+                total[r] += idf[c]
+
+    scores = query @ weights.T                                    # (skills, spans)
+    coverage = (query * idf) @ present.T / np.maximum(total, 1e-9)[:, None]
+    best = scores.argmax(axis=1)
+    full = (coverage >= 0.999).sum(axis=1)
+    out: Dict[str, Dict[str, Any]] = {}
+    for r, skill in enumerate(skills):
+        j = int(best[r])
+        if scores[r, j] <= 0:
+            continue
+        out[skill] = {
+            "span": spans[j],
+            "score": round(float(scores[r, j]), 3),
+            "coverage": round(float(coverage[r, j]), 2),
+            "mentions": int(full[r]),
+        }
+    return out
+
+
+def quote(span: str, limit: int = MAX_SPAN_CHARS) -> str:
+    """Span as a one-line quote that is safe inside a Markdown table cell."""
+    text = " ".join(span.split()).replace("|", "/")
+    if len(text) > limit:
+        text = text[:limit - 1].rstrip() + "…"
+    return f'"{text}"'
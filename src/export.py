@@ -0,0 +1,201 @@
+from __future__ import annotations
+import csv
+import io
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Sequence
+
+from .skills import SkillSet, canonical_skill
+from .state import PipelineState
+from .store import cv_hash
+
+# Batch export files written next to the reports
+RESULTS_FILE = "results.jsonl"
+COVERAGE_FILE = "coverage.csv"
+COVERAGE_MATRIX_FILE = "coverage_matrix.csv"
+EXPORT_FORMATS = ("jsonl", "coverage")
+
+# Long (tidy) layout, one row per CV and skill: flat typed columns that load straight into pandas/pyarrow
+COVERAGE_COLUMNS = ("cv", "candidate", "role", "language", "skill", "explicit", "implicit",
+                    "implicit_confidence", "market", "status")
+
+# Buffered records (one per CV) are written once either limit is reached, so memory stays bounded whatever the batch size
+FLUSH_RECORDS = 500
+FLUSH_CHARS = 1 << 20
+
+
+class _BufferedWriter:
+    """Text file appended to from many worker threads. Rows are serialized by the caller's
+    thread, buffered, and written in bulk under a lock.
+    """
+
+    def __init__(self, path: str | Path, header: str = "", flush_records: int = FLUSH_RECORDS,
+                 flush_chars: int = FLUSH_CHARS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8", newline="")
+        self._lock = threading.Lock()
+        self._buffer: List[str] = [header] if header else []
+        self._chars = len(header)
+        self._flush_records = flush_records
+        self._flush_chars = flush_chars
+        self.rows = 0
+
+    def _add(self, chunk: str, rows: int) -> None:
+        with self._lock:
+            self._buffer.append(chunk)
+            self._chars += len(chunk)
+            self.rows += rows
+            if len(self._buffer) >= self._flush_records or self._chars >= self._flush_chars:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._file.flush()
+            self._buffer, self._chars = [], 0
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._flush_locked()
+                self._file.close()
+
+    def __enter__(self) -> "_BufferedWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class JsonlWriter(_BufferedWriter):
+    """One JSON object per finished CV: its structured intermediates and ``ReportData``."""
+
+    def write(self, cv_path: str, state: PipelineState) -> None:
+        cv = state.cv_structured or {}
+        record = {
+            "cv": cv_path,
+            "candidate": cv.get("name") or state.cv_name,
+            "cv_hash": state.cv_text_hash or cv_hash(state.cv_raw_text or ""),
+            "role": state.target_role,
+            "language": state.language,
+            "cv_structured": state.cv_structured,
+            "analyzed_skills": state.analyzed_skills,
+            "market_requirements": state.market_requirements,
+            "report_data": state.report_data,
+            "errors": list(state.errors),
+            "degraded": list(state.degraded),
+        }
+        self._add(json.dumps(record, ensure_ascii=False) + "\n", 1)
+
+
+def coverage_rows(cv_path: str, state: PipelineState) -> List[tuple]:
+    """Long-format coverage rows for one CV: every CV or market skill with its flags and status.
+
+    ``status`` is ``strength`` (in the CV and the market list), ``gap`` (market only) or
+    ``extra`` (CV only), matching the report's skill diff.
+    """
+    analyzed = state.analyzed_skills or {}
+    explicit = SkillSet.from_iterable(analyzed.get("explicit_skills", []))
+    implicit = SkillSet.from_iterable(analyzed.get("implicit_skills", []))
+    market = SkillSet.from_iterable((state.market_requirements or {}).get("skills", []))
+    confidence = {canonical_skill(k): v for k, v in (analyzed.get("implicit_confidence") or {}).items() if k}
+    candidate = (state.cv_structured or {}).get("name") or state.cv_name
+    rows = []
+    for skill in (explicit | implicit | market).to_list():
+        has = skill in explicit or skill in implicit
+        wanted = skill in market
+        rows.append((
+            cv_path, candidate, state.target_role, state.language, skill,
+            int(skill in explicit), int(skill in implicit), confidence.get(skill, ""), int(wanted),
+            "strength" if has and wanted else "gap" if wanted else "extra",
+        ))
+    return rows
+
+
+class CoverageWriter(_BufferedWriter):
+    """Candidate × skill coverage in long CSV layout (``COVERAGE_COLUMNS``), one row per CV and skill."""
+
+    def __init__(self, path: str | Path, **kwargs: Any):
+        super().__init__(path, header=_csv_lines([COVERAGE_COLUMNS]), **kwargs)
+
+    def write(self, cv_path: str, state: PipelineState) -> None:
+        rows = coverage_rows(cv_path, state)
+        if rows:
+            # One chunk per CV keeps its rows contiguous in the file, which pivot_coverage relies on
+            self._add(_csv_lines(rows), len(rows))
+
+
+def _csv_lines(rows: Iterable[Sequence[Any]]) -> str:
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(rows)
+    return buf.getvalue()
+
+
+_CV, _CANDIDATE, _ROLE, _LANGUAGE, _SKILL = range(5)
+_MARKET, _STATUS = COVERAGE_COLUMNS.index("market"), COVERAGE_COLUMNS.index("status")
+
+
+def _read_coverage(path: str | Path) -> Iterator[List[str]]:
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = csv.reader(f)
+        next(rows, None)
+        yield from rows
+
+
+def pivot_coverage(path: str | Path, out: str | Path) -> int:
+    """Write the wide candidate × market skill matrix from a long coverage file. Returns the rows written.
+
+    One row per CV with its market coverage share, then one column per market skill seen in the
+    batch: ``1`` (has it), ``0`` (gap) or empty (not in that CV's market list). Two passes over
+    the file, so memory grows with the number of distinct skills, not with the number of CVs.
+    """
+    skills = sorted({r[_SKILL] for r in _read_coverage(path) if r[_MARKET] == "1"})
+    column = {s: i for i, s in enumerate(skills)}
+    target = Path(out)
+    tmp = target.with_name(target.name + ".tmp")
+    written = 0
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["cv", "candidate", "role", "language", "coverage", *skills])
+
+        def emit(key: Optional[tuple], cells: List[str]) -> None:
+            nonlocal written
+            if key is None:
+                return
+            wanted = [c for c in cells if c]
+            share = round(wanted.count("1") / len(wanted), 4) if wanted else ""
+            writer.writerow([*key, share, *cells])
+            written += 1
+
+        key: Optional[tuple] = None
+        cells: List[str] = []
+        for r in _read_coverage(path):
+            row_key = (r[_CV], r[_CANDIDATE], r[_ROLE], r[_LANGUAGE])
+            if row_key != key:
+                emit(key, cells)
+                key, cells = row_key, [""] * len(skills)
+            if r[_MARKET] == "1":
+                cells[column[r[_SKILL]]] = "1" if r[_STATUS] == "strength" else "0"
+        emit(key, cells)
+    os.replace(tmp, target)
+    return written
+
+
+def open_writers(out_dir: str, formats: Iterable[str]) -> List[_BufferedWriter]:
+    """Streaming result writers for a batch output directory, by ``EXPORT_FORMATS`` name."""
+    writers: List[_BufferedWriter] = []
+    for fmt in dict.fromkeys(formats):
+        if fmt == "jsonl":
+            writers.append(JsonlWriter(Path(out_dir) / RESULTS_FILE))
+        elif fmt == "coverage":
+            writers.append(CoverageWriter(Path(out_dir) / COVERAGE_FILE))
+        else:
+            raise ValueError(f"Unknown export format: {fmt}. Use one of {', '.join(EXPORT_FORMATS)}")
+    return writers
@@ -1,21 +1,182 @@
 from __future__ import annotations
-from typing import Callable
-from langgraph.graph import StateGraph, END
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+from pydantic import create_model
 from ..state import PipelineState
+from ..metrics import DEGRADED, NODE_SECONDS, PIPELINE_RUNS, PIPELINE_SECONDS
+from ..side_store import SIDE_STORE
 from ..utils import load_cv
 from ..llm_provider import get_llm, normalize_provider
-from ..agents.cv_parser import parse_cv_to_structured
-from ..agents.skill_analyst import analyze_skills
-from ..agents.market_intel import market_intelligence_agent
-from ..agents.report_agent import make_report
+from ..deadline import MIN_CALL_S, DeadlineExceeded, DeadlineLLM, call_with_timeout, node_budget
+
+# Node names in execution order; useful for progress reporting
+NODE_ORDER = ["load_cv", "parse", "analyze", "market", "report"]
+
+
+# List fields that nodes append to in place
+_LIST_FIELDS = ("errors", "degraded")
+
+
+def _propagate_lists(fn: Callable[[PipelineState], PipelineState]) -> Callable[[PipelineState], PipelineState]:
+    """LangGraph only forwards fields marked as set on a returned model; in-place appends don't mark them."""
+    def node(state: PipelineState) -> PipelineState:
+        out = fn(state)
+        for name in _LIST_FIELDS:
+            if getattr(out, name):
+                setattr(out, name, getattr(out, name))
+        return out
+    node.__name__ = fn.__name__
+    return node
+
+
+def _timed(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Observe each call of node ``fn`` in the node latency histogram."""
+    def node(*args: Any, **kwargs: Any) -> Any:
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            NODE_SECONDS.observe(time.perf_counter() - t0, node=name)
+    node.__name__ = fn.__name__
+    return node
+
+
+def _record_run(final: Any, elapsed: float) -> None:
+    """Count a finished run: ``ok`` with a report, ``failed`` when nodes reported errors instead."""
+    get = final.get if isinstance(final, dict) else lambda f: getattr(final, f, None)
+    PIPELINE_RUNS.inc(outcome="ok" if get("report_markdown") else "failed")
+    PIPELINE_SECONDS.observe(elapsed)
+    for node in get("degraded") or ():
+        DEGRADED.inc(node=node)
+
+
+# Fields each node reads and writes. In slim mode a node is handed only what it reads
+NODE_FIELDS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "load_cv": (("cv_path", "cv_bytes", "provider", "no_llm", "errors"), ("cv_raw_text", "errors")),
+    "parse": (("cv_raw_text", "no_llm", "deadline", "errors", "degraded"), ("cv_structured", "errors", "degraded")),
+    "analyze": (("cv_raw_text", "cv_structured", "no_llm", "deadline", "errors", "degraded"),
+                ("analyzed_skills", "errors", "degraded")),
+    "market": (("target_role", "no_llm", "deadline", "errors", "degraded"), ("market_requirements", "errors", "degraded")),
+    "report": (("cv_structured", "analyzed_skills", "market_requirements", "language", "report_mode", "no_llm", "deadline",
+                "errors", "degraded"),
+               ("report_data", "report_markdown", "errors", "degraded")),
+}
+
+# Slim mode keeps these in the side store, by run reference, instead of in the graph state
+_LARGE_FIELDS = ("cv_bytes", "cv_raw_text", "cv_structured", "analyzed_skills", "market_requirements",
+                 "report_data", "report_markdown")
+
+
+def _released_after(node: str, no_llm: bool) -> Tuple[str, ...]:
+    """Large inputs no later node reads, dropped from the side store as soon as ``node`` is done."""
+    if node == "load_cv":
+        return ("cv_bytes",)
+    # The no-LLM analyze step runs the skill lexicon over the full text
+    if node == ("analyze" if no_llm else "parse"):
+        return ("cv_raw_text",)
+    return ()
+
+
+def _slim_input(node: str) -> type:
+    """Input schema for ``node`` in slim mode: its small declared fields plus the run reference."""
+    reads = [f for f in NODE_FIELDS[node][0] if f not in _LARGE_FIELDS] + ["run_ref"]
+    fields = {f: (PipelineState.model_fields[f].annotation, PipelineState.model_fields[f]) for f in reads}
+    return create_model(f"{node.title().replace('_', '')}Input", **fields)
+
+
+def _slim(node: str, fn: Callable[[PipelineState], PipelineState]) -> Callable[[Any], Dict[str, Any]]:
+    """Run ``fn`` on just its declared fields, resolving and storing large ones by reference."""
+    from ..store import cv_hash
+    reads, writes = NODE_FIELDS[node]
+
+    def slim_node(inp: Any) -> Dict[str, Any]:
+        ref = inp.run_ref
+        work = PipelineState.model_construct(
+            **{f: SIDE_STORE.get(ref, f) if f in _LARGE_FIELDS else getattr(inp, f) for f in reads}
+        )
+        out = fn(work)
+        updates: Dict[str, Any] = {}
+        for f in writes:
+            value = getattr(out, f)
+            if f not in _LARGE_FIELDS:
+                updates[f] = value
+            elif value is not None:
+                SIDE_STORE.put(ref, f, value)
+        if "cv_raw_text" in writes and out.cv_raw_text:
+            updates["cv_text_hash"] = cv_hash(out.cv_raw_text)
+        for f in _released_after(node, bool(work.no_llm)):
+            SIDE_STORE.release(ref, f)
+        return updates
+    slim_node.__name__ = fn.__name__
+    return slim_node
+
+
+def build_graph(store: Optional[Any] = None, profiler: Optional[Any] = None,
+                slim: bool = False, llm_batch: int = 0) -> Callable[..., PipelineState]:
+    """Compile the pipeline. ``store`` (a ResultStore) supplies cached market skills in no-LLM mode.
+
+    ``slim`` keeps large intermediates out of the graph state: each node gets only the fields
+    listed in NODE_FIELDS, bulky values live in the side store by reference, and the CV bytes and
+    raw text are released as soon as no later node needs them (``cv_raw_text`` is None in the
+    returned state; ``cv_text_hash`` identifies the CV instead). The runner takes the CV bytes out
+    of the state it is given (they become ``b""``), so the caller's copy is freed as well.
+
+    With a ``profiler`` (a src.profiling.NodeProfiler) every node is wrapped with its CPU and
+    memory hooks; without one the nodes are added unwrapped. Run outcomes and node latencies are
+    always recorded in the metrics registry (src.metrics).
+
+    ``llm_batch`` > 1 packs the analyze step's LLM pass of up to that many concurrent runs (e.g.
+    batch workers sharing this graph) into one request. Runs with a deadline, and runs under a
+    cassette, are not packed.
+    """
+    # Imported here so that importing this module (e.g. for `main.py --help`) stays cheap
+    from langgraph.graph import StateGraph, END
+    from ..agents.cv_parser import parse_cv_fallback, parse_cv_to_structured
+    from ..agents.skill_analyst import SkillBatcher, analyze_skills, analyze_skills_lexicon
+    from ..agents.market_intel import market_intelligence_agent
+    from ..agents.report_agent import (
+        attach_evidence, build_report_context, fallback_report_data, generate_report_data, hybrid_report_data,
+        render_markdown, template_report_data,
+    )
+    from ..tools.market_search import cached_market_requirements, offline_market_requirements
+    from ..cassette import active_cassette
 
-def build_graph() -> Callable[[PipelineState], PipelineState]:
     # llm will be constructed using the state's selected provider at runtime
     llm_holder = {"llm": None}
+    batcher_holder: Dict[str, Any] = {"batcher": None}
+    batcher_lock = threading.Lock()
+
+    def skill_batcher(llm: Optional[Any]) -> Optional[Any]:
+        """Shared SkillBatcher when packing is on and ``llm`` is the plain (deadline-free) LLM.
+
+        Not under a cassette: which CVs share a packed request depends on thread timing, so a
+        recording could not be replayed request for request.
+        """
+        if llm_batch <= 1 or llm is None or llm is not llm_holder["llm"] or active_cassette() is not None:
+            return None
+        with batcher_lock:
+            if batcher_holder["batcher"] is None:
+                batcher_holder["batcher"] = SkillBatcher(llm, max_batch=llm_batch)
+            return batcher_holder["batcher"]
+
+    def node_llm(state: PipelineState, node: str) -> Optional[Any]:
+        """The LLM for ``node``, bounded by its share of the run deadline; None once the budget is spent."""
+        budget = node_budget(state.deadline, node)
+        if budget is None:
+            return llm_holder["llm"]
+        if budget < MIN_CALL_S:
+            return None
+        return DeadlineLLM(llm_holder["llm"], budget)
+
+    def mark_degraded(state: PipelineState, node: str, llm: Optional[Any]) -> None:
+        if (llm is None or getattr(llm, "timed_out", False)) and node not in state.degraded:
+            state.degraded.append(node)
 
     def load_cv_node(state: PipelineState) -> PipelineState:
-        # Initialize LLM once using selected provider
-        if llm_holder["llm"] is None:
+        # Initialize LLM once using selected provider (never in no-LLM mode)
+        if llm_holder["llm"] is None and not state.no_llm:
             prov = normalize_provider(getattr(state, "provider", "auto"))
             try:
                 llm_holder["llm"] = get_llm(provider=prov, temperature=0.2)
@@ -23,7 +184,7 @@ def build_graph() -> Callable[[PipelineState], PipelineState]:
                 state.errors.append(f"LLM init error ({prov}): {e}")
                 return state
         try:
-            state.cv_raw_text = load_cv(state.cv_path)
+            state.cv_raw_text = load_cv(state.cv_source())
         except Exception as e:
             state.errors.append(f"Load CV error: {e}")
         return state
@@ -32,8 +193,16 @@ def build_graph() -> Callable[[PipelineState], PipelineState]:
         if not state.cv_raw_text:
             state.errors.append("CV kosong. Gagal mem-parsing.")
             return state
+        if state.no_llm:
+            state.cv_structured = parse_cv_fallback(state.cv_raw_text)
+            return state
+        llm = node_llm(state, "parse")
         try:
-            state.cv_structured = parse_cv_to_structured(state.cv_raw_text, llm_holder["llm"])
+            if llm is None:
+                state.cv_structured = parse_cv_fallback(state.cv_raw_text)
+            else:
+                state.cv_structured = parse_cv_to_structured(state.cv_raw_text, llm)
+            mark_degraded(state, "parse", llm)
         except Exception as e:
             state.errors.append(f"CV parse error: {e}")
         return state
@@ -44,8 +213,17 @@ def build_graph() -> Callable[[PipelineState], PipelineState]:
         if not state.cv_structured:
             state.errors.append("CV belum terstruktur.")
             return state
+        if state.no_llm:
+            try:
+                state.analyzed_skills = analyze_skills_lexicon(state.cv_structured, state.cv_raw_text or "")
+            except Exception as e:
+                state.errors.append(f"Skill analysis error: {e}")
+            return state
+        llm = node_llm(state, "analyze")
         try:
-            state.analyzed_skills = analyze_skills(state.cv_structured, llm_holder["llm"])
+            # With llm=None analyze_skills keeps the parser's skills and the implicit mapping only
+            state.analyzed_skills = analyze_skills(state.cv_structured, llm, skill_batcher(llm))
+            mark_degraded(state, "analyze", llm)
         except Exception as e:
             state.errors.append(f"Skill analysis error: {e}")
         return state
@@ -53,8 +231,24 @@ def build_graph() -> Callable[[PipelineState], PipelineState]:
     def market_node(state: PipelineState) -> PipelineState:
         if state.errors:
             return state
+        if state.no_llm:
+            state.market_requirements = offline_market_requirements(state.target_role, store)
+            return state
+        budget = node_budget(state.deadline, "market")
+        # With a budget the synthesis call is bounded by the provider's own timeout as well
+        llm = llm_holder["llm"] if budget is None else DeadlineLLM(llm_holder["llm"], budget)
         try:
-            state.market_requirements = market_intelligence_agent(state.target_role, llm_holder["llm"])
+            state.market_requirements = call_with_timeout(
+                market_intelligence_agent, budget, state.target_role, llm, budget
+            )
+        except DeadlineExceeded as e:
+            # No heuristic source for market skills; use a finished prefetch if there is one
+            cached = cached_market_requirements(state.target_role)
+            if cached is None:
+                state.errors.append(f"Market intel error: {e}")
+            else:
+                state.market_requirements = cached
+                state.degraded.append("market")
         except Exception as e:
             state.errors.append(f"Market intel error: {e}")
         return state
@@ -65,24 +259,41 @@ def build_graph() -> Callable[[PipelineState], PipelineState]:
         if not state.cv_structured or not state.analyzed_skills or not state.market_requirements:
             state.errors.append("Data belum lengkap untuk membuat report.")
             return state
+        llm = None if state.no_llm else node_llm(state, "report")
         try:
-            state.report_markdown = make_report(
-                state.cv_structured,
-                state.analyzed_skills,
-                state.market_requirements,
-                llm_holder["llm"],
-                getattr(state, "language", "english")
-            )
+            language = getattr(state, "language", "english")
+            context = build_report_context(state.cv_structured, state.analyzed_skills, state.market_requirements)
+            if state.no_llm:
+                rd = template_report_data(language, context)
+            elif llm is None:
+                rd = fallback_report_data(language, context)
+            elif state.report_mode == "hybrid":
+                rd = hybrid_report_data(llm, language, context)
+            else:
+                rd = generate_report_data(llm, language, context)
+            attach_evidence(rd, context, language)
+            if not state.no_llm:
+                mark_degraded(state, "report", llm)
+            rd.degraded = list(state.degraded)
+            state.report_data = rd.model_dump()
+            state.report_markdown = render_markdown(rd, language)
         except Exception as e:
             state.errors.append(f"Report generation error: {e}")
         return state
 
+    nodes = {
+        "load_cv": load_cv_node,
+        "parse": parse_node,
+        "analyze": analyze_node,
+        "market": market_node,
+        "report": report_node,
+    }
     g = StateGraph(PipelineState)
-    g.add_node("load_cv", load_cv_node)
-    g.add_node("parse", parse_node)
-    g.add_node("analyze", analyze_node)
-    g.add_node("market", market_node)
-    g.add_node("report", report_node)
+    for name, fn in nodes.items():
+        fn = _timed(name, _slim(name, fn) if slim else _propagate_lists(fn))
+        if profiler is not None:
+            fn = profiler.wrap(name, fn)
+        g.add_node(name, fn, input=_slim_input(name) if slim else None)
 
     g.set_entry_point("load_cv")
     g.add_edge("load_cv", "parse")
@@ -93,7 +304,46 @@ def build_graph() -> Callable[[PipelineState], PipelineState]:
 
     app = g.compile()
 
-    def runner(state: PipelineState) -> PipelineState:
-        return app.invoke(state)
+    def run(state: PipelineState, on_node: Optional[Callable[[str], None]] = None) -> Any:
+        if on_node is None:
+            return app.invoke(state)
+        final = state
+        for mode, chunk in app.stream(state, stream_mode=["updates", "values"]):
+            if mode == "updates":
+                for name in chunk:
+                    on_node(name)
+            else:
+                final = chunk
+        return final
+
+    def run_slim(state: PipelineState, on_node: Optional[Callable[[str], None]] = None) -> PipelineState:
+        ref = uuid.uuid4().hex
+        # b"" stands in for the bytes so the input still validates; load_cv reads the side store
+        placeholder = b"" if state.cv_bytes is not None else None
+        if state.cv_bytes is not None:
+            SIDE_STORE.put(ref, "cv_bytes", state.cv_bytes)
+            # Take the bytes out of the caller's state too, or they would stay alive for the whole run
+            state.cv_bytes = placeholder
+        start = state.model_copy(update={"run_ref": ref})
+        try:
+            final = run(start, on_node)
+            values = dict(final)
+            values.update(SIDE_STORE.pop_run(ref))
+        finally:
+            SIDE_STORE.pop_run(ref)
+        values.update(cv_bytes=placeholder, run_ref=None)
+        return PipelineState.model_validate(values)
+
+    def runner(state: PipelineState, on_node: Optional[Callable[[str], None]] = None) -> PipelineState:
+        """Run the pipeline. ``on_node`` is called with each node name as it finishes."""
+        t0 = time.perf_counter()
+        try:
+            final = run_slim(state, on_node) if slim else run(state, on_node)
+        except Exception:
+            PIPELINE_RUNS.inc(outcome="error")
+            PIPELINE_SECONDS.observe(time.perf_counter() - t0)
+            raise
+        _record_run(final, time.perf_counter() - t0)
+        return final
 
     return runner
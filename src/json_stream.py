@@ -0,0 +1,344 @@
+from __future__ import annotations
+import json
+import typing
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type, TypeVar
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from .metrics import STRUCTURED_OUTPUT
+
+M = TypeVar("M", bound=BaseModel)
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class IncrementalJSONParser:
+    """Consume LLM output chunk by chunk and capture the first top-level JSON object.
+
+    Anything before the first ``{`` (prose, code fences) is skipped. ``feed`` returns
+    True as soon as the object is closed, so the caller can stop reading the stream.
+    """
+
+    def __init__(self) -> None:
+        self._buf: List[str] = []
+        self._stack: List[str] = []
+        self._in_str = False
+        self._esc = False
+        self.done = False
+
+    def feed(self, chunk: str) -> bool:
+        if self.done or not chunk:
+            return self.done
+        start = 0
+        if not self._stack:
+            start = chunk.find("{")
+            if start == -1:
+                return False
+            self._stack.append("{")
+            self._buf.append("{")
+            start += 1
+        for i in range(start, len(chunk)):
+            ch = chunk[i]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch in "{[":
+                self._stack.append(ch)
+            elif ch in "}]":
+                self._stack.pop()
+                if not self._stack:
+                    self._buf.append(chunk[start:i + 1])
+                    self.done = True
+                    return True
+        self._buf.append(chunk[start:])
+        return False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._buf)
+
+    def result(self) -> Any:
+        """Return the parsed object, repairing truncated or slightly malformed JSON."""
+        raw = self.text
+        if not raw:
+            raise ValueError("No JSON object found in LLM response")
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return json.loads(repair_json(raw))
+
+
+def repair_json(text: str) -> str:
+    """Fix common LLM JSON defects: trailing commas, unterminated strings, unclosed brackets.
+
+    When the tail is cut mid-token, fall back to the last complete member before it.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    # (length of out, stack snapshot) at each comma outside strings, for rollback
+    cuts: List[Tuple[int, List[str]]] = []
+    in_str = esc = False
+    for ch in text:
+        if in_str:
+            out.append(ch)
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            out.append(ch)
+            if stack:
+                stack.pop()
+            if not stack:
+                break
+            continue
+        elif ch == ",":
+            cuts.append((len(out), list(stack)))
+        out.append(ch)
+
+    tail = "".join(out)
+    if in_str:
+        tail += '"'
+    candidate = _close(tail, stack)
+    if _loads_ok(candidate):
+        return candidate
+    for pos, snapshot in reversed(cuts):
+        candidate = _close("".join(out[:pos]), snapshot)
+        if _loads_ok(candidate):
+            return candidate
+    return "{}"
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i:]
+
+
+def _close(text: str, stack: List[str]) -> str:
+    t = text.rstrip()
+    if t.endswith(","):
+        t = t[:-1]
+    if t.endswith(":"):
+        t += " null"
+    return t + "".join(_CLOSERS[c] for c in reversed(stack))
+
+
+def _loads_ok(text: str) -> bool:
+    try:
+        json.loads(text)
+        return True
+    except json.JSONDecodeError:
+        return False
+
+
+def validate_fields(model_cls: Type[M], data: Any) -> Tuple[M, List[str]]:
+    """Validate ``data`` against ``model_cls`` one field at a time.
+
+    Invalid fields fall back to their defaults; invalid items inside list fields are
+    dropped individually. Returns the model and the names of fields that were repaired.
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected a JSON object for {model_cls.__name__}, got {type(data).__name__}")
+    clean: Dict[str, Any] = {}
+    invalid: List[str] = []
+    for name, field in model_cls.model_fields.items():
+        if name not in data:
+            continue
+        value = data[name]
+        try:
+            clean[name] = TypeAdapter(field.annotation).validate_python(value)
+            continue
+        except ValidationError:
+            invalid.append(name)
+        item_type = _list_item_type(field.annotation)
+        if item_type is not None and isinstance(value, list):
+            adapter = TypeAdapter(item_type)
+            items = []
+            for v in value:
+                try:
+                    items.append(adapter.validate_python(v))
+                except ValidationError:
+                    continue
+            clean[name] = items
+    return model_cls.model_validate(clean), invalid
+
+
+def _list_item_type(annotation: Any) -> Any:
+    if typing.get_origin(annotation) in (list, List):
+        args = typing.get_args(annotation)
+        return args[0] if args else None
+    return None
+
+
+def iter_llm_text(llm: Any, messages: List[Any], meta: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Yield response text from ``llm``, streaming when the model supports it.
+
+    ``meta`` (if given) receives ``provider``: who answered, when a failover wrapper recorded it.
+    """
+    from .llm_provider import answered_by
+    if hasattr(llm, "stream"):
+        for chunk in llm.stream(messages):
+            if meta is not None and "provider" not in meta:
+                meta["provider"] = answered_by(chunk)
+            yield _content_text(getattr(chunk, "content", chunk))
+    else:
+        resp = llm.invoke(messages)
+        if meta is not None:
+            meta["provider"] = answered_by(resp)
+        yield _content_text(getattr(resp, "content", ""))
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(c if isinstance(c, str) else str(c.get("text", "")) for c in content if isinstance(c, (str, dict)))
+    return str(content or "")
+
+
+def parse_json_stream(chunks: Iterable[str]) -> Any:
+    """Parse the first JSON object from ``chunks``, stopping once it is complete."""
+    parser = IncrementalJSONParser()
+    it = iter(chunks)
+    try:
+        for chunk in it:
+            if parser.feed(chunk):
+                break
+    finally:
+        close = getattr(it, "close", None)
+        if close is not None:
+            close()
+    return parser.result()
+
+
+# Follow-up calls allowed per structured call to fix invalid fields
+MAX_REPAIR_ROUNDS = 1
+
+# Per-provider counters of structured-output calls: replies that were unusable, had invalid
+# fields, and repair follow-ups made / that fixed every invalid field. Kept in the metrics
+# registry, so they are exported as cv_analyzer_structured_output_total as well
+STRUCTURED_EVENTS = ("calls", "parse_failures", "invalid", "repair_calls", "repaired")
+
+
+def _count(provider: str, event: str) -> None:
+    STRUCTURED_OUTPUT.inc(provider=provider, event=event)
+
+
+def structured_output_stats() -> Dict[str, Dict[str, int]]:
+    """Snapshot of the per-provider structured-output counters."""
+    stats: Dict[str, Dict[str, int]] = {}
+    for labels, value in STRUCTURED_OUTPUT.samples():
+        stats.setdefault(labels["provider"], dict.fromkeys(STRUCTURED_EVENTS, 0))[labels["event"]] = int(value)
+    return dict(sorted(stats.items()))
+
+
+def reset_structured_output_stats() -> None:
+    STRUCTURED_OUTPUT.clear()
+
+
+def format_structured_output_stats() -> str:
+    lines = []
+    for provider, c in structured_output_stats().items():
+        wasted = c["parse_failures"] / c["calls"] if c["calls"] else 0.0
+        lines.append(
+            f"{provider}: {c['calls']} calls, {c['parse_failures']} unusable ({wasted:.1%}), "
+            f"{c['invalid']} with invalid fields, {c['repaired']}/{c['repair_calls']} repairs succeeded"
+        )
+    return "\n".join(lines)
+
+
+def _field_errors(model_cls: Type[BaseModel], data: Dict[str, Any], names: List[str]) -> Dict[str, str]:
+    errors: Dict[str, str] = {}
+    for name in names:
+        try:
+            TypeAdapter(model_cls.model_fields[name].annotation).validate_python(data.get(name))
+        except ValidationError as e:
+            errors[name] = "; ".join(
+                (".".join(str(p) for p in err["loc"]) + ": " if err["loc"] else "") + err["msg"] for err in e.errors()[:3]
+            )
+    return errors
+
+
+def _repair_messages(model_cls: Type[BaseModel], messages: List[Any], data: Dict[str, Any],
+                     errors: Dict[str, str]) -> List[Any]:
+    """Ask again for the invalid fields only; the reply is small, so a repair costs a fraction of a call."""
+    from langchain_core.messages import AIMessage, HumanMessage
+    schema = {n: TypeAdapter(model_cls.model_fields[n].annotation).json_schema() for n in errors}
+    previous = {n: data.get(n) for n in errors}
+    return messages + [
+        AIMessage(content=json.dumps(previous, ensure_ascii=False)),
+        HumanMessage(content=(
+            "These fields of your JSON were invalid:\n"
+            + "\n".join(f"- {n}: {msg}" for n, msg in errors.items())
+            + "\n\nReturn ONLY a JSON object with exactly these keys, fixed to match this JSON schema:\n"
+            + json.dumps(schema, ensure_ascii=False)
+        )),
+    ]
+
+
+def parse_llm_json(llm: Any, messages: List[Any], model_cls: Type[M]) -> Tuple[M, List[str]]:
+    """Stream ``messages`` through ``llm`` in JSON mode and validate the reply against ``model_cls``.
+
+    Invalid fields are re-requested (only those fields) up to MAX_REPAIR_ROUNDS times; any still
+    invalid fall back to their defaults and are returned. Outcomes are counted per provider.
+    """
+    from .llm_provider import json_mode, provider_label
+    llm = json_mode(llm)
+    transport_error = False
+    meta: Dict[str, Any] = {}
+
+    def text(msgs: List[Any]) -> Iterator[str]:
+        nonlocal transport_error
+        try:
+            yield from iter_llm_text(llm, msgs, meta)
+        except Exception:
+            transport_error = True
+            raise
+
+    try:
+        data = parse_json_stream(text(messages))
+        model, invalid = validate_fields(model_cls, data)
+    except Exception:
+        # Only replies that arrived but were unusable count; network errors and timeouts don't
+        if not transport_error:
+            provider = meta.get("provider") or provider_label(llm)
+            _count(provider, "calls")
+            _count(provider, "parse_failures")
+        raise
+    provider = meta.get("provider") or provider_label(llm)
+    _count(provider, "calls")
+    if not invalid:
+        return model, invalid
+    _count(provider, "invalid")
+
+    for _ in range(MAX_REPAIR_ROUNDS):
+        errors = _field_errors(model_cls, data, invalid)
+        _count(provider, "repair_calls")
+        try:
+            fix = parse_json_stream(text(_repair_messages(model_cls, messages, data, errors)))
+        except Exception:
+            break
+        if not isinstance(fix, dict):
+            break
+        data = {**data, **{n: fix[n] for n in invalid if n in fix}}
+        model, invalid = validate_fields(model_cls, data)
+        if not invalid:
+            _count(provider, "repaired")
+            break
+    return model, invalid
@@ -1,16 +1,26 @@
 from __future__ import annotations
+import math
 import os
-from typing import Any, Callable, List, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_mistralai import ChatMistralAI
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator, List, Optional
+
+from .metrics import LLM_CALLS, LLM_FAILOVERS, LLM_SECONDS
+
+if TYPE_CHECKING:  # provider SDKs are heavy; import them on first use only
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from langchain_mistralai import ChatMistralAI
 
 
 PROVIDERS = {"auto", "gemini", "mistral"}
 
 
 def _read_secrets() -> dict[str, str]:
+    # Only consult st.secrets when running under Streamlit; never import it from the CLI
+    st = sys.modules.get("streamlit")
+    if st is None:
+        return {}
     try:
-        import streamlit as st  # type: ignore
         if hasattr(st, "secrets"):
             return dict(st.secrets)
     except Exception:
@@ -40,6 +50,7 @@ def build_gemini(temperature: float = 0.2) -> ChatGoogleGenerativeAI:
     model = _get_secret("GEMINI_MODEL") or "gemini-2.0-flash"
     os.environ["GEMINI_API_KEY"] = key
     os.environ["GOOGLE_API_KEY"] = key
+    from langchain_google_genai import ChatGoogleGenerativeAI
     return ChatGoogleGenerativeAI(model=model, temperature=temperature)
 
 
@@ -49,19 +60,162 @@ def build_mistral(temperature: float = 0.2) -> ChatMistralAI:
         raise RuntimeError("MISTRAL_API_KEY is missing. Set it in .env or Streamlit secrets.")
     model = _get_secret("MISTRAL_MODEL") or "mistral-large-latest"
     os.environ["MISTRAL_API_KEY"] = key
+    from langchain_mistralai import ChatMistralAI
     return ChatMistralAI(model=model, temperature=temperature)
 
 
+def json_mode(llm: Any) -> Any:
+    """``llm`` configured for provider-native JSON output where supported, else ``llm`` itself.
+
+    Wrappers (MultiProviderLLM, MeteredLLM, DeadlineLLM, CassetteLLM) expose ``json_mode()`` and pass it on.
+    """
+    hook = getattr(llm, "json_mode", None)
+    if callable(hook):
+        return hook()
+    name = type(llm).__name__
+    if name == "ChatGoogleGenerativeAI" and "response_mime_type" in type(llm).model_fields:
+        return llm.model_copy(update={"response_mime_type": "application/json"})
+    if name == "ChatMistralAI":
+        return llm.bind(response_format={"type": "json_object"})
+    return llm
+
+
+def with_request_timeout(llm: Any, seconds: float) -> Any:
+    """``llm`` whose provider client gives up after ``seconds`` itself, without retries.
+
+    A call abandoned by ``call_with_timeout`` would otherwise keep running (and billing) in its
+    thread. Wrappers expose ``with_request_timeout()`` and pass it on; unknown models are
+    returned as they are.
+    """
+    hook = getattr(llm, "with_request_timeout", None)
+    if callable(hook):
+        return hook(seconds)
+    bound = getattr(llm, "bound", None)
+    if bound is not None and isinstance(getattr(llm, "kwargs", None), dict):
+        # RunnableBinding from json_mode: rebind the same arguments to the bounded model
+        return with_request_timeout(bound, seconds).bind(**llm.kwargs)
+    name = type(llm).__name__
+    if name == "ChatGoogleGenerativeAI":
+        # timeout and max_retries (attempts) are read per request
+        return llm.model_copy(update={"timeout": seconds, "max_retries": 1})
+    if name == "ChatMistralAI" and llm.client is not None:
+        # The httpx client carries the timeout, so the copy gets its own client
+        import httpx
+        client = httpx.Client(base_url=llm.client.base_url, headers=llm.client.headers, timeout=seconds)
+        return llm.model_copy(update={"timeout": max(1, math.ceil(seconds)), "max_retries": 1, "client": client})
+    return llm
+
+
+def answered_by(resp: Any) -> Optional[str]:
+    """Provider that MultiProviderLLM recorded on a response or (first) stream chunk, if any."""
+    meta = getattr(resp, "response_metadata", None)
+    return meta.get("provider") if isinstance(meta, dict) else None
+
+
+def _tag_provider(resp: Any, model: Any) -> Any:
+    meta = getattr(resp, "response_metadata", None)
+    if isinstance(meta, dict):
+        meta["provider"] = provider_label(model)
+    return resp
+
+
+def provider_label(llm: Any) -> str:
+    """Short provider name of a (possibly wrapped) LLM, for per-provider metrics.
+
+    A MultiProviderLLM is ``auto``: which provider answers is per call, see ``answered_by``.
+    """
+    while llm is not None and not isinstance(llm, MultiProviderLLM) and hasattr(llm, "llm"):
+        llm = llm.llm
+    if llm is None:
+        return "replay"
+    if isinstance(llm, MultiProviderLLM):
+        return "auto"
+    llm = getattr(llm, "bound", llm)  # RunnableBinding from json_mode
+    name = type(llm).__name__
+    if "GoogleGenerativeAI" in name:
+        return "gemini"
+    if "Mistral" in name:
+        return "mistral"
+    return name
+
+
+class MeteredLLM:
+    """Counts ``invoke``/``stream`` calls and their latency per provider in the metrics registry."""
+
+    def __init__(self, llm: Any):
+        self.llm = llm
+
+    def json_mode(self) -> "MeteredLLM":
+        return MeteredLLM(json_mode(self.llm))
+
+    def with_request_timeout(self, seconds: float) -> "MeteredLLM":
+        return MeteredLLM(with_request_timeout(self.llm, seconds))
+
+    def _observe(self, t0: float, outcome: str, resp: Any = None) -> None:
+        provider = answered_by(resp) or provider_label(self.llm)
+        LLM_CALLS.inc(provider=provider, outcome=outcome)
+        LLM_SECONDS.observe(time.perf_counter() - t0, provider=provider)
+
+    def invoke(self, messages: list[Any]) -> Any:
+        t0 = time.perf_counter()
+        try:
+            resp = self.llm.invoke(messages)
+        except Exception:
+            self._observe(t0, "error")
+            raise
+        self._observe(t0, "ok", resp)
+        return resp
+
+    def stream(self, messages: list[Any]) -> Iterator[Any]:
+        t0 = time.perf_counter()
+        outcome = "ok"
+        first = None
+        try:
+            for chunk in self.llm.stream(messages):
+                if first is None:
+                    first = chunk
+                yield chunk
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            # A consumer closing the stream early (GeneratorExit) still counts as a good call
+            self._observe(t0, outcome, first)
+
+
 class MultiProviderLLM:
-    """Try multiple provider builders in order. Build lazily and failover on errors."""
+    """Try multiple provider builders in order. Build lazily and failover on errors.
 
-    def __init__(self, builders: List[Callable[[], Any]]):
+    One instance is shared by concurrent callers, so nothing about a call is kept on it: the
+    answering provider is written to the response's (or first chunk's) ``response_metadata``.
+    """
+
+    def __init__(self, builders: List[Callable[[], Any]], names: Optional[List[str]] = None):
         self.builders = builders
+        # Provider names for the failover metric (a builder that fails has no model to label)
+        self.names = names or [f"provider{i}" for i in range(len(builders))]
         self._instances: List[Any | None] = [None] * len(builders)
-        self._errors: List[str] = []
+        self._json: Optional["MultiProviderLLM"] = None
+
+    def json_mode(self) -> "MultiProviderLLM":
+        if self._json is None:
+            self._json = MultiProviderLLM([lambda b=b: json_mode(b()) for b in self.builders], self.names)
+        return self._json
+
+    def with_request_timeout(self, seconds: float) -> "MultiProviderLLM":
+        """A view over the same provider instances (built here if needed) with their request timeout set."""
+        def builder(i: int) -> Any:
+            if self._instances[i] is None:
+                self._instances[i] = self.builders[i]()
+            return with_request_timeout(self._instances[i], seconds)
+        return MultiProviderLLM([lambda i=i: builder(i) for i in range(len(self.builders))], self.names)
+
+    def _failover(self, i: int) -> None:
+        if i + 1 < len(self.builders):
+            LLM_FAILOVERS.inc(provider=self.names[i])
 
     def invoke(self, messages: list[Any]) -> Any:
-        self._errors.clear()
+        errors: List[str] = []
         last_exc: Optional[Exception] = None
         for i, b in enumerate(self.builders):
             # Build if needed
@@ -69,27 +223,67 @@ class MultiProviderLLM:
                 try:
                     self._instances[i] = b()
                 except Exception as e:
-                    self._errors.append(f"build[{i}]: {e}")
+                    errors.append(f"build[{i}]: {e}")
+                    last_exc = e
+                    self._failover(i)
+                    continue
+            model = self._instances[i]
+            try:
+                return _tag_provider(model.invoke(messages), model)
+            except Exception as e:
+                errors.append(f"invoke[{i}]: {e}")
+                last_exc = e
+                self._failover(i)
+                continue
+        raise RuntimeError("All providers failed: " + "; ".join(errors)) from last_exc
+
+    def stream(self, messages: list[Any]) -> Iterator[Any]:
+        """Stream from the first working provider. Failover only happens before the first chunk."""
+        errors: List[str] = []
+        last_exc: Optional[Exception] = None
+        for i, b in enumerate(self.builders):
+            if self._instances[i] is None:
+                try:
+                    self._instances[i] = b()
+                except Exception as e:
+                    errors.append(f"build[{i}]: {e}")
                     last_exc = e
+                    self._failover(i)
                     continue
             model = self._instances[i]
+            started = False
             try:
-                return model.invoke(messages)
+                for chunk in model.stream(messages):
+                    if not started:
+                        started = True
+                        chunk = _tag_provider(chunk, model)
+                    yield chunk
+                return
             except Exception as e:
-                self._errors.append(f"invoke[{i}]: {e}")
+                if started:
+                    raise
+                errors.append(f"stream[{i}]: {e}")
                 last_exc = e
+                self._failover(i)
                 continue
-        raise RuntimeError("All providers failed: " + "; ".join(self._errors)) from last_exc
+        raise RuntimeError("All providers failed: " + "; ".join(errors)) from last_exc
 
 
 def get_llm(provider: str = "auto", temperature: float = 0.2) -> Any:
+    from .cassette import CassetteLLM, active_cassette
+    cassette = active_cassette()
+    if cassette is not None and cassette.replaying:
+        # Replay serves recorded responses; no provider (or API key) is needed
+        return MeteredLLM(CassetteLLM(None, cassette))
     p = normalize_provider(provider)
     if p == "gemini":
-        return build_gemini(temperature)
-    if p == "mistral":
-        return build_mistral(temperature)
-    # auto
-    return MultiProviderLLM([
-        lambda: build_gemini(temperature),
-        lambda: build_mistral(temperature),
-    ])
+        llm = build_gemini(temperature)
+    elif p == "mistral":
+        llm = build_mistral(temperature)
+    else:
+        llm = MultiProviderLLM([
+            lambda: build_gemini(temperature),
+            lambda: build_mistral(temperature),
+        ], ["gemini", "mistral"])
+    llm = MeteredLLM(llm)
+    return CassetteLLM(llm, cassette) if cassette is not None else llm
@@ -0,0 +1,246 @@
+from __future__ import annotations
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Interface the HTTP exporter binds to unless told otherwise: local scrapers only
+DEFAULT_METRICS_ADDR = "127.0.0.1"
+
+# Latency buckets (seconds) spanning regex work to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()  # type: ignore[attr-defined]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), v) for key, v in items]
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, key)} {_num(v)}" for key, v in items]
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_num(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Process-wide set of metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls: type, name: str, help: str, labelnames: Sequence[str], **kwargs: object) -> _Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+        if not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} already registered with a different type or labels")
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, help, labelnames)  # type: ignore[return-value]
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)  # type: ignore[return-value]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "\n".join(line for m in metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+# -------- Pipeline metrics --------
+PIPELINE_RUNS = REGISTRY.counter("cv_analyzer_pipeline_runs_total", "Pipeline runs by outcome (ok = report produced).", ["outcome"])
+PIPELINE_SECONDS = REGISTRY.histogram("cv_analyzer_pipeline_duration_seconds", "Wall time of a whole pipeline run.")
+NODE_SECONDS = REGISTRY.histogram("cv_analyzer_node_duration_seconds", "Wall time per LangGraph node.", ["node"])
+DEGRADED = REGISTRY.counter("cv_analyzer_degraded_total", "Nodes that switched to a heuristic because the time budget ran out.", ["node"])
+LLM_CALLS = REGISTRY.counter("cv_analyzer_llm_calls_total", "LLM invoke/stream calls by provider and outcome.", ["provider", "outcome"])
+LLM_SECONDS = REGISTRY.histogram("cv_analyzer_llm_call_duration_seconds", "LLM call latency by provider (to the last chunk when streaming).", ["provider"])
+LLM_FAILOVERS = REGISTRY.counter("cv_analyzer_llm_failovers_total", "MultiProviderLLM moving past a provider that failed to build or answer.", ["provider"])
+FALLBACKS = REGISTRY.counter("cv_analyzer_fallbacks_total", "Rule-based fallbacks taken after an LLM step failed.", ["component"])
+TAVILY_REQUESTS = REGISTRY.counter("cv_analyzer_tavily_requests_total", "Tavily searches by outcome.", ["outcome"])
+TAVILY_SECONDS = REGISTRY.histogram("cv_analyzer_tavily_request_duration_seconds", "Tavily search latency.")
+STRUCTURED_OUTPUT = REGISTRY.counter("cv_analyzer_structured_output_total", "Structured-output events per provider (see STRUCTURED_EVENTS).", ["provider", "event"])
+
+
+# -------- Exposition --------
+_exporters: Dict[str, object] = {}
+_exporters_lock = threading.Lock()
+
+
+def write_metrics_file(path: str) -> None:
+    """Write the registry atomically, e.g. for node_exporter's textfile collector."""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_text(REGISTRY.render(), encoding="utf-8")
+    os.replace(tmp, target)
+
+
+def start_http_exporter(port: int, addr: str = DEFAULT_METRICS_ADDR) -> None:
+    """Serve the registry at ``http://addr:port/metrics`` from a daemon thread (once per port).
+
+    Binds to localhost by default; pass ``addr="0.0.0.0"`` to expose it on every interface.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    with _exporters_lock:
+        if f"http:{port}" in _exporters:
+            return
+        server = ThreadingHTTPServer((addr, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        _exporters[f"http:{port}"] = server
+
+
+def start_file_exporter(path: str, interval: float = 15.0) -> None:
+    """Rewrite ``path`` with the registry every ``interval`` seconds from a daemon thread (once per path)."""
+    def loop() -> None:
+        failing = False
+        while True:
+            time.sleep(interval)
+            try:
+                write_metrics_file(path)
+            except OSError as e:
+                # Logged when writes start failing, not on every retry
+                if not failing:
+                    logging.warning(f"Writing metrics to {path} failed: {e}")
+                failing = True
+            else:
+                failing = False
+
+    with _exporters_lock:
+        if f"file:{path}" in _exporters:
+            return
+        threading.Thread(target=loop, name="metrics-file", daemon=True).start()
+        _exporters[f"file:{path}"] = path
+
+
+def start_exporters_from_env() -> None:
+    """Start exporters configured by ``CV_ANALYZER_METRICS_PORT`` and/or ``CV_ANALYZER_METRICS_FILE``.
+
+    ``CV_ANALYZER_METRICS_ADDR`` sets the HTTP bind address (default 127.0.0.1) and
+    ``CV_ANALYZER_METRICS_INTERVAL`` the file flush period in seconds (default 15).
+    """
+    port: Optional[str] = os.getenv("CV_ANALYZER_METRICS_PORT")
+    if port:
+        start_http_exporter(int(port), os.getenv("CV_ANALYZER_METRICS_ADDR") or DEFAULT_METRICS_ADDR)
+    path = os.getenv("CV_ANALYZER_METRICS_FILE")
+    if path:
+        start_file_exporter(path, float(os.getenv("CV_ANALYZER_METRICS_INTERVAL", "15")))
@@ -0,0 +1,287 @@
+from __future__ import annotations
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# Sampling interval for the collapsed-stack (flame graph) output
+SAMPLE_INTERVAL_S = 0.005
+
+# Allocation sites kept per node in allocations.txt
+TOP_ALLOCATIONS = 25
+
+# Allocation sites come from tracemalloc snapshots around the first call(s) of each node. A
+# snapshot costs time proportional to the whole traced heap (seconds on a large one) and the
+# call has to run alone to be attributed, so only this many calls per node are snapshotted
+ALLOC_SNAPSHOT_CALLS = 1
+
+# From Python 3.12 cProfile sits on sys.monitoring: one profiler per process, tracing every
+# thread. Per-thread profiles cannot coexist there, so profiled calls run one at a time
+EXCLUSIVE_CPU_PROFILE = sys.version_info >= (3, 12)
+
+_profilers: Dict[str, "NodeProfiler"] = {}
+_profilers_lock = threading.Lock()
+
+
+def profiler_from_env() -> Optional["NodeProfiler"]:
+    """Shared profiler writing to ``CV_ANALYZER_PROFILE`` (a directory), or None when the variable is unset."""
+    out_dir = os.getenv("CV_ANALYZER_PROFILE")
+    if not out_dir:
+        return None
+    with _profilers_lock:
+        prof = _profilers.get(out_dir)
+        if prof is None:
+            prof = _profilers[out_dir] = NodeProfiler(out_dir)
+        return prof
+
+
+def _frame_label(code: Any) -> str:
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class _Gate:
+    """Lets profiled calls run concurrently, except snapshot calls, which run alone.
+
+    Waiting exclusive calls hold back new shared ones, so a busy batch cannot starve them.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._waiting = 0
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        with self._cond:
+            while self._exclusive or self._waiting:
+                self._cond.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        with self._cond:
+            self._waiting += 1
+            while self._exclusive or self._shared:
+                self._cond.wait()
+            self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+
+class NodeProfiler:
+    """Per-node CPU (cProfile), allocation (tracemalloc) and stack-sample profiles for pipeline runs.
+
+    Nodes are wrapped with ``wrap``; when no profiler is passed to ``build_graph`` nothing is
+    wrapped at all. Node calls run concurrently, as they would unprofiled: each thread keeps its
+    own cProfile per node, merged per node at dump time (on Python 3.12+, where only one
+    profiler can be active per process, calls run one at a time instead). Only the first ``alloc_snapshot_calls``
+    calls of each node run alone, so the heap snapshots around them attribute allocations to
+    that node. tracemalloc's peak is process-wide, so a node's peak memory comes from the calls
+    that no other profiled call overlapped. ``dump`` writes, per node, ``<node>.pstats`` plus the
+    combined ``allocations.txt``, ``stacks.collapsed`` (for flamegraph.pl / speedscope) and
+    ``summary.txt``.
+    """
+
+    def __init__(self, out_dir: str, sample_interval: float = SAMPLE_INTERVAL_S,
+                 alloc_snapshot_calls: int = ALLOC_SNAPSHOT_CALLS):
+        self.out_dir = Path(out_dir)
+        self.sample_interval = sample_interval
+        self.alloc_snapshot_calls = alloc_snapshot_calls
+        self._gate = _Gate()
+        self._data_lock = threading.Lock()
+        self._profiles: Dict[Tuple[int, str], cProfile.Profile] = {}
+        self._allocs: Dict[str, Counter] = defaultdict(Counter)
+        self._alloc_counts: Dict[str, Counter] = defaultdict(Counter)
+        self._snapshots: Counter = Counter()
+        self._peaks: Dict[str, int] = defaultdict(int)
+        self._isolated: Counter = Counter()
+        self._unprofiled: Counter = Counter()
+        self._inflight: Dict[object, bool] = {}
+        self._calls: Counter = Counter()
+        self._wall: Dict[str, float] = defaultdict(float)
+        self._cpu: Dict[str, float] = defaultdict(float)
+        self._stacks: Counter = Counter()
+        self._active: Dict[int, str] = {}
+        self._sampler: Optional[threading.Thread] = None
+
+    def wrap(self, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        def profiled(*args: Any, **kwargs: Any) -> Any:
+            return self.run(name, fn, *args, **kwargs)
+        profiled.__name__ = getattr(fn, "__name__", name)
+        return profiled
+
+    def run(self, name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._data_lock:
+            self._ensure_sampler()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(1)  # allocation sites are reported by line, one frame is enough
+            snapshot = self._snapshots[name] < self.alloc_snapshot_calls
+            if snapshot:
+                self._snapshots[name] += 1
+            tid = threading.get_ident()
+            prof = self._profiles.get((tid, name))
+            if prof is None:
+                prof = self._profiles[(tid, name)] = cProfile.Profile()
+        token = object()
+        before = after = None
+        peak: Optional[int] = None
+        wall = cpu = 0.0
+        try:
+            with self._gate.exclusive() if snapshot or EXCLUSIVE_CPU_PROFILE else self._gate.shared():
+                if snapshot:
+                    before = tracemalloc.take_snapshot()
+                with self._data_lock:
+                    # A call's traced peak is its own only if no other profiled call overlaps it
+                    alone = not self._inflight
+                    for other in self._inflight:
+                        self._inflight[other] = False
+                    self._inflight[token] = alone
+                    if alone:
+                        tracemalloc.reset_peak()
+                    base, _ = tracemalloc.get_traced_memory()
+                self._active[tid] = name
+                t0, c0 = time.perf_counter(), time.thread_time()
+                try:
+                    prof.enable()
+                except ValueError:
+                    # Another profiler (a debugger, coverage) holds the process-wide slot: time the
+                    # call without CPU profiling rather than failing the node
+                    prof = None
+                    with self._data_lock:
+                        self._unprofiled[name] += 1
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    if prof is not None:
+                        prof.disable()
+                    wall, cpu = time.perf_counter() - t0, time.thread_time() - c0
+                    self._active.pop(tid, None)
+                    with self._data_lock:
+                        if self._inflight.pop(token):
+                            peak = tracemalloc.get_traced_memory()[1] - base
+                    if snapshot:
+                        after = tracemalloc.take_snapshot()
+        finally:
+            # Diffing the snapshots is the slow part; it runs after the gate lets other calls go
+            self._record(name, before, after, peak, wall, cpu)
+
+    def _record(self, name: str, before: Optional[tracemalloc.Snapshot],
+                after: Optional[tracemalloc.Snapshot], peak: Optional[int], wall: float, cpu: float) -> None:
+        diff = []
+        if before is not None and after is not None:
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+            diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+        with self._data_lock:
+            for stat in diff:
+                if stat.size_diff > 0:
+                    site = str(stat.traceback[0])
+                    self._allocs[name][site] += stat.size_diff
+                    self._alloc_counts[name][site] += stat.count_diff
+            if peak is not None:
+                self._peaks[name] = max(self._peaks[name], peak)
+                self._isolated[name] += 1
+            self._calls[name] += 1
+            self._wall[name] += wall
+            self._cpu[name] += cpu
+
+    def _ensure_sampler(self) -> None:
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample_loop, name="node-profiler-sampler", daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self) -> None:
+        while True:
+            time.sleep(self.sample_interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for tid, node in list(self._active.items()):
+                frame = frames.get(tid)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    key = ";".join([node] + stack[::-1])
+                    with self._data_lock:
+                        self._stacks[key] += 1
+
+    def dump(self) -> Path:
+        """Write everything collected so far to ``out_dir`` (overwriting earlier dumps); returns the directory."""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        with self._data_lock:
+            stats = self._merged_stats()
+            for name, node_stats in stats.items():
+                node_stats.dump_stats(str(self.out_dir / f"{name}.pstats"))
+            (self.out_dir / "allocations.txt").write_text(self._render_allocations(), encoding="utf-8")
+            (self.out_dir / "summary.txt").write_text(self._render_summary(stats), encoding="utf-8")
+            stacks = "".join(f"{key} {n}\n" for key, n in sorted(self._stacks.items()))
+            (self.out_dir / "stacks.collapsed").write_text(stacks, encoding="utf-8")
+        return self.out_dir
+
+    def _merged_stats(self) -> Dict[str, pstats.Stats]:
+        """One Stats per node, combining every thread's profile of it."""
+        merged: Dict[str, pstats.Stats] = {}
+        for (_tid, name), prof in self._profiles.items():
+            if not prof.getstats():
+                continue
+            if name in merged:
+                merged[name].add(prof)
+            else:
+                merged[name] = pstats.Stats(prof, stream=io.StringIO())
+        return merged
+
+    def _render_summary(self, stats: Dict[str, pstats.Stats]) -> str:
+        lines = [f"{'node':<10} {'calls':>6} {'wall s':>9} {'cpu s':>9} {'wait s':>9} {'peak KiB':>10} {'alone':>6}"]
+        for name in self._calls:
+            wall, cpu = self._wall[name], self._cpu[name]
+            peak = f"{self._peaks[name] / 1024:.1f}" if self._isolated[name] else "-"
+            lines.append(
+                f"{name:<10} {self._calls[name]:>6} {wall:>9.3f} {cpu:>9.3f} {max(0.0, wall - cpu):>9.3f} "
+                f"{peak:>10} {self._isolated[name]:>6}"
+            )
+        lines += [
+            "",
+            "wait s = wall - cpu: time blocked on network, disk or locks.",
+            "peak KiB = largest traced-heap peak of the calls no other node call overlapped (counted in 'alone');",
+            "'-' when every call overlapped another.",
+        ]
+        skipped = ", ".join(f"{name} {n}" for name, n in self._unprofiled.items())
+        if skipped:
+            lines.append(f"Calls run without cProfile (another profiler was active): {skipped}.")
+        for name, node_stats in stats.items():
+            out = io.StringIO()
+            node_stats.stream = out
+            node_stats.sort_stats("cumulative").print_stats(15)
+            lines += ["", f"== {name} (top 15 by cumulative time) ==", out.getvalue().strip()]
+        return "\n".join(lines) + "\n"
+
+    def _render_allocations(self) -> str:
+        lines = []
+        for name, sites in self._allocs.items():
+            lines.append(f"== {name}: top {TOP_ALLOCATIONS} allocation sites (net bytes retained after the node, "
+                         f"first {self._snapshots[name]} call(s), run alone) ==")
+            for site, size in sites.most_common(TOP_ALLOCATIONS):
+                lines.append(f"{size / 1024:>10.1f} KiB  {self._alloc_counts[name][site]:>8} blocks  {site}")
+            lines.append("")
+        return "\n".join(lines)
@@ -0,0 +1,145 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+from pydantic import BaseModel, Field
+
+from .analytics import encode_cohort
+from .skills import SkillSet, canonical_skill
+from .state import PipelineState
+from .store import ResultStore, normalize_key
+
+LANGUAGES = ("english", "indonesia")
+# "keep" rebuilds each report the way it was made: no-LLM runs as templates, LLM runs in their report mode
+REFRESH_MODES = ("keep", "template", "hybrid", "full")
+
+
+class RefreshSummary(BaseModel):
+    role: str
+    added: List[str] = Field(default_factory=list)      # in the new market list, missing from some stored one
+    removed: List[str] = Field(default_factory=list)    # in some stored market list, not in the new one
+    considered: int = 0                                 # latest stored run per CV and language
+    stale: int = 0                                      # ... whose stored market list differs from the new one
+    changed: int = 0                                    # ... whose strengths/gaps tables change
+    refreshed: List[int] = Field(default_factory=list)  # new run ids, one per regenerated report
+    skipped: List[str] = Field(default_factory=list)    # changed reports left alone (mode unknown under "keep")
+    failures: List[str] = Field(default_factory=list)
+
+
+def read_market_file(path: str, role: str) -> Dict[str, Any]:
+    """Market requirements from a JSON file (``{"skills": [...]}`` or a list) or plain text, one skill per line."""
+    text = Path(path).read_text(encoding="utf-8")
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+    if isinstance(data, list):
+        data = {"skills": data}
+    if not isinstance(data, dict) or not isinstance(data.get("skills"), list):
+        raise ValueError(f"{path}: expected a skill list or an object with a 'skills' list")
+    return {"role": role, "source": data.get("source", "file"), "skills": SkillSet.from_iterable(data["skills"]).to_list()}
+
+
+def _table(mat: np.ndarray, order: np.ndarray, limit: int) -> np.ndarray:
+    """The first ``limit`` skills per row in name order, as the report tables list them."""
+    ranked = mat[:, order]
+    out = np.zeros_like(mat)
+    out[:, order] = ranked & (np.cumsum(ranked, axis=1) <= limit)
+    return out
+
+
+def refresh_reports(store: ResultStore, role: str, market: Dict[str, Any], language: Optional[str] = None,
+                    mode: str = "keep", llm: Any = None, limit: int = 10, dry_run: bool = False) -> RefreshSummary:
+    """Regenerate the stored reports for ``role`` whose strengths/gaps tables change under ``market``.
+
+    Only the latest run per CV (and language) is considered. The candidate side comes from the
+    stored analyzed skills, so no CV is re-parsed or re-analyzed; the comparison runs over the
+    skill index for all runs at once and only changed reports are loaded and rebuilt. Rebuilt
+    reports are saved as new runs. ``mode`` is ``keep`` (each report in the mode it was made
+    with, so LLM-written reports are not replaced by templates; runs stored before modes were
+    recorded are skipped), ``template`` (no LLM), ``hybrid`` or ``full``. LLM rebuilds need ``llm``;
+    one whose LLM call fails keeps the stored report and is listed in ``failures``.
+    """
+    from .agents.report_agent import attach_evidence, build_report_context, make_report_data, render_markdown, template_report_data
+
+    if mode not in REFRESH_MODES:
+        raise ValueError(f"Unknown refresh mode: {mode}. Use one of {', '.join(REFRESH_MODES)}")
+    if mode in ("hybrid", "full") and llm is None:
+        raise ValueError(f"Refresh mode '{mode}' needs an LLM")
+    new_skills = list(dict.fromkeys(canonical_skill(s) for s in market.get("skills", []) if s and s.strip()))
+    summary = RefreshSummary(role=role)
+    added, removed = set(), set()
+
+    for lang in ([normalize_key(language)] if language else list(LANGUAGES)):
+        cohort = encode_cohort(store.iter_skill_rows(role=role, language=lang))
+        if not cohort.size:
+            continue
+        skills = list(cohort.skills)
+        index = {s: j for j, s in enumerate(skills)}
+        for s in new_skills:
+            if s not in index:
+                index[s] = len(skills)
+                skills.append(s)
+        pad = len(skills) - len(cohort.skills)
+
+        def widen(mat: np.ndarray) -> np.ndarray:
+            return np.pad(mat, ((0, 0), (0, pad))) if pad else mat
+
+        candidate, old_market = widen(cohort.candidate), widen(cohort.market)
+        new_market = np.zeros(len(skills), dtype=bool)
+        new_market[[index[s] for s in new_skills]] = True
+        order = np.argsort(np.asarray(skills, dtype=object), kind="stable")
+
+        stale = (old_market != new_market).any(axis=1)
+        changed = stale & (
+            (_table(candidate & new_market, order, limit) != widen(cohort.reported_strengths)).any(axis=1)
+            | (_table(new_market & ~candidate, order, limit) != widen(cohort.reported_gaps)).any(axis=1)
+        )
+        names = np.asarray(skills, dtype=object)
+        added.update(names[(new_market & ~old_market)[stale].any(axis=0)])
+        removed.update(names[(old_market & ~new_market)[stale].any(axis=0)])
+        summary.considered += cohort.size
+        summary.stale += int(stale.sum())
+        summary.changed += int(changed.sum())
+        if dry_run:
+            continue
+
+        for run_id in cohort.run_ids[changed].tolist():
+            run = store.get(run_id)
+            if run is None or not run.cv_structured or not run.analyzed_skills:
+                summary.failures.append(f"run {run_id}: stored intermediates missing")
+                continue
+            run_mode = mode
+            if mode == "keep":
+                run_mode = "template" if run.no_llm else run.report_mode
+                if run.no_llm is None or run_mode not in REFRESH_MODES:
+                    summary.skipped.append(f"run {run_id}: report mode not recorded; pass an explicit mode to rebuild it")
+                    continue
+                if run_mode != "template" and llm is None:
+                    summary.failures.append(f"run {run_id}: made in {run_mode} mode, rebuilding it needs an LLM")
+                    continue
+            new_market_req = {**market, "role": run.role}
+            try:
+                if run_mode == "template":
+                    context = build_report_context(run.cv_structured, run.analyzed_skills, new_market_req)
+                    rd = attach_evidence(template_report_data(run.language, context, limit), context, run.language)
+                else:
+                    rd = make_report_data(run.cv_structured, run.analyzed_skills, new_market_req, llm, run.language,
+                                          mode=run_mode, strict=True)
+            except Exception as e:
+                summary.failures.append(f"run {run_id}: {e}")
+                continue
+            # No CV input is needed to save a rebuilt report, so skip the input validator
+            state = PipelineState.model_construct(
+                cv_name=run.candidate, target_role=run.role, language=run.language, cv_text_hash=run.cv_hash,
+                cv_structured=run.cv_structured, analyzed_skills=run.analyzed_skills,
+                market_requirements=new_market_req, report_data=rd.model_dump(),
+                report_markdown=render_markdown(rd, run.language),
+                no_llm=run_mode == "template", report_mode=run.report_mode if run_mode == "template" else run_mode,
+                degraded=[],
+            )
+            summary.refreshed.append(store.save(state))
+
+    summary.added, summary.removed = sorted(added), sorted(removed)
+    return summary
@@ -0,0 +1,41 @@
+from __future__ import annotations
+import threading
+from typing import Any, Dict, Optional
+
+
+class SideStore:
+    """Thread-safe holder for a run's large intermediates, addressed by (run ref, field).
+
+    In slim mode the graph state carries only the run ref; nodes fetch the values they declare
+    from here, so LangGraph never copies or validates the bulky payloads between steps.
+    """
+
+    def __init__(self) -> None:
+        self._runs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._runs)
+
+    def put(self, ref: str, field: str, value: Any) -> None:
+        with self._lock:
+            self._runs.setdefault(ref, {})[field] = value
+
+    def get(self, ref: str, field: str) -> Optional[Any]:
+        run = self._runs.get(ref)
+        return None if run is None else run.get(field)
+
+    def release(self, ref: str, field: str) -> Optional[Any]:
+        """Drop one value (e.g. the raw CV text once parsed); returns it."""
+        with self._lock:
+            run = self._runs.get(ref)
+            return None if run is None else run.pop(field, None)
+
+    def pop_run(self, ref: str) -> Dict[str, Any]:
+        """Remove and return everything still held for ``ref``."""
+        with self._lock:
+            return self._runs.pop(ref, {})
+
+
+# Process-wide store shared by every slim-mode graph
+SIDE_STORE = SideStore()
@@ -0,0 +1,167 @@
+from __future__ import annotations
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+# Spelling variants folded onto one canonical skill, for CV, LLM, stored and built-in skill lists alike
+SKILL_ALIASES = {
+    'k8s': 'kubernetes', 'scikit-learn': 'sklearn', 'scikit learn': 'sklearn', 'postgresql': 'postgres',
+    'hugging face': 'huggingface', 'js': 'javascript', 'ts': 'typescript', 'golang': 'go',
+    'node': 'node.js', 'nodejs': 'node.js', 'nextjs': 'next.js', 'ci/cd': 'cicd', 'gh actions': 'github actions',
+}
+
+
+def canonical_skill(skill: str) -> str:
+    """Lowercase, whitespace-collapsed skill name with spelling variants folded (``golang`` -> ``go``)."""
+    name = " ".join(skill.split()).lower()
+    return SKILL_ALIASES.get(name, name)
+
+
+class SkillVocab:
+    """Interns canonical skill names (see ``canonical_skill``) to dense integer IDs."""
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def intern(self, skill: str) -> int:
+        """ID of an already canonical skill name, assigning the next free one if new."""
+        sid = self._ids.get(skill)
+        if sid is not None:
+            return sid
+        with self._lock:
+            sid = self._ids.get(skill)
+            if sid is None:
+                sid = len(self._names)
+                self._names.append(skill)
+                self._ids[skill] = sid
+            return sid
+
+    def lookup(self, skill: str) -> Optional[int]:
+        """ID of a canonical skill name, or None if it was never interned."""
+        return self._ids.get(skill)
+
+    def name(self, sid: int) -> str:
+        return self._names[sid]
+
+    @property
+    def names(self) -> List[str]:
+        return self._names
+
+
+# Distinct names the shared vocabulary holds before it is replaced by a fresh one. LLM and CV
+# skill lists keep producing new spellings, so a long-running process (the Streamlit app)
+# would otherwise intern names forever. SkillSets are short-lived and keep their own vocab.
+VOCAB_LIMIT = 10_000
+
+# Process-wide vocabulary shared by all agents; read it through shared_vocab()
+VOCAB = SkillVocab()
+_VOCAB_LOCK = threading.Lock()
+
+
+def shared_vocab() -> SkillVocab:
+    """The current process-wide vocabulary, starting a fresh one once VOCAB_LIMIT is reached."""
+    global VOCAB
+    if len(VOCAB) >= VOCAB_LIMIT:
+        with _VOCAB_LOCK:
+            if len(VOCAB) >= VOCAB_LIMIT:
+                VOCAB = SkillVocab()
+    return VOCAB
+
+
+class SkillSet:
+    """Immutable set of interned skills backed by an integer bitset (bit i = skill ID i).
+
+    Union, intersection and difference are single big-int operations; names are only
+    materialized (sorted) at the boundary via ``to_list``. Sets default to ``shared_vocab()``;
+    an operand from another vocabulary (an older shared one, or a cohort-local one) is
+    re-encoded by name first.
+    """
+
+    __slots__ = ("bits", "vocab")
+
+    def __init__(self, bits: int = 0, vocab: Optional[SkillVocab] = None):
+        self.bits = bits
+        self.vocab = vocab if vocab is not None else shared_vocab()
+
+    @classmethod
+    def from_iterable(cls, skills: Iterable[str] | "SkillSet", vocab: Optional[SkillVocab] = None) -> "SkillSet":
+        """Build from raw skill strings (canonicalized, blanks dropped) or pass a SkillSet through."""
+        if isinstance(skills, SkillSet):
+            return skills
+        if vocab is None:
+            vocab = shared_vocab()
+        bits = 0
+        intern = vocab.intern
+        for s in skills:
+            if s:
+                c = canonical_skill(s)
+                if c:
+                    bits |= 1 << intern(c)
+        return cls(bits, vocab)
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[int], vocab: Optional[SkillVocab] = None) -> "SkillSet":
+        bits = 0
+        for i in ids:
+            bits |= 1 << i
+        return cls(bits, vocab)
+
+    def ids(self) -> Iterator[int]:
+        b = self.bits
+        while b:
+            low = b & -b
+            yield low.bit_length() - 1
+            b ^= low
+
+    def to_list(self) -> List[str]:
+        """Sorted skill names."""
+        name = self.vocab.name
+        return sorted(name(i) for i in self.ids())
+
+    def __contains__(self, skill: object) -> bool:
+        if not isinstance(skill, str):
+            return False
+        sid = self.vocab.lookup(canonical_skill(skill))
+        return sid is not None and bool(self.bits >> sid & 1)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.to_list())
+
+    def __len__(self) -> int:
+        return self.bits.bit_count()
+
+    def __bool__(self) -> bool:
+        return self.bits != 0
+
+    def _bits_of(self, other: "SkillSet") -> int:
+        """``other``'s bits in this set's vocabulary."""
+        if other.vocab is self.vocab:
+            return other.bits
+        return SkillSet.from_iterable(other.to_list(), self.vocab).bits
+
+    def __or__(self, other: "SkillSet") -> "SkillSet":
+        return SkillSet(self.bits | self._bits_of(other), self.vocab)
+
+    def __and__(self, other: "SkillSet") -> "SkillSet":
+        return SkillSet(self.bits & self._bits_of(other), self.vocab)
+
+    def __sub__(self, other: "SkillSet") -> "SkillSet":
+        return SkillSet(self.bits & ~self._bits_of(other), self.vocab)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SkillSet):
+            return False
+        if other.vocab is self.vocab:
+            return other.bits == self.bits
+        return other.to_list() == self.to_list()
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.to_list()))
+
+    def __repr__(self) -> str:
+        return f"SkillSet({self.to_list()!r})"
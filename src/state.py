@@ -1,13 +1,26 @@
 from __future__ import annotations
 from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 class PipelineState(BaseModel):
-    # Input
-    cv_path: str
+    # Input: either a path on disk or the CV content held in memory (e.g. an upload)
+    cv_path: Optional[str] = None
+    cv_bytes: Optional[bytes] = None
+    cv_name: Optional[str] = None
     target_role: str
     language: str | None = None
     provider: str | None = None
+    # LLM-free screening: heuristic parsing, lexicon skills, offline market list, template report
+    no_llm: bool = False
+    # Report generation: "full" (LLM writes the whole ReportData) or "hybrid" (deterministic tables, LLM prose only)
+    report_mode: str = "full"
+    # Absolute run deadline (epoch seconds); None means no time budget
+    deadline: Optional[float] = None
+
+    # Slim mode: key of this run's large intermediates in the side store
+    run_ref: Optional[str] = None
+    # Hash of the CV text, kept when slim mode releases the text itself
+    cv_text_hash: Optional[str] = None
 
     # Intermediate
     cv_raw_text: Optional[str] = None
@@ -16,5 +29,18 @@ class PipelineState(BaseModel):
     market_requirements: Optional[Dict[str, Any]] = None
 
     # Output
+    report_data: Optional[Dict[str, Any]] = None
     report_markdown: Optional[str] = None
     errors: List[str] = Field(default_factory=list)
+    # Nodes that switched to their heuristic fallback because the time budget ran out
+    degraded: List[str] = Field(default_factory=list)
+
+    @model_validator(mode="after")
+    def _require_cv_input(self) -> "PipelineState":
+        if self.cv_path is None and self.cv_bytes is None:
+            raise ValueError("Either cv_path or cv_bytes must be provided")
+        return self
+
+    def cv_source(self) -> Any:
+        """The CV input to hand to load_cv: in-memory bytes take precedence over the path."""
+        return self.cv_bytes if self.cv_bytes is not None else self.cv_path
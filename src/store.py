@@ -0,0 +1,334 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from pydantic import BaseModel, Field
+
+from .skills import canonical_skill
+from .state import PipelineState
+
+DEFAULT_STORE_PATH = "data/results.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cv_hash TEXT NOT NULL,
+    candidate TEXT,
+    candidate_key TEXT,
+    role TEXT NOT NULL,
+    role_key TEXT NOT NULL,
+    language TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    cv_structured TEXT,
+    analyzed_skills TEXT,
+    market_requirements TEXT,
+    report_data TEXT,
+    report_markdown TEXT,
+    no_llm INTEGER,
+    report_mode TEXT,
+    degraded TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_runs_key ON runs (cv_hash, role_key, language, created_at);
+CREATE INDEX IF NOT EXISTS ix_runs_candidate ON runs (candidate_key, created_at);
+CREATE INDEX IF NOT EXISTS ix_runs_role ON runs (role_key, created_at);
+CREATE TABLE IF NOT EXISTS run_skills (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    skill TEXT NOT NULL,
+    kind TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_run_skills_skill ON run_skills (skill, kind);
+CREATE INDEX IF NOT EXISTS ix_run_skills_run ON run_skills (run_id);
+"""
+
+# Columns added after the first release, with their types; older store files get them on open.
+# Runs saved before them have NULL there (mode unknown), so ``latest`` never serves them for reuse
+_ADDED_COLUMNS = (("no_llm", "INTEGER"), ("report_mode", "TEXT"), ("degraded", "TEXT"))
+
+# Insert order of the runs columns, shared by save and merge_from
+_RUN_COLUMNS = ("cv_hash", "candidate", "candidate_key", "role", "role_key", "language", "created_at",
+                "cv_structured", "analyzed_skills", "market_requirements", "report_data", "report_markdown",
+                "no_llm", "report_mode", "degraded")
+_INSERT_RUN = f"INSERT INTO runs ({', '.join(_RUN_COLUMNS)}) VALUES ({', '.join('?' * len(_RUN_COLUMNS))})"
+
+# Skill kinds indexed per run, so runs can be queried by skill without decoding JSON
+SKILL_KINDS = ("explicit", "implicit", "market", "strength", "gap")
+
+
+def default_store_path() -> str:
+    return os.getenv("CV_ANALYZER_STORE") or DEFAULT_STORE_PATH
+
+
+def cv_hash(text: str) -> str:
+    """Stable hash of CV text (whitespace-normalized) used as the candidate key."""
+    norm = re.sub(r"\s+", " ", text or "").strip()
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+
+def normalize_key(value: str | None) -> str:
+    return re.sub(r"\s+", " ", (value or "").strip().lower())
+
+
+class StoredRun(BaseModel):
+    id: int
+    cv_hash: str
+    candidate: Optional[str] = None
+    role: str
+    language: str
+    created_at: float
+    cv_structured: Optional[Dict[str, Any]] = None
+    analyzed_skills: Optional[Dict[str, Any]] = None
+    market_requirements: Optional[Dict[str, Any]] = None
+    report_data: Optional[Dict[str, Any]] = None
+    report_markdown: Optional[str] = None
+    # How the report was made; None for runs stored before this was recorded
+    no_llm: Optional[bool] = None
+    report_mode: Optional[str] = None
+    degraded: Optional[List[str]] = None
+    skills: Dict[str, List[str]] = Field(default_factory=dict)
+
+    @property
+    def mode(self) -> str:
+        """``no-llm``, the LLM report mode (``full``/``hybrid``/``template``), or ``unknown`` for older runs."""
+        if self.no_llm:
+            return "no-llm"
+        return self.report_mode if self.no_llm is not None and self.report_mode else "unknown"
+
+
+class ResultStore:
+    """SQLite-backed store of finished runs, keyed by CV hash, role, language and timestamp."""
+
+    def __init__(self, path: str | None = None):
+        self.path = path or default_store_path()
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._memory_conn = sqlite3.connect(":memory:", check_same_thread=False) if self.path == ":memory:" else None
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            present = {row[1] for row in conn.execute("PRAGMA table_info(runs)")}
+            for column, kind in _ADDED_COLUMNS:
+                if column not in present:
+                    conn.execute(f"ALTER TABLE runs ADD COLUMN {column} {kind}")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        if self._memory_conn is not None:
+            with self._memory_conn:
+                yield self._memory_conn
+            return
+        # One short-lived connection per operation keeps the store safe to share across threads
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save(self, state: PipelineState) -> int:
+        """Persist a finished run's intermediates and report, with the mode it ran in. Returns the new run id."""
+        cv = state.cv_structured or {}
+        skills = _skills_by_kind(state)
+        candidate = cv.get("name") or state.cv_name
+        with self._connect() as conn:
+            cur = conn.execute(
+                _INSERT_RUN,
+                (
+                    state.cv_text_hash or cv_hash(state.cv_raw_text or ""),
+                    candidate,
+                    normalize_key(candidate) or None,
+                    state.target_role,
+                    normalize_key(state.target_role),
+                    normalize_key(state.language or "english"),
+                    time.time(),
+                    _dumps(state.cv_structured),
+                    _dumps(state.analyzed_skills),
+                    _dumps(state.market_requirements),
+                    _dumps(state.report_data),
+                    state.report_markdown,
+                    int(state.no_llm),
+                    state.report_mode,
+                    _dumps(list(state.degraded)),
+                ),
+            )
+            run_id = int(cur.lastrowid)
+            conn.executemany(
+                "INSERT INTO run_skills (run_id, skill, kind) VALUES (?, ?, ?)",
+                [(run_id, s, kind) for kind, values in skills.items() for s in values],
+            )
+        return run_id
+
+    def merge_from(self, path: str) -> int:
+        """Copy runs (with their skill index rows) from another store file, e.g. a shard's. Returns how many.
+
+        Runs already present (same CV hash, role, language and timestamp) are skipped, so merging twice is harmless.
+        """
+        src = sqlite3.connect(path)
+        try:
+            # A store file from before the mode columns yields NULLs for them
+            present = {row[1] for row in src.execute("PRAGMA table_info(runs)")}
+            columns = ", ".join(c if c in present else "NULL" for c in _RUN_COLUMNS)
+            rows = src.execute(f"SELECT id, {columns} FROM runs ORDER BY id").fetchall()
+            skills: Dict[int, List[tuple]] = {}
+            for run_id, skill, kind in src.execute("SELECT run_id, skill, kind FROM run_skills ORDER BY rowid"):
+                skills.setdefault(run_id, []).append((skill, kind))
+        finally:
+            src.close()
+        copied = 0
+        with self._connect() as conn:
+            for row in rows:
+                if conn.execute(
+                    "SELECT 1 FROM runs WHERE cv_hash = ? AND role_key = ? AND language = ? AND created_at = ?",
+                    (row[1], row[5], row[6], row[7]),
+                ).fetchone():
+                    continue
+                copied += 1
+                cur = conn.execute(_INSERT_RUN, row[1:])
+                conn.executemany(
+                    "INSERT INTO run_skills (run_id, skill, kind) VALUES (?, ?, ?)",
+                    [(cur.lastrowid, skill, kind) for skill, kind in skills.get(row[0], [])],
+                )
+        return copied
+
+    def get(self, run_id: int) -> Optional[StoredRun]:
+        runs = self._select("WHERE id = ?", (run_id,), limit=1)
+        return runs[0] if runs else None
+
+    def latest(self, cv_hash_: str, role: str, language: str, no_llm: bool = False,
+               report_mode: str = "full") -> Optional[StoredRun]:
+        """Most recent run for the CV, role and language that was made the way a new run would be.
+
+        With ``no_llm`` only ``--no-llm`` runs match; otherwise only LLM runs in ``report_mode``.
+        Runs with degraded steps, and runs stored before the mode was recorded, never match.
+        """
+        where = "WHERE cv_hash = ? AND role_key = ? AND language = ? AND degraded = '[]'"
+        params: tuple = (cv_hash_, normalize_key(role), normalize_key(language))
+        if no_llm:
+            where += " AND no_llm = 1"
+        else:
+            where += " AND no_llm = 0 AND report_mode = ?"
+            params += (report_mode,)
+        runs = self._select(where, params, limit=1)
+        return runs[0] if runs else None
+
+    def by_candidate(self, name: str, limit: int = 50) -> List[StoredRun]:
+        return self._select("WHERE candidate_key = ?", (normalize_key(name),), limit=limit)
+
+    def by_cv_hash(self, cv_hash_: str, limit: int = 50) -> List[StoredRun]:
+        return self._select("WHERE cv_hash = ?", (cv_hash_,), limit=limit)
+
+    def by_role(self, role: str, limit: int = 50) -> List[StoredRun]:
+        return self._select("WHERE role_key = ?", (normalize_key(role),), limit=limit)
+
+    def by_skill(self, skill: str, kind: str | None = None, role: str | None = None, limit: int = 50) -> List[StoredRun]:
+        """Runs whose CV, market or report lists ``skill`` (optionally only as one ``kind``)."""
+        sub = "SELECT run_id FROM run_skills WHERE skill = ?"
+        params: List[Any] = [canonical_skill(skill)]
+        if kind:
+            if kind not in SKILL_KINDS:
+                raise ValueError(f"Unknown skill kind: {kind}. Use one of {', '.join(SKILL_KINDS)}")
+            sub += " AND kind = ?"
+            params.append(kind)
+        where = f"WHERE id IN ({sub})"
+        if role:
+            where += " AND role_key = ?"
+            params.append(normalize_key(role))
+        return self._select(where, tuple(params), limit=limit)
+
+    def latest_market(self, role: str) -> Optional[Dict[str, Any]]:
+        """Most recent live (Tavily-sourced) market requirements stored for ``role``."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT market_requirements FROM runs WHERE role_key = ? AND market_requirements IS NOT NULL "
+                "AND json_extract(market_requirements, '$.source') = 'tavily' "
+                "ORDER BY created_at DESC, id DESC LIMIT 1",
+                (normalize_key(role),),
+            ).fetchone()
+        return _loads(row[0]) if row else None
+
+    def iter_skill_rows(self, role: str | None = None, language: str | None = None,
+                        latest_per_cv: bool = True) -> Iterator[tuple]:
+        """Stream (run_id, role_key, skill, kind) rows straight from the skill index, without decoding JSON.
+
+        With ``latest_per_cv`` only the most recent run per (CV hash, role) is included.
+        """
+        where: List[str] = []
+        params: List[Any] = []
+        if role:
+            where.append("r.role_key = ?")
+            params.append(normalize_key(role))
+        if language:
+            where.append("r.language = ?")
+            params.append(normalize_key(language))
+        if latest_per_cv:
+            lang_filter = "WHERE language = ? " if language else ""
+            where.append(f"r.id IN (SELECT MAX(id) FROM runs {lang_filter}GROUP BY cv_hash, role_key)")
+            if language:
+                params.append(normalize_key(language))
+        clause = ("WHERE " + " AND ".join(where)) if where else ""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "SELECT s.run_id, r.role_key, s.skill, s.kind FROM run_skills s JOIN runs r ON r.id = s.run_id "
+                f"{clause} ORDER BY s.run_id",
+                params,
+            )
+            while True:
+                rows = cur.fetchmany(5000)
+                if not rows:
+                    break
+                yield from rows
+
+    def _select(self, where: str, params: tuple, limit: int) -> List[StoredRun]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, cv_hash, candidate, role, language, created_at, cv_structured, analyzed_skills, "
+                f"market_requirements, report_data, report_markdown, no_llm, report_mode, degraded FROM runs {where} "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                params + (limit,),
+            ).fetchall()
+            ids = [r[0] for r in rows]
+            skills: Dict[int, Dict[str, List[str]]] = {i: {} for i in ids}
+            if ids:
+                marks = ",".join("?" * len(ids))
+                for run_id, skill, kind in conn.execute(
+                    f"SELECT run_id, skill, kind FROM run_skills WHERE run_id IN ({marks}) ORDER BY rowid", ids
+                ):
+                    skills[run_id].setdefault(kind, []).append(skill)
+        return [
+            StoredRun(
+                id=r[0], cv_hash=r[1], candidate=r[2], role=r[3], language=r[4], created_at=r[5],
+                cv_structured=_loads(r[6]), analyzed_skills=_loads(r[7]), market_requirements=_loads(r[8]),
+                report_data=_loads(r[9]), report_markdown=r[10],
+                no_llm=None if r[11] is None else bool(r[11]), report_mode=r[12], degraded=_loads(r[13]),
+                skills=skills.get(r[0], {}),
+            )
+            for r in rows
+        ]
+
+
+def _skills_by_kind(state: PipelineState) -> Dict[str, List[str]]:
+    analyzed = state.analyzed_skills or {}
+    market = state.market_requirements or {}
+    report = state.report_data or {}
+    out = {
+        "explicit": analyzed.get("explicit_skills", []),
+        "implicit": analyzed.get("implicit_skills", []),
+        "market": market.get("skills", []),
+        "strength": [item.get("skill", "") for item in report.get("strengths", [])],
+        "gap": [item.get("skill", "") for item in report.get("gaps", [])],
+    }
+    return {kind: sorted(set(canonical_skill(s) for s in values if s and s.strip() not in ("", "-"))) for kind, values in out.items()}
+
+
+def _dumps(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, ensure_ascii=False)
+
+
+def _loads(value: Optional[str]) -> Any:
+    return None if value is None else json.loads(value)
@@ -0,0 +1,263 @@
+from __future__ import annotations
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .skills import canonical_skill
+
+# Compiled file layout: MAGIC, u64 header length, JSON header, then 8-byte aligned native arrays
+MAGIC = b"SKTAXv1\n"
+_ALIGN = 8
+
+# Weight of a source edge given without one
+DEFAULT_WEIGHT = 0.8
+
+# Closure limits: paths longer than MAX_HOPS or weaker than MIN_CONFIDENCE are not stored
+MAX_HOPS = 3
+MIN_CONFIDENCE = 0.1
+
+Edge = Tuple[str, str, float]
+
+
+def read_edges(path: str) -> List[Edge]:
+    """Edges from a TSV file: ``skill<TAB>implied skill[<TAB>weight]`` per line, ``#`` comments.
+
+    The weight (0-1, default DEFAULT_WEIGHT) is how strongly the first skill implies the second.
+    """
+    edges: List[Edge] = []
+    for n, line in enumerate(Path(path).read_text(encoding="utf-8").splitlines(), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        parts = [p.strip() for p in line.split("\t")]
+        if len(parts) not in (2, 3) or not parts[0] or not parts[1]:
+            raise ValueError(f"{path}:{n}: expected 'skill<TAB>implied[<TAB>weight]'")
+        weight = float(parts[2]) if len(parts) == 3 else DEFAULT_WEIGHT
+        if not 0.0 < weight <= 1.0:
+            raise ValueError(f"{path}:{n}: weight must be in (0, 1]")
+        edges.append((parts[0], parts[1], weight))
+    return edges
+
+
+def edges_from_map(mapping: Dict[str, Sequence[str]], weight: float = DEFAULT_WEIGHT) -> List[Edge]:
+    """Edges from a ``{skill: [implied skills]}`` dict such as IMPLICIT_MAP."""
+    return [(k, v, weight) for k, vals in mapping.items() for v in vals]
+
+
+def _closure(adj: List[List[Tuple[int, float]]], src: int, max_hops: int,
+             min_confidence: float) -> Dict[int, Tuple[float, int]]:
+    """Best path confidence (product of edge weights) and its hop count for everything ``src`` reaches."""
+    best: Dict[int, Tuple[float, int]] = {}
+    frontier = {src: 1.0}
+    for hops in range(1, max_hops + 1):
+        nxt: Dict[int, float] = {}
+        for u, conf in frontier.items():
+            for v, w in adj[u]:
+                c = conf * w
+                if v != src and c >= min_confidence and c > nxt.get(v, 0.0):
+                    nxt[v] = c
+        for v, c in nxt.items():
+            if c > best.get(v, (0.0, 0))[0]:
+                best[v] = (c, hops)
+        frontier = nxt
+        if not frontier:
+            break
+    return best
+
+
+def compile_taxonomy(edges: Iterable[Edge], max_hops: int = MAX_HOPS,
+                     min_confidence: float = MIN_CONFIDENCE) -> bytes:
+    """Compile edges into the binary taxonomy format (see ``Taxonomy``)."""
+    best_edge: Dict[Tuple[str, str], float] = {}
+    for a, b, w in edges:
+        a, b = canonical_skill(a), canonical_skill(b)
+        if a and b and a != b:
+            best_edge[(a, b)] = max(w, best_edge.get((a, b), 0.0))
+    names = sorted({s for pair in best_edge for s in pair})
+    ids = {name: i for i, name in enumerate(names)}
+    adj: List[List[Tuple[int, float]]] = [[] for _ in names]
+    for (a, b), w in best_edge.items():
+        adj[ids[a]].append((ids[b], w))
+    for row in adj:
+        row.sort()
+
+    arrays: Dict[str, array] = {
+        "name_ptr": array("I", [0]), "name_blob": array("B"),
+        "edge_ptr": array("I", [0]), "edge_dst": array("I"), "edge_weight": array("f"),
+        "closure_ptr": array("I", [0]), "closure_dst": array("I"), "closure_conf": array("f"),
+        "closure_hops": array("B"),
+    }
+    for i, name in enumerate(names):
+        arrays["name_blob"].frombytes(name.encode("utf-8"))
+        arrays["name_ptr"].append(len(arrays["name_blob"]))
+        for v, w in adj[i]:
+            arrays["edge_dst"].append(v)
+            arrays["edge_weight"].append(w)
+        arrays["edge_ptr"].append(len(arrays["edge_dst"]))
+        for v, (c, h) in sorted(_closure(adj, i, max_hops, min_confidence).items()):
+            arrays["closure_dst"].append(v)
+            arrays["closure_conf"].append(c)
+            arrays["closure_hops"].append(h)
+        arrays["closure_ptr"].append(len(arrays["closure_dst"]))
+
+    layout: Dict[str, List] = {}
+    offset = 0
+    for key, arr in arrays.items():
+        layout[key] = [offset, arr.typecode, len(arr)]
+        offset += -(-len(arr) * arr.itemsize // _ALIGN) * _ALIGN
+    header = json.dumps({
+        "skills": len(names), "edges": len(best_edge), "max_hops": max_hops, "min_confidence": min_confidence,
+        "byteorder": sys.byteorder, "arrays": layout,
+    }).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % _ALIGN)
+    out = bytearray(MAGIC + struct.pack("<Q", len(header)) + header)
+    for arr in arrays.values():
+        data = arr.tobytes()
+        out += data + b"\0" * (-len(data) % _ALIGN)
+    return bytes(out)
+
+
+def write_taxonomy(path: str, edges: Iterable[Edge], max_hops: int = MAX_HOPS,
+                   min_confidence: float = MIN_CONFIDENCE) -> Path:
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_bytes(compile_taxonomy(edges, max_hops, min_confidence))
+    os.replace(tmp, target)
+    return target
+
+
+class _Names:
+    """Read-only sorted sequence of skill names decoded on access, so ``bisect`` can search it."""
+
+    def __init__(self, ptr: memoryview, blob: memoryview):
+        self._ptr = ptr
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._ptr) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self._blob[self._ptr[i]:self._ptr[i + 1]]).decode("utf-8")
+
+
+class Taxonomy:
+    """Skill implication graph in CSR form with its precomputed transitive closure.
+
+    Skills are numbered by sorted name. For skill ``i``, ``edge_*[edge_ptr[i]:edge_ptr[i+1]]``
+    are its direct implications and ``closure_*[closure_ptr[i]:closure_ptr[i+1]]`` everything it
+    implies within ``max_hops``, with the best path confidence (product of edge weights) and
+    that path's hop count. Loading a file maps it read-only and decodes nothing up front, so
+    it takes microseconds and worker processes share its pages through the OS page cache.
+    """
+
+    def __init__(self, buffer: bytes | mmap.mmap):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a compiled skill taxonomy")
+        (size,) = struct.unpack_from("<Q", view, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(bytes(view[start:start + size]))
+        if self.header["byteorder"] != sys.byteorder:
+            raise ValueError("Taxonomy was compiled on a machine with a different byte order; recompile it")
+        base = start + size
+        arrays: Dict[str, memoryview] = {}
+        for key, (offset, typecode, count) in self.header["arrays"].items():
+            width = array(typecode).itemsize
+            arrays[key] = view[base + offset:base + offset + count * width].cast(typecode)
+        self.names = _Names(arrays["name_ptr"], arrays["name_blob"])
+        self._edge_ptr, self._edge_dst, self._edge_weight = arrays["edge_ptr"], arrays["edge_dst"], arrays["edge_weight"]
+        self._closure_ptr, self._closure_dst = arrays["closure_ptr"], arrays["closure_dst"]
+        self._closure_conf, self._closure_hops = arrays["closure_conf"], arrays["closure_hops"]
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[Edge], max_hops: int = MAX_HOPS,
+                   min_confidence: float = MIN_CONFIDENCE) -> "Taxonomy":
+        return cls(compile_taxonomy(edges, max_hops, min_confidence))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def lookup(self, skill: str) -> Optional[int]:
+        name = canonical_skill(skill)
+        i = bisect.bisect_left(self.names, name)
+        return i if i < len(self.names) and self.names[i] == name else None
+
+    def direct(self, skill: str) -> Dict[str, float]:
+        """One-hop implications of ``skill`` with their edge weights."""
+        i = self.lookup(skill)
+        if i is None:
+            return {}
+        lo, hi = self._edge_ptr[i], self._edge_ptr[i + 1]
+        return {self.names[self._edge_dst[k]]: round(self._edge_weight[k], 4) for k in range(lo, hi)}
+
+    def implied(self, skills: Iterable[str], min_confidence: float = 0.0) -> Dict[str, Tuple[float, int]]:
+        """Skills implied by ``skills`` (excluding those given) as ``{skill: (confidence, hops)}``.
+
+        A skill reached from several given skills combines them noisy-OR style,
+        ``1 - prod(1 - c)``; ``hops`` is the shortest of the contributing paths.
+        """
+        given = {i for i in (self.lookup(s) for s in skills) if i is not None}
+        miss: Dict[int, float] = {}
+        hops: Dict[int, int] = {}
+        for i in given:
+            for k in range(self._closure_ptr[i], self._closure_ptr[i + 1]):
+                v = self._closure_dst[k]
+                if v in given:
+                    continue
+                miss[v] = miss.get(v, 1.0) * (1.0 - self._closure_conf[k])
+                hops[v] = min(hops.get(v, 255), self._closure_hops[k])
+        return {
+            self.names[v]: (round(1.0 - m, 4), hops[v])
+            for v, m in miss.items() if 1.0 - m >= min_confidence
+        }
+
+
+_loaded: Dict[str, Taxonomy] = {}
+_active: Optional[Taxonomy] = None
+_lock = threading.Lock()
+
+
+def load_taxonomy(path: str) -> Taxonomy:
+    """Memory-map a compiled taxonomy (once per path and process)."""
+    key = str(Path(path).resolve())
+    with _lock:
+        tax = _loaded.get(key)
+        if tax is None:
+            with open(key, "rb") as f:
+                tax = _loaded[key] = Taxonomy(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return tax
+
+
+def set_taxonomy(taxonomy: Optional[Taxonomy]) -> None:
+    """Install (or with None, reset to the default) the taxonomy used for implicit skills."""
+    global _active
+    with _lock:
+        _active = taxonomy
+
+
+def active_taxonomy() -> Taxonomy:
+    """The installed taxonomy; on first use the file in ``CV_ANALYZER_TAXONOMY`` if set, else one
+    compiled in memory from the built-in IMPLICIT_MAP.
+    """
+    global _active
+    if _active is not None:
+        return _active
+    path = os.getenv("CV_ANALYZER_TAXONOMY")
+    if path:
+        tax = load_taxonomy(path)
+    else:
+        from .agents.skill_analyst import IMPLICIT_MAP
+        tax = Taxonomy.from_edges(edges_from_map(IMPLICIT_MAP))
+    with _lock:
+        if _active is None:
+            _active = tax
+        return _active
@@ -1,27 +1,46 @@
 from __future__ import annotations
-from typing import Dict, Any, List
-import os
-from langchain.schema import SystemMessage, HumanMessage
+import re
+import threading
+import time
+from concurrent.futures import CancelledError, Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Any, List, Optional
+from pydantic import BaseModel, Field
+from ..cassette import active_cassette
+from ..deadline import DeadlineExceeded
+from ..json_stream import parse_llm_json
+from ..llm_provider import _get_secret
+from ..metrics import TAVILY_REQUESTS, TAVILY_SECONDS
+from ..skills import SkillSet
 
 
-def _read_secrets() -> dict:
+def tavily_search(timeout: Optional[float] = None, **params: Any) -> Dict[str, Any]:
+    """TavilyClient.search, recorded or replayed when a cassette is active.
+
+    ``timeout`` (seconds) is the HTTP request timeout; it is not part of the recorded request.
+    """
+    def search() -> Dict[str, Any]:
+        api_key = _get_secret("TAVILY_API_KEY")
+        if not api_key:
+            raise RuntimeError("TAVILY_API_KEY is missing. Set it in .env or Streamlit secrets.")
+        from tavily import TavilyClient
+        extra = {} if timeout is None else {"timeout": max(1.0, timeout)}
+        return TavilyClient(api_key=api_key).search(**params, **extra)
+
+    cassette = active_cassette()
+    t0 = time.perf_counter()
     try:
-        import streamlit as st  # type: ignore
-        if hasattr(st, "secrets"):
-            return dict(st.secrets)
+        res = cassette.call("tavily", params, search) if cassette is not None else search()
     except Exception:
-        pass
-    return {}
-
-
-def fetch_market_blurbs(role: str) -> List[str]:
-    secrets = _read_secrets()
-    api_key = secrets.get("TAVILY_API_KEY") or os.getenv("TAVILY_API_KEY")
-    if not api_key:
-        raise RuntimeError("TAVILY_API_KEY is missing. Set it in .env or Streamlit secrets.")
-    from tavily import TavilyClient
-    client = TavilyClient(api_key=api_key)
-    res = client.search(query=f"{role} required skills tech stack 2025", max_results=8)
+        TAVILY_REQUESTS.inc(outcome="error")
+        raise
+    finally:
+        TAVILY_SECONDS.observe(time.perf_counter() - t0)
+    TAVILY_REQUESTS.inc(outcome="ok")
+    return res
+
+
+def fetch_market_blurbs(role: str, timeout: Optional[float] = None) -> List[str]:
+    res = tavily_search(timeout=timeout, query=f"{role} required skills tech stack 2025", max_results=8)
     blurbs: List[str] = []
     for item in res.get("results", []):
         title = item.get("title", "")
@@ -34,24 +53,209 @@ def fetch_market_blurbs(role: str) -> List[str]:
     return blurbs
 
 
+class MarketSkills(BaseModel):
+    skills: List[str] = Field(default_factory=list)
+
+
 def synthesize_market_skills(blurbs: List[str], llm: Any) -> List[str]:
+    from langchain.schema import SystemMessage, HumanMessage
     system = SystemMessage(content=(
-        "You distill current market skills for a target role from web snippets. Output only a comma-separated list of concrete tools/skills, lowercase, max 30, no soft skills."
+        "You distill current market skills for a target role from web snippets. Output ONLY JSON. Concrete tools/skills only, lowercase, max 30, no soft skills."
     ))
     human = HumanMessage(content=(
-        "Snippets:\n" + "\n---\n".join(blurbs) + "\n\nReturn only the skills list, comma-separated."
+        "Snippets:\n" + "\n---\n".join(blurbs) + '\n\nReturn exactly this JSON: {"skills": string[]}'
     ))
-    resp = llm.invoke([system, human])
-    content = getattr(resp, "content", "").strip()
-    tokens = [t.strip().lower() for t in content.split(",") if t.strip()]
+    model, _invalid = parse_llm_json(llm, [system, human], MarketSkills)
     # Dedupe and limit
-    tokens = sorted(set(tokens))[:30]
-    return tokens
+    return SkillSet.from_iterable(model.skills).to_list()[:30]
 
 
-def get_market_requirements(target_role: str, llm: Any) -> Dict[str, Any]:
-    blurbs = fetch_market_blurbs(target_role)
+def _fetch_market_requirements(target_role: str, llm: Any, timeout: Optional[float] = None) -> Dict[str, Any]:
+    blurbs = fetch_market_blurbs(target_role, timeout)
     skills = synthesize_market_skills(blurbs, llm)
     if not skills:
         raise RuntimeError("LLM returned no skills from market snippets.")
     return {"role": target_role, "source": "tavily", "skills": skills}
+
+
+# -------- Speculative prefetch --------
+# Process-wide, so every Streamlit session and pipeline run shares in-flight and finished lookups
+PREFETCH_TTL_S = 3600.0
+
+# Longest a run waits on a running prefetch when it has no deadline of its own, before doing its own lookup
+PREFETCH_WAIT_S = 60.0
+
+_PREFETCH_LOCK = threading.Lock()
+_PREFETCH: Dict[str, "_Prefetch"] = {}
+_CHANNELS: Dict[str, str] = {}
+
+
+class _Prefetch:
+    __slots__ = ("future", "timer", "created")
+
+    def __init__(self) -> None:
+        self.future: Future = Future()
+        self.timer: Optional[threading.Timer] = None
+        self.created = time.time()
+
+
+def _role_key(role: str) -> str:
+    return " ".join((role or "").lower().split())
+
+
+def prefetch_market_requirements(target_role: str,
+                                 llm_factory: Callable[[], Any],
+                                 debounce: float = 0.0,
+                                 channel: str | None = None) -> Future:
+    """Start (or join) a background market lookup for ``target_role``.
+
+    The lookup starts after ``debounce`` seconds. A newer role on the same ``channel``
+    (e.g. one UI session) cancels a lookup that has not started yet.
+    get_market_requirements picks up the pending or finished result.
+    """
+    key = _role_key(target_role)
+    with _PREFETCH_LOCK:
+        now = time.time()
+        for k in [k for k, e in _PREFETCH.items() if e.future.done() and now - e.created > PREFETCH_TTL_S]:
+            del _PREFETCH[k]
+        if channel is not None:
+            prev = _CHANNELS.get(channel)
+            _CHANNELS[channel] = key
+            if prev and prev != key and prev not in _CHANNELS.values():
+                _cancel_pending(prev)
+        entry = _PREFETCH.get(key)
+        if entry is not None:
+            return entry.future
+        entry = _PREFETCH[key] = _Prefetch()
+        entry.timer = threading.Timer(debounce, _run_prefetch, args=(key, entry, target_role, llm_factory))
+        entry.timer.daemon = True
+        entry.timer.start()
+        return entry.future
+
+
+def _cancel_pending(key: str) -> None:
+    entry = _PREFETCH.get(key)
+    if entry is not None and entry.future.cancel():
+        if entry.timer is not None:
+            entry.timer.cancel()
+        del _PREFETCH[key]
+
+
+def _run_prefetch(key: str, entry: _Prefetch, target_role: str, llm_factory: Callable[[], Any]) -> None:
+    if not entry.future.set_running_or_notify_cancel():
+        return
+    try:
+        entry.future.set_result(_fetch_market_requirements(target_role, llm_factory()))
+    except Exception as e:
+        entry.future.set_exception(e)
+        # Don't cache failures; the pipeline will retry with its own search
+        with _PREFETCH_LOCK:
+            if _PREFETCH.get(key) is entry:
+                del _PREFETCH[key]
+
+
+def _prefetch_entry(target_role: str) -> Optional[_Prefetch]:
+    """The prefetch for ``target_role``; a finished one older than PREFETCH_TTL_S is dropped instead."""
+    key = _role_key(target_role)
+    with _PREFETCH_LOCK:
+        entry = _PREFETCH.get(key)
+        if entry is not None and entry.future.done() and time.time() - entry.created > PREFETCH_TTL_S:
+            del _PREFETCH[key]
+            return None
+        return entry
+
+
+def _prefetched(target_role: str, entry: _Prefetch, timeout: float) -> Optional[Dict[str, Any]]:
+    """The prefetch result, waiting at most ``timeout`` seconds; None if it failed, was cancelled or is still running."""
+    try:
+        result = entry.future.result(timeout=timeout)
+    except (CancelledError, FutureTimeout, Exception):
+        return None
+    return {**result, "role": target_role, "skills": list(result.get("skills", []))}
+
+
+def cached_market_requirements(target_role: str) -> Optional[Dict[str, Any]]:
+    """A finished, successful prefetch for ``target_role``, without waiting for pending ones."""
+    entry = _prefetch_entry(target_role)
+    if entry is None or not entry.future.done():
+        return None
+    return _prefetched(target_role, entry, 0)
+
+
+def get_market_requirements(target_role: str, llm: Any, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Market skills for a role, reusing a prefetched (running or finished) lookup when there is one.
+
+    A running prefetch is waited on for at most ``timeout`` seconds (the caller's remaining
+    budget; PREFETCH_WAIT_S when None). If it is still running after a ``timeout`` the wait has
+    used up, DeadlineExceeded is raised rather than starting a lookup that cannot finish in time.
+    An own lookup passes what is left of ``timeout`` to Tavily as its request timeout; pass an
+    LLM bounded the same way (DeadlineLLM) for the synthesis call.
+    """
+    entry = _prefetch_entry(target_role)
+    if entry is not None:
+        wait = PREFETCH_WAIT_S if timeout is None else min(timeout, PREFETCH_WAIT_S)
+        t0 = time.perf_counter()
+        prefetched = _prefetched(target_role, entry, wait)
+        if prefetched is not None:
+            return prefetched
+        if timeout is not None and not entry.future.done() and time.perf_counter() - t0 >= timeout:
+            raise DeadlineExceeded(f"market prefetch still running after the {timeout:.1f}s budget")
+        if timeout is not None:
+            timeout -= time.perf_counter() - t0
+    return _fetch_market_requirements(target_role, llm, timeout)
+
+
+# -------- Offline market skills (no Tavily, no LLM) --------
+# Baseline skill lists per role family, matched by keywords in the role; used when nothing better is cached
+OFFLINE_ROLE_SKILLS: Dict[str, List[str]] = {
+    "data engineer": ["python", "sql", "spark", "airflow", "kafka", "dbt", "snowflake", "bigquery", "aws", "docker",
+                      "postgres", "data modeling", "etl orchestration", "git", "terraform"],
+    "data scientist": ["python", "sql", "pandas", "numpy", "sklearn", "xgboost", "statistics", "matplotlib",
+                       "jupyter", "pytorch", "experiment tracking", "feature engineering", "git"],
+    "ai engineer": ["python", "pytorch", "tensorflow", "huggingface", "langchain", "rag", "embeddings", "vector db",
+                    "faiss", "docker", "kubernetes", "mlflow", "fastapi", "aws", "prompt design", "git"],
+    "devops": ["linux", "bash", "docker", "kubernetes", "terraform", "ansible", "aws", "gcp", "cicd", "github actions",
+               "prometheus", "grafana", "helm", "nginx", "git"],
+    "backend": ["python", "java", "go", "node.js", "sql", "postgres", "redis", "rest", "graphql", "docker",
+                "kubernetes", "kafka", "microservices", "aws", "git"],
+    "frontend": ["javascript", "typescript", "react", "next.js", "vue", "html", "css", "tailwind", "rest", "graphql",
+                 "git", "figma"],
+    "embedded": ["c", "c++", "embedded c", "rtos", "stm32", "esp32", "arduino", "mqtt", "iot", "linux", "git"],
+    "software engineer": ["python", "java", "javascript", "sql", "git", "docker", "rest", "cicd", "linux",
+                          "microservices", "aws", "postgres"],
+}
+
+# Role keywords -> OFFLINE_ROLE_SKILLS family, checked in order. Keywords match whole words of the
+# role ("ai" matches "Senior AI Engineer", not "Shanghai"); punctuation counts as a word break
+_ROLE_FAMILIES = [
+    (("data engineer", "etl", "analytics engineer"), "data engineer"),
+    (("data scientist", "data science", "analyst"), "data scientist"),
+    (("ai", "machine learning", "ml", "mlops", "llm", "nlp", "deep learning"), "ai engineer"),
+    (("devops", "sre", "site reliability", "platform", "cloud", "infrastructure"), "devops"),
+    (("frontend", "front end", "ui engineer", "web developer"), "frontend"),
+    (("backend", "back end", "api"), "backend"),
+    (("embedded", "firmware", "iot"), "embedded"),
+]
+
+
+def role_family(target_role: str) -> str:
+    """OFFLINE_ROLE_SKILLS family of a role title (``software engineer`` when no keyword matches)."""
+    words = f" {' '.join(re.findall(r'[a-z0-9+#]+', (target_role or '').lower()))} "
+    return next((fam for keys, fam in _ROLE_FAMILIES if any(f" {k} " in words for k in keys)), "software engineer")
+
+
+def offline_market_requirements(target_role: str, store: Any = None) -> Dict[str, Any]:
+    """Market skills without any network or LLM call.
+
+    Tries, in order: a finished prefetch, the latest stored market list for the role
+    (``store`` is a ResultStore), then the built-in baseline for the role family.
+    """
+    cached = cached_market_requirements(target_role)
+    if cached is not None:
+        return {**cached, "source": "prefetch"}
+    if store is not None:
+        stored = store.latest_market(target_role)
+        if stored and stored.get("skills"):
+            return {"role": target_role, "source": "store", "skills": list(stored["skills"])}
+    family = role_family(target_role)
+    return {"role": target_role, "source": f"offline:{family}", "skills": SkillSet.from_iterable(OFFLINE_ROLE_SKILLS[family]).to_list()}
@@ -1,27 +1,69 @@
 from __future__ import annotations
-from typing import Optional
+import io
+from typing import BinaryIO, Optional, Union
 from pathlib import Path
 
+# A CV can be given as a file path, raw bytes, or a binary file-like object (e.g. a Streamlit upload)
+CVSource = Union[str, Path, bytes, bytearray, memoryview, BinaryIO]
+
+# Leading bytes of common binary formats we cannot read as text
+_BINARY_MAGIC = (
+    b"PK\x03\x04",          # zip containers (.docx, .odt)
+    b"\xd0\xcf\x11\xe0",    # OLE2 (.doc)
+    b"\x89PNG",
+    b"\xff\xd8\xff",        # JPEG
+    b"{\\rtf",
+)
+
+
 def read_text_file(path: str) -> str:
     p = Path(path)
     return p.read_text(encoding="utf-8")
 
-def pdf_to_text(path: str) -> Optional[str]:
+
+def read_cv_bytes(source: CVSource) -> bytes:
+    """Return the raw bytes of a CV given as path, bytes or file-like object."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, (str, Path)):
+        return Path(source).read_bytes()
+    if hasattr(source, "getvalue"):
+        return bytes(source.getvalue())
+    return source.read()
+
+
+def sniff_format(data: bytes) -> str:
+    """Detect CV format from magic bytes: 'pdf' or 'txt'. Raises ValueError otherwise."""
+    head = data[:1024].lstrip(b"\xef\xbb\xbf \t\r\n")
+    if head.startswith(b"%PDF-") or b"%PDF-" in data[:1024]:
+        return "pdf"
+    if head.startswith(_BINARY_MAGIC) or b"\x00" in head:
+        raise ValueError("Format CV tidak didukung. Gunakan .txt atau .pdf")
+    return "txt"
+
+
+def pdf_to_text(source: CVSource) -> Optional[str]:
     try:
         from pypdf import PdfReader
-        reader = PdfReader(path)
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(bytes(source))
+        reader = PdfReader(source)
         pages = [page.extract_text() or "" for page in reader.pages]
         return "\n".join(pages).strip()
     except Exception:
         return None
 
-def load_cv(path: str) -> str:
-    path_lower = path.lower()
-    if path_lower.endswith(".txt") or path_lower.endswith(".md"):
-        return read_text_file(path)
-    if path_lower.endswith(".pdf"):
-        txt = pdf_to_text(path)
+
+def load_cv(source: CVSource) -> str:
+    """Load CV text from a path, bytes or file-like buffer. Format is sniffed from content."""
+    data = read_cv_bytes(source)
+    fmt = sniff_format(data)
+    if fmt == "pdf":
+        txt = pdf_to_text(data)
         if txt:
             return txt
         raise RuntimeError("Gagal ekstrak teks dari PDF. Install pypdf atau pastikan file tidak terenkripsi.")
-    raise ValueError("Format CV tidak didukung. Gunakan .txt atau .pdf")
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("Format CV tidak didukung. Gunakan .txt atau .pdf")